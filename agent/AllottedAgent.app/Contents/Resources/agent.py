@@ -1,8 +1,16 @@
+import http.client
 import json
 import os
+import random
+import socket
 import subprocess
 import time
-from urllib import request, error
+from concurrent.futures import ThreadPoolExecutor
+from urllib import error
+from urllib.parse import urlsplit
+
+# Reported to the server with every request for fleet version tracking.
+AGENT_VERSION = "1.1.0"
 
 CONFIG_PATH = os.path.join(
     os.path.expanduser("~"),
@@ -12,6 +20,23 @@ CONFIG_PATH = os.path.join(
     "config.json",
 )
 
+# Last inventory the server acknowledged, used to send only changed fields.
+STATE_PATH = os.path.join(os.path.dirname(CONFIG_PATH), "inventory_state.json")
+
+# Slow-changing hardware facts cached between runs.
+FACTS_CACHE_PATH = os.path.join(os.path.dirname(CONFIG_PATH), "facts_cache.json")
+FACTS_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+# Inventory commands run in parallel on this many threads.
+COLLECTOR_WORKERS = 4
+
+# Seconds the server may hold a commands/next request open.
+LONG_POLL_SECONDS = 25
+# Exponential backoff after failed polls: base delay and ceiling.
+ERROR_RETRY_SECONDS = 5
+MAX_RETRY_SECONDS = 300
+# Upper bound on any server-directed pause.
+MAX_SERVER_DELAY_SECONDS = 3600
+
 
 def _load_config():
     # Read local agent configuration written by the installer.
@@ -21,20 +46,95 @@ def _load_config():
         return json.load(handle)
 
 
-def _http_get(url):
+def _load_state():
+    # Read the last acknowledged inventory (empty on first run or corruption).
+    try:
+        with open(STATE_PATH, "r", encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(state):
+    # Write atomically so a crash never leaves a half-written baseline.
+    tmp_path = f"{STATE_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(state, handle)
+    os.replace(tmp_path, STATE_PATH)
+
+
+class _HttpSession:
+    # Keep one persistent connection to the API so polls, registration and
+    # acks reuse the same TCP/TLS session instead of handshaking every call.
+
+    def __init__(self):
+        self._conn = None
+        self._origin = None
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+        self._origin = None
+
+    def _connection(self, scheme, netloc, timeout):
+        if self._conn is None or self._origin != (scheme, netloc):
+            self.close()
+            conn_cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            self._conn = conn_cls(netloc, timeout=timeout)
+            self._origin = (scheme, netloc)
+            return self._conn, False
+        # Long polls and short requests share the socket with different timeouts.
+        self._conn.timeout = timeout
+        if self._conn.sock is not None:
+            self._conn.sock.settimeout(timeout)
+        return self._conn, True
+
+    def request(self, method, url, payload=None, timeout=10):
+        parts = urlsplit(url)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        headers = {"Accept": "application/json", "X-Agent-Version": AGENT_VERSION}
+        body = None
+        if payload is not None:
+            body = json.dumps(payload).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+
+        while True:
+            conn, reused = self._connection(parts.scheme, parts.netloc, timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except socket.timeout:
+                self.close()
+                raise
+            except (http.client.HTTPException, OSError):
+                self.close()
+                # A reused socket may have been closed by the server while
+                # idle; retry once on a fresh connection, otherwise give up.
+                if reused:
+                    continue
+                raise
+            break
+
+        if resp.will_close:
+            self.close()
+        if resp.status >= 400:
+            raise error.HTTPError(url, resp.status, resp.reason, resp.headers, None)
+        return json.loads(data.decode("utf-8")) if data else {}
+
+
+_session = _HttpSession()
+
+
+def _http_get(url, timeout=10):
     # Basic JSON GET helper for the agent API.
-    req = request.Request(url, method="GET")
-    with request.urlopen(req, timeout=10) as resp:
-        return json.loads(resp.read().decode("utf-8"))
+    return _session.request("GET", url, timeout=timeout)
 
 
 def _http_post(url, payload):
     # Basic JSON POST helper for the agent API.
-    data = json.dumps(payload).encode("utf-8")
-    req = request.Request(url, data=data, method="POST")
-    req.add_header("Content-Type", "application/json")
-    with request.urlopen(req, timeout=10) as resp:
-        return json.loads(resp.read().decode("utf-8"))
+    return _session.request("POST", url, payload=payload)
 
 
 def _run_cmd(cmd: list[str]) -> str:
@@ -46,40 +146,144 @@ def _run_cmd(cmd: list[str]) -> str:
         return ""
 
 
-def _get_system_info():
-    # Gather hardware and OS details for device registration.
-    hw_info = _run_cmd(["/usr/sbin/system_profiler", "SPHardwareDataType"])
-    serial_number = ""
-    model_name = ""
-    model_identifier = ""
-    processor_type = ""
-
+def _collect_hardware(run):
+    # Slow (seconds on older Macs): serial, model and processor from system_profiler.
+    hw_info = run(["/usr/sbin/system_profiler", "SPHardwareDataType"])
+    facts = {}
     for line in hw_info.splitlines():
         if "Serial Number" in line:
-            serial_number = line.split(":")[-1].strip()
+            facts["serialNumber"] = line.split(":")[-1].strip()
         elif "Model Name" in line:
-            model_name = line.split(":")[-1].strip()
+            facts["model"] = line.split(":")[-1].strip()
         elif "Model Identifier" in line:
-            model_identifier = line.split(":")[-1].strip()
+            facts["modelIdentifier"] = line.split(":")[-1].strip()
         elif "Chip" in line or "Processor Name" in line:
-            processor_type = line.split(":")[-1].strip()
+            facts["processorType"] = line.split(":")[-1].strip()
+    return facts
+
 
-    name = _run_cmd(["/usr/sbin/scutil", "--get", "ComputerName"])
-    os_version = _run_cmd(["/usr/bin/sw_vers", "-productVersion"])
-    cache_size = _run_cmd(["/usr/sbin/sysctl", "-n", "hw.l3cachesize"])
+def _collect_cache_size(run):
+    cache_size = run(["/usr/sbin/sysctl", "-n", "hw.l3cachesize"])
     if cache_size.isdigit():
-        cache_size = f"{int(cache_size) // (1024 * 1024)} MB"
-    else:
-        cache_size = ""
+        return {"cacheSize": f"{int(cache_size) // (1024 * 1024)} MB"}
+    return {}
+
+
+def _collect_name(run):
+    return {"name": run(["/usr/sbin/scutil", "--get", "ComputerName"])}
+
+
+def _collect_os_version(run):
+    return {"osVersion": run(["/usr/bin/sw_vers", "-productVersion"])}
+
+
+# Inventory collectors as (name, function, cacheable). Cacheable facts only
+# change with hardware, so each one is reused from disk until its own TTL
+# lapses or the OS version changes. Swap these out to run on Linux with
+# stubbed output.
+COLLECTORS = [
+    ("hardware", _collect_hardware, True),
+    ("cache_size", _collect_cache_size, True),
+    ("name", _collect_name, False),
+]
+# The OS version always runs first because it decides cache validity.
+OS_VERSION_COLLECTOR = _collect_os_version
+
+
+def _load_facts_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            cache = json.load(handle)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def _save_facts_cache(path, cache):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(cache, handle)
+    os.replace(tmp_path, path)
+
+
+def _run_collectors(collectors, run):
+    # Run collectors concurrently (subprocess waits release the GIL) and
+    # return each collector's facts keyed by collector name; a collector
+    # that raised maps to None.
+    results = {}
+    if not collectors:
+        return results
+    with ThreadPoolExecutor(max_workers=min(COLLECTOR_WORKERS, len(collectors))) as pool:
+        futures = {name: pool.submit(func, run) for name, func, _ in collectors}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception:
+                results[name] = None
+    return results
+
+
+def _usable(facts):
+    # A failed command yields "" from _run_cmd; never cache a result that
+    # carries no values, or the agent would report blanks until the TTL ends.
+    return isinstance(facts, dict) and any(facts.values())
+
+
+def _cached_entries(cache, os_version, now):
+    # Per-collector cache entries still valid for this OS version and TTL.
+    if cache.get("osVersion") != os_version:
+        return {}
+    entries = cache.get("collectors") or {}
+    return {
+        name: entry
+        for name, entry in entries.items()
+        if isinstance(entry, dict)
+        and _usable(entry.get("facts"))
+        and now - entry.get("collectedAt", 0) < FACTS_CACHE_TTL_SECONDS
+    }
+
+
+def _get_system_info(run=_run_cmd, collectors=None, cache_path=None, now=None):
+    # Gather hardware and OS details for device registration.
+    collectors = COLLECTORS if collectors is None else collectors
+    cache_path = cache_path or FACTS_CACHE_PATH
+    now = time.time() if now is None else now
+
+    os_version = OS_VERSION_COLLECTOR(run).get("osVersion", "")
+    cached = _cached_entries(_load_facts_cache(cache_path), os_version, now)
+
+    pending = [c for c in collectors if not (c[2] and c[0] in cached)]
+    results = _run_collectors(pending, run)
+
+    facts = {}
+    for name, _, _ in collectors:
+        if name in results:
+            facts.update(results[name] or {})
+        else:
+            facts.update(cached[name]["facts"])
+
+    # Each fact keeps the time it was collected, so a partial refresh does
+    # not extend the life of entries it reused.
+    refreshed = {
+        name: {"facts": results[name], "collectedAt": now}
+        for name, _, cacheable in pending
+        if cacheable and _usable(results[name])
+    }
+    # Only persist a cache that identifies the machine.
+    if refreshed and facts.get("serialNumber"):
+        try:
+            _save_facts_cache(cache_path, {"osVersion": os_version, "collectors": {**cached, **refreshed}})
+        except OSError:
+            pass
 
     return {
-        "name": name or "Mac",
-        "model": model_name or "Mac",
-        "serialNumber": serial_number,
+        "name": facts.get("name") or "Mac",
+        "model": facts.get("model") or "Mac",
+        "serialNumber": facts.get("serialNumber", ""),
         "osVersion": os_version or "",
-        "modelIdentifier": model_identifier or "",
-        "processorType": processor_type or "",
-        "cacheSize": cache_size or "",
+        "modelIdentifier": facts.get("modelIdentifier") or "",
+        "processorType": facts.get("processorType") or "",
+        "cacheSize": facts.get("cacheSize") or "",
     }
 
 
@@ -98,10 +302,37 @@ def _register_agent(server_url: str, agent_id: str):
         "processorType": info.get("processorType") or "",
         "cacheSize": info.get("cacheSize") or "",
     }
+    register_url = f"{server_url}/agents/register"
+    state = _load_state()
+    baseline = state.get("inventory") or {}
     try:
-        _http_post(f"{server_url}/agents/register", payload)
+        if state.get("inventoryHash") and baseline.get("serialNumber") == payload["serialNumber"]:
+            # Send only what changed since the last acknowledged inventory.
+            changes = {key: value for key, value in payload.items() if baseline.get(key) != value}
+            try:
+                response = _http_post(
+                    register_url,
+                    {
+                        "agentId": agent_id,
+                        "serialNumber": payload["serialNumber"],
+                        "baseHash": state["inventoryHash"],
+                        "changes": changes,
+                    },
+                )
+            except error.HTTPError as exc:
+                # 409 means the server lost our baseline; resend everything.
+                if exc.code != 409:
+                    raise
+                response = _http_post(register_url, payload)
+        else:
+            response = _http_post(register_url, payload)
     except Exception:
-        pass
+        return
+    if response.get("inventoryHash"):
+        try:
+            _save_state({"inventoryHash": response["inventoryHash"], "inventory": payload})
+        except OSError:
+            pass
 
 
 def _show_patch_window(message: str):
@@ -135,6 +366,24 @@ def _handle_patch(server_url: str, agent_id: str, command: dict):
     _http_post(complete_url, {"status": "completed", "payload": command.get("payload", {})})
 
 
+def _backoff_delay(failures):
+    # Exponential backoff with full jitter so the fleet never retries in lockstep.
+    ceiling = min(MAX_RETRY_SECONDS, ERROR_RETRY_SECONDS * (2 ** min(failures - 1, 16)))
+    return random.uniform(0, ceiling)
+
+
+def _server_delay(value):
+    # Parse a server-directed pause (seconds), jittered by up to 10%.
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        return 0
+    if seconds <= 0:
+        return 0
+    seconds = min(seconds, MAX_SERVER_DELAY_SECONDS)
+    return seconds * random.uniform(0.9, 1.1)
+
+
 def main():
     # Main polling loop: fetch commands and execute supported types.
     config = _load_config()
@@ -145,19 +394,27 @@ def main():
 
     _register_agent(server_url, agent_id)
 
+    failures = 0
     while True:
         try:
-            next_url = f"{server_url}/agents/{agent_id}/commands/next"
-            response = _http_get(next_url)
+            # Long-poll: the server answers as soon as a command is queued.
+            next_url = f"{server_url}/agents/{agent_id}/commands/next?wait={LONG_POLL_SECONDS}"
+            response = _http_get(next_url, timeout=LONG_POLL_SECONDS + 10)
+            failures = 0
             command = response.get("command")
             if command:
                 if command.get("type") == "patch":
                     _handle_patch(server_url, agent_id, command)
-        except error.URLError:
-            pass
+            delay = _server_delay(response.get("nextPollSeconds"))
+        except error.HTTPError as exc:
+            failures += 1
+            retry_after = _server_delay(exc.headers.get("Retry-After") if exc.headers else None)
+            delay = retry_after or _backoff_delay(failures)
         except Exception:
-            pass
-        time.sleep(5)
+            failures += 1
+            delay = _backoff_delay(failures)
+        if delay:
+            time.sleep(delay)
 
 
 if __name__ == "__main__":
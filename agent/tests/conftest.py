@@ -0,0 +1,44 @@
+import importlib.util
+import os
+
+import pytest
+
+AGENT_PATH = os.path.join(
+    os.path.dirname(__file__), os.pardir, "AllottedAgent.app", "Contents", "Resources", "agent.py"
+)
+
+
+@pytest.fixture
+def agent():
+    # Load the bundled script as a module; it only runs main() as __main__.
+    spec = importlib.util.spec_from_file_location("allotted_agent", AGENT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class StubCommands:
+    # Stands in for _run_cmd: canned stdout per binary, with a call log.
+
+    def __init__(self, outputs):
+        self.outputs = dict(outputs)
+        self.calls = []
+
+    def __call__(self, cmd):
+        self.calls.append(os.path.basename(cmd[0]))
+        output = self.outputs.get(os.path.basename(cmd[0]), "")
+        if isinstance(output, Exception):
+            raise output
+        return output
+
+
+@pytest.fixture
+def mac():
+    return StubCommands(
+        {
+            "sw_vers": "14.5",
+            "system_profiler": "Model Name: MacBook Pro\nSerial Number (system): C02XYZ\nChip: Apple M2",
+            "sysctl": str(16 * 1024 * 1024),
+            "scutil": "Alice's Mac",
+        }
+    )
@@ -0,0 +1,93 @@
+import json
+
+
+def test_cold_collection_runs_every_collector_and_caches(agent, mac, tmp_path):
+    cache_path = str(tmp_path / "facts.json")
+    info = agent._get_system_info(run=mac, cache_path=cache_path, now=1000)
+    assert info["serialNumber"] == "C02XYZ"
+    assert info["cacheSize"] == "16 MB"
+    assert info["name"] == "Alice's Mac"
+    assert sorted(mac.calls) == ["scutil", "sw_vers", "sysctl", "system_profiler"]
+
+    cache = json.load(open(cache_path))
+    assert cache["osVersion"] == "14.5"
+    assert {name: entry["collectedAt"] for name, entry in cache["collectors"].items()} == {
+        "hardware": 1000,
+        "cache_size": 1000,
+    }
+
+
+def test_warm_collection_only_runs_uncached_commands(agent, mac, tmp_path):
+    cache_path = str(tmp_path / "facts.json")
+    agent._get_system_info(run=mac, cache_path=cache_path, now=1000)
+    mac.calls.clear()
+    info = agent._get_system_info(run=mac, cache_path=cache_path, now=2000)
+    assert info["serialNumber"] == "C02XYZ"
+    assert sorted(mac.calls) == ["scutil", "sw_vers"]
+
+
+def test_os_upgrade_invalidates_the_cache(agent, mac, tmp_path):
+    cache_path = str(tmp_path / "facts.json")
+    agent._get_system_info(run=mac, cache_path=cache_path, now=1000)
+    mac.outputs["sw_vers"] = "15.0"
+    mac.calls.clear()
+    agent._get_system_info(run=mac, cache_path=cache_path, now=2000)
+    assert "system_profiler" in mac.calls and "sysctl" in mac.calls
+
+
+def test_failed_or_empty_collectors_are_not_cached(agent, mac, tmp_path):
+    cache_path = str(tmp_path / "facts.json")
+    mac.outputs["sysctl"] = ""
+    info = agent._get_system_info(run=mac, cache_path=cache_path, now=1000)
+    assert info["cacheSize"] == ""
+    assert "cache_size" not in json.load(open(cache_path))["collectors"]
+
+    # The next run retries it while still reusing the hardware facts.
+    mac.outputs["sysctl"] = str(8 * 1024 * 1024)
+    mac.calls.clear()
+    info = agent._get_system_info(run=mac, cache_path=cache_path, now=2000)
+    assert info["cacheSize"] == "8 MB"
+    assert "sysctl" in mac.calls and "system_profiler" not in mac.calls
+
+
+def test_raising_collector_is_not_cached(agent, mac, tmp_path):
+    def broken(run):
+        raise RuntimeError("boom")
+
+    collectors = [("hardware", agent._collect_hardware, True), ("broken", broken, True)]
+    cache_path = str(tmp_path / "facts.json")
+    info = agent._get_system_info(run=mac, collectors=collectors, cache_path=cache_path, now=1000)
+    assert info["serialNumber"] == "C02XYZ"
+    assert list(json.load(open(cache_path))["collectors"]) == ["hardware"]
+
+
+def test_partial_refresh_keeps_each_facts_timestamp(agent, mac, tmp_path):
+    cache_path = str(tmp_path / "facts.json")
+    mac.outputs["sysctl"] = ""
+    agent._get_system_info(run=mac, cache_path=cache_path, now=1000)
+    mac.outputs["sysctl"] = str(8 * 1024 * 1024)
+    agent._get_system_info(run=mac, cache_path=cache_path, now=5000)
+    stamps = {name: entry["collectedAt"] for name, entry in json.load(open(cache_path))["collectors"].items()}
+    assert stamps == {"hardware": 1000, "cache_size": 5000}
+
+    # Hardware expires on its own schedule, not the cache size refresh's.
+    mac.calls.clear()
+    agent._get_system_info(run=mac, cache_path=cache_path, now=1000 + agent.FACTS_CACHE_TTL_SECONDS)
+    assert "system_profiler" in mac.calls and "sysctl" not in mac.calls
+
+
+def test_collectors_run_concurrently(agent, tmp_path):
+    import time
+
+    def slow(name, seconds):
+        def collect(run):
+            time.sleep(seconds)
+            return {name: "x"}
+
+        return collect
+
+    collectors = [("a", slow("a", 0.3), True), ("b", slow("b", 0.3), True), ("c", slow("c", 0.3), False)]
+    started = time.monotonic()
+    results = agent._run_collectors(collectors, run=None)
+    assert time.monotonic() - started < 0.6
+    assert results == {"a": {"a": "x"}, "b": {"b": "x"}, "c": {"c": "x"}}
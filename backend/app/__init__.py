@@ -1,29 +1,59 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
 
+from .cli import init_cli
 from .config import Config
+from .detail_cache import detail_cache_stats, init_detail_cache
+from .etags import init_etags
 from .extensions import db
+from .heartbeats import init_heartbeats
+from .json_provider import init_json_provider
+from .passwords import init_password_hashing
+from .pool import pool_status
+from .schema import check_schema
 from .routes.auth import auth_bp
 from .routes.dashboard import dashboard_bp
 from .routes.users import users_bp
 from .routes.devices import devices_bp
 from .routes.computers import computers_bp
 from .routes.agents import agents_bp
+from .routes.search import search_bp
 
 
-# Build and configure the Flask application.
-def create_app() -> Flask:
+# Build and configure the Flask application; tests pass their own config.
+def create_app(config_object=Config) -> Flask:
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config_object)
+    init_json_provider(app)
 
     # Allow the frontend to call the API during local development.
     CORS(app, origins=app.config["CORS_ORIGINS"], supports_credentials=True)
     db.init_app(app)
+    init_heartbeats(app)
+    init_etags(app)
+    init_detail_cache(app.config)
+    init_password_hashing(app)
+    init_cli(app)
 
     @app.get("/api/health")
     def health_check():
         # Simple liveness probe used by local tooling.
-        return jsonify({"status": "ok"})
+        schema = app.config.get("SCHEMA_REVISION")
+        if schema is None:
+            schema_state = "unchecked"
+        else:
+            schema_state = "current" if schema["current"] == schema["expected"] else "outdated"
+        return jsonify({"status": "ok", "schema": schema_state})
+
+    @app.get("/api/health/pool")
+    def pool_health():
+        # Connection pool occupancy and checkout wait histogram for this worker.
+        return jsonify(pool_status(db.engine))
+
+    @app.get("/api/health/cache")
+    def cache_health():
+        # Detail cache hit/miss/eviction counters for this worker.
+        return jsonify(detail_cache_stats())
 
     app.register_blueprint(auth_bp, url_prefix="/api/auth")
     app.register_blueprint(dashboard_bp, url_prefix="/api/dashboard")
@@ -31,8 +61,10 @@ def create_app() -> Flask:
     app.register_blueprint(devices_bp, url_prefix="/api/devices")
     app.register_blueprint(computers_bp, url_prefix="/api/computers")
     app.register_blueprint(agents_bp, url_prefix="/api/agents")
+    app.register_blueprint(search_bp, url_prefix="/api/search")
 
-    with app.app_context():
-        db.create_all()
+    # Schema changes ship as Alembic migrations; boot only verifies the version.
+    if app.config["SCHEMA_CHECK_ON_STARTUP"]:
+        check_schema(app)
 
     return app
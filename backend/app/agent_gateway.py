@@ -0,0 +1,408 @@
+import asyncio
+import contextlib
+import logging
+import os
+from datetime import datetime
+
+from flask import Config as Settings
+from sqlalchemy import select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from .command_queue import (
+    CLAIM_RETRIES,
+    MAX_LONG_POLL_SECONDS,
+    SWEEP_CHUNK,
+    claim_candidate_statement,
+    claim_statement,
+    claimed_command_dict,
+    command_status_statement,
+    complete_statement,
+    expire_statements,
+    ready_agents_statement,
+)
+from .config import Config
+from .detail_cache import detail_key, init_detail_cache, invalidate_details
+from .etags import bump_statement
+from .heartbeats import FLUSH_CHUNK, HEARTBEAT_FLUSH_SECONDS, heartbeat_statement
+from .models import Computer
+from .registration import (
+    INVENTORY_FIELDS,
+    MAX_REGISTRATION_BATCH,
+    classify_records,
+    detail_keys,
+    merge_inventory_delta,
+    normalize_registration,
+    owners_statement,
+    registration_row_to_dict,
+    registration_statement,
+    stored_hashes_statement,
+    upsert_statement,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Stored inventory a delta registration is checked and merged against.
+_DELTA_COLUMNS = (Computer.serial_number, Computer.inventory_hash) + tuple(
+    getattr(Computer, column) for column in INVENTORY_FIELDS
+)
+
+
+class AgentGateway:
+    # Async counterpart of the /api/agents protocol routes. Long polls park on
+    # an asyncio.Event instead of a worker thread and hold no DB connection
+    # while they wait; one sweep per interval finds parked agents with new
+    # commands, so idle agents cost no queries of their own.
+
+    def __init__(self, config: Settings):
+        self.config = config
+        self.engine = create_async_engine(
+            config["AGENT_GATEWAY_DATABASE_URI"],
+            pool_size=config["DB_POOL_SIZE"],
+            max_overflow=config["DB_MAX_OVERFLOW"],
+            pool_timeout=config["DB_POOL_TIMEOUT"],
+            pool_recycle=config["DB_POOL_RECYCLE"],
+            pool_pre_ping=config["DB_POOL_PRE_PING"],
+        )
+        self.dialect = self.engine.dialect.name
+        # Structure: { agent_id: [event, waiter_count] }
+        self.waiters: dict[str, list] = {}
+        # Pending heartbeats. Structure: { agent_id: (seen_at, version) }
+        self.heartbeats: dict[str, tuple] = {}
+        self._tasks: list = []
+
+    async def start(self):
+        self._tasks = [
+            asyncio.create_task(self._every(self.config["AGENT_GATEWAY_SWEEP_SECONDS"], self.sweep_waiters)),
+            asyncio.create_task(self._every(HEARTBEAT_FLUSH_SECONDS, self.flush_heartbeats)),
+        ]
+        if self.config["COMMAND_SWEEP_SECONDS"] > 0:
+            # Agents polling here may never reach a Flask worker's sweep.
+            self._tasks.append(
+                asyncio.create_task(self._every(self.config["COMMAND_SWEEP_SECONDS"], self.sweep_commands))
+            )
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush_heartbeats()
+        await self.engine.dispose()
+
+    # Run a periodic job; a failed run is logged and retried next interval.
+    async def _every(self, seconds: float, job):
+        while True:
+            await asyncio.sleep(seconds)
+            try:
+                await job()
+            except SQLAlchemyError:
+                logger.exception("Agent gateway job %s failed.", job.__name__)
+
+    # Buffer a heartbeat; repeated polls from one agent collapse into one write.
+    def record_heartbeat(self, agent_id: str, version=None):
+        previous = self.heartbeats.get(agent_id)
+        if version is None and previous:
+            version = previous[1]
+        self.heartbeats[agent_id] = (datetime.utcnow(), version)
+
+    # Write buffered heartbeats with one CASE-based UPDATE per chunk.
+    async def flush_heartbeats(self):
+        batch, self.heartbeats = self.heartbeats, {}
+        if not batch:
+            return
+        agent_ids = list(batch)
+        try:
+            async with self.engine.begin() as conn:
+                for start in range(0, len(agent_ids), FLUSH_CHUNK):
+                    await conn.execute(heartbeat_statement(batch, agent_ids[start:start + FLUSH_CHUNK]))
+        except SQLAlchemyError:
+            # Drop this batch; the next poll from each agent refreshes it.
+            logger.warning("Dropped %d agent heartbeats.", len(batch))
+
+    # Expire and purge commands across every agent, as command_queue.sweep_commands does.
+    async def sweep_commands(self) -> tuple:
+        expire, purge = expire_statements()
+        async with self.engine.begin() as conn:
+            expired = (await conn.execute(expire)).rowcount
+            purged = (await conn.execute(purge)).rowcount
+        return expired, purged
+
+    # Atomically claim the oldest deliverable command for an agent, as
+    # command_queue.claim_next_command does; returns the pre-claim row.
+    async def claim_next_command(self, agent_id: str):
+        for _ in range(CLAIM_RETRIES):
+            now = datetime.utcnow()
+            async with self.engine.begin() as conn:
+                candidate = (await conn.execute(claim_candidate_statement(agent_id, now))).first()
+                if candidate is None:
+                    return None
+                claimed = await conn.execute(claim_statement(candidate, now))
+            if claimed.rowcount:
+                return candidate
+        return None
+
+    # Claim a command, parking the request for up to wait_seconds.
+    async def wait_for_command(self, agent_id: str, wait_seconds: float):
+        command = await self.claim_next_command(agent_id)
+        if command is not None or wait_seconds <= 0:
+            return command
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait_seconds
+        entry = self.waiters.setdefault(agent_id, [asyncio.Event(), 0])
+        entry[1] += 1
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return None
+                try:
+                    await asyncio.wait_for(entry[0].wait(), remaining)
+                except asyncio.TimeoutError:
+                    return None
+                entry[0].clear()
+                # Another process may have claimed it first; keep waiting then.
+                command = await self.claim_next_command(agent_id)
+                if command is not None:
+                    return command
+        finally:
+            entry[1] -= 1
+            if entry[1] <= 0:
+                self.waiters.pop(agent_id, None)
+
+    # Wake parked agents that have a claimable command, in chunked IN queries.
+    async def sweep_waiters(self):
+        parked = list(self.waiters)
+        if not parked:
+            return
+        now = datetime.utcnow()
+        ready = set()
+        async with self.engine.connect() as conn:
+            for start in range(0, len(parked), SWEEP_CHUNK):
+                rows = await conn.execute(ready_agents_statement(parked[start:start + SWEEP_CHUNK], now))
+                ready.update(agent_id for (agent_id,) in rows)
+        for agent_id in ready:
+            entry = self.waiters.get(agent_id)
+            if entry:
+                entry[0].set()
+
+    # Upsert normalized records on conn; returns (outcome, detail keys to drop).
+    async def upsert_computers(self, conn, records: list):
+        # Later duplicates of a serial in the same batch win.
+        by_serial = {record["serial_number"]: record for record in records}
+        stored = dict((await conn.execute(stored_hashes_statement(list(by_serial)))).all())
+        outcome, changed = classify_records(by_serial, stored)
+        stale_keys = []
+        if changed:
+            await conn.execute(upsert_statement(changed, self.dialect))
+            # Core writes bypass the ETag session hooks; bump in the same transaction.
+            await conn.execute(bump_statement(["computers"]))
+            if outcome["updated"]:
+                stale_keys = detail_keys(await conn.execute(owners_statement(outcome["updated"])))
+        return outcome, stale_keys
+
+    # Load the registration response for one serial number.
+    async def registration_dict(self, conn, serial_number: str, outcome: str) -> dict:
+        row = (await conn.execute(registration_statement(serial_number))).one()
+        return registration_row_to_dict(row, outcome)
+
+
+# Drop detail cache entries off the event loop; a Redis call may block. API
+# workers already miss on the version bump; this frees shared entries early.
+async def _invalidate(keys: list):
+    if keys:
+        await asyncio.to_thread(invalidate_details, *keys)
+
+
+# Parse a JSON body the way request.get_json(silent=True) does.
+async def _json_body(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def _message(message: str, status: int) -> JSONResponse:
+    return JSONResponse({"message": message}, status_code=status)
+
+
+# POST /api/agents/register: full or delta registration, as on the Flask route.
+async def register_agent(request):
+    gateway = request.app.state.gateway
+    payload = await _json_body(request) or {}
+    if not isinstance(payload, dict):
+        payload = {}
+    agent_id = (payload.get("agentId") or "").strip()
+    serial_number = (payload.get("serialNumber") or "").strip()
+
+    if "baseHash" in payload:
+        changes = payload.get("changes") or {}
+        if not agent_id or not serial_number or not isinstance(changes, dict):
+            return _message("Missing required fields.", 400)
+        async with gateway.engine.begin() as conn:
+            stored = (
+                await conn.execute(select(*_DELTA_COLUMNS).where(Computer.serial_number == serial_number))
+            ).first()
+            base_hash = payload["baseHash"]
+            if stored is None or not base_hash or stored.inventory_hash != base_hash:
+                # Ask the agent to fall back to a full registration.
+                return _message("Inventory baseline is out of date.", 409)
+            stale_keys = []
+            if not changes and stored.agent_id == agent_id:
+                status = "unchanged"
+            else:
+                record = merge_inventory_delta(stored._mapping, agent_id, serial_number, changes)
+                if record is None:
+                    return _message("Inventory baseline is out of date.", 409)
+                outcome, stale_keys = await gateway.upsert_computers(conn, [record])
+                status = "updated" if outcome["updated"] else "unchanged"
+            response = await gateway.registration_dict(conn, serial_number, status)
+        await _invalidate(stale_keys)
+        return JSONResponse(response)
+
+    record = normalize_registration(payload)
+    if record is None:
+        return _message("Missing required fields.", 400)
+
+    # Treat re-registrations as updates for the same machine.
+    async with gateway.engine.begin() as conn:
+        outcome, stale_keys = await gateway.upsert_computers(conn, [record])
+        status = next(key for key in ("created", "updated", "unchanged") if outcome[key])
+        response = await gateway.registration_dict(conn, record["serial_number"], status)
+    await _invalidate(stale_keys)
+    return JSONResponse(response, status_code=201 if outcome["created"] else 200)
+
+
+# POST /api/agents/register/batch: many registrations in one upsert.
+async def register_agents_batch(request):
+    gateway = request.app.state.gateway
+    payload = await _json_body(request) or {}
+    items = payload.get("records") if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not items:
+        return _message("Records are required.", 400)
+    if len(items) > MAX_REGISTRATION_BATCH:
+        return _message(f"At most {MAX_REGISTRATION_BATCH} records per batch.", 400)
+
+    records, invalid = [], []
+    for index, item in enumerate(items):
+        record = normalize_registration(item)
+        if record is None:
+            invalid.append(index)
+        else:
+            records.append(record)
+
+    outcome, stale_keys = {"created": [], "updated": [], "unchanged": []}, []
+    if records:
+        async with gateway.engine.begin() as conn:
+            outcome, stale_keys = await gateway.upsert_computers(conn, records)
+    await _invalidate(stale_keys)
+    return JSONResponse(
+        {
+            "created": len(outcome["created"]),
+            "updated": len(outcome["updated"]),
+            "unchanged": len(outcome["unchanged"]),
+            "invalid": invalid,
+        }
+    )
+
+
+# GET /api/agents/<agent_id>/commands/next[?wait=<seconds>]
+async def get_next_command(request):
+    gateway = request.app.state.gateway
+    agent_id = request.path_params["agent_id"]
+    gateway.record_heartbeat(agent_id, (request.headers.get("X-Agent-Version") or "").strip()[:40] or None)
+
+    retry_after = gateway.config["AGENT_RETRY_AFTER_SECONDS"]
+    if retry_after > 0:
+        # Shed agent polling without touching the database.
+        return JSONResponse(
+            {"message": "Polling paused.", "retryAfter": retry_after},
+            status_code=503,
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    try:
+        wait = int(request.query_params.get("wait", 0))
+    except ValueError:
+        wait = 0
+    wait = max(0, min(wait, MAX_LONG_POLL_SECONDS))
+    next_poll = gateway.config["AGENT_POLL_INTERVAL_SECONDS"]
+
+    command = await gateway.wait_for_command(agent_id, wait)
+    return JSONResponse(
+        {"command": claimed_command_dict(command) if command is not None else None, "nextPollSeconds": next_poll}
+    )
+
+
+# POST /api/agents/<agent_id>/commands/<command_id>/complete
+async def complete_command(request):
+    gateway = request.app.state.gateway
+    agent_id = request.path_params["agent_id"]
+    command_id = request.path_params["command_id"]
+    payload = await _json_body(request) or {}
+    if not isinstance(payload, dict):
+        payload = {}
+    status = (payload.get("status") or "completed").strip().lower()
+    command_payload = payload.get("payload") or {}
+
+    if status not in {"completed", "failed"}:
+        return _message("Invalid status.", 400)
+
+    computer_id = command_payload.get("computerId")
+    async with gateway.engine.begin() as conn:
+        completed = await conn.execute(complete_statement(agent_id, command_id, status, datetime.utcnow()))
+        if not completed.rowcount:
+            # Already finished commands are acknowledged again; unknown ones are not.
+            if (await conn.execute(command_status_statement(agent_id, command_id))).first() is None:
+                return _message("Command not found.", 404)
+        compliance_changed = False
+        if computer_id:
+            result = await conn.execute(
+                update(Computer).where(Computer.id == computer_id).values(compliant=status == "completed")
+            )
+            compliance_changed = bool(result.rowcount)
+            if compliance_changed:
+                await conn.execute(bump_statement(["computers"]))
+    if compliance_changed:
+        await _invalidate([detail_key("computer", computer_id)])
+    return JSONResponse({"status": status})
+
+
+# Liveness probe with the number of long polls parked in this process.
+async def health_check(request):
+    return JSONResponse({"status": "ok", "parked": len(request.app.state.gateway.waiters)})
+
+
+# Build the ASGI app serving the agent protocol; run with `uvicorn gateway:app`.
+def create_gateway() -> Starlette:
+    config = Settings(os.path.dirname(os.path.abspath(__file__)))
+    config.from_object(Config)
+    gateway = AgentGateway(config)
+    # API workers see gateway writes through the table and row versions it
+    # bumps; deletes here only free entries early in the shared redis backend.
+    init_detail_cache(config)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        await gateway.start()
+        try:
+            yield
+        finally:
+            await gateway.stop()
+
+    app = Starlette(
+        routes=[
+            Route("/api/health", health_check),
+            Route("/api/agents/register", register_agent, methods=["POST"]),
+            Route("/api/agents/register/batch", register_agents_batch, methods=["POST"]),
+            Route("/api/agents/{agent_id}/commands/next", get_next_command),
+            Route("/api/agents/{agent_id}/commands/{command_id}/complete", complete_command, methods=["POST"]),
+        ],
+        lifespan=lifespan,
+    )
+    app.state.gateway = gateway
+    return app
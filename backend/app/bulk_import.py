@@ -0,0 +1,212 @@
+import csv
+import io
+
+from flask import request
+from sqlalchemy import insert, or_, select
+
+from .detail_cache import detail_key, invalidate_details
+from .etags import mark_tables_changed
+from .extensions import db
+from .models import User
+
+
+# Largest import accepted in one request.
+MAX_IMPORT_ROWS = 50000
+# Rows per set-based conflict/owner lookup and multi-row INSERT.
+IMPORT_BATCH_SIZE = 1000
+
+# Fields every imported asset needs: payload key -> column.
+_REQUIRED_FIELDS = {"name": "name", "model": "model", "serialNumber": "serial_number"}
+_TRUE_VALUES = {"1", "true", "yes"}
+_FALSE_VALUES = {"", "0", "false", "no"}
+
+
+# Parse UTF-8 CSV bytes into dicts, dropping the byte-order mark that
+# spreadsheet exports add so it does not stick to the first header.
+def _csv_rows(raw: bytes) -> list:
+    try:
+        text = raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("CSV must be UTF-8 encoded.") from None
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+# Read import rows from a JSON array (or {records}) or a CSV body/upload.
+# CSV headers use the API field names, so an export can be imported as is.
+def read_import_rows() -> list:
+    upload = request.files.get("file")
+    if upload is not None:
+        rows = _csv_rows(upload.read())
+    elif request.mimetype == "text/csv":
+        rows = _csv_rows(request.get_data())
+    else:
+        payload = request.get_json(silent=True)
+        rows = payload.get("records") if isinstance(payload, dict) else payload
+    if not isinstance(rows, list) or not rows:
+        raise ValueError("Records are required.")
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise ValueError(f"At most {MAX_IMPORT_ROWS} records per import.")
+    return rows
+
+
+# Accept JSON booleans and CSV-style true/false strings.
+def _parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    raw = str(value if value is not None else "").strip().lower()
+    if raw in _TRUE_VALUES:
+        return True
+    if raw in _FALSE_VALUES:
+        return False
+    raise ValueError("Invalid value for compliant.")
+
+
+# Read the owner reference: ("id", int), ("username", str) or None.
+def _owner_ref(item: dict):
+    user_id = item.get("userId")
+    if user_id is not None and str(user_id).strip():
+        try:
+            return "id", int(str(user_id).strip())
+        except ValueError:
+            raise ValueError("userId must be an integer.") from None
+    username = str(item.get("user") or "").strip()
+    return ("username", username) if username else None
+
+
+# Lookup key for an owner reference; usernames compare case-insensitively.
+def _owner_key(owner):
+    if owner is None or owner[0] == "id":
+        return owner
+    return "username", owner[1].casefold()
+
+
+# Normalize one import row into (column values, owner reference).
+def _normalize(item, fields: dict):
+    if not isinstance(item, dict):
+        raise ValueError("Record must be an object.")
+    # Trim inputs early; optional blanks are stored as NULL.
+    record = {
+        column: str(item.get(key) or "").strip() or None
+        for key, column in {**_REQUIRED_FIELDS, **fields}.items()
+    }
+    if any(not record[column] for column in _REQUIRED_FIELDS.values()):
+        raise ValueError("Missing required fields.")
+    record["compliant"] = _parse_bool(item.get("compliant"))
+    return record, _owner_ref(item)
+
+
+# Values of the unique columns already stored for a batch, casefolded
+# to match MySQL's case-insensitive collation.
+def _stored_values(model, unique_columns: tuple, batch: list) -> dict:
+    conditions = []
+    for column in unique_columns:
+        values = [record[column] for _, record, _ in batch if record.get(column)]
+        if values:
+            conditions.append(getattr(model, column).in_(values))
+    stored = {column: set() for column in unique_columns}
+    rows = db.session.execute(select(*[getattr(model, c) for c in unique_columns]).where(or_(*conditions)))
+    for row in rows:
+        for column, value in zip(unique_columns, row):
+            if value is not None:
+                stored[column].add(value.casefold())
+    return stored
+
+
+# Resolve a batch's owner references to user ids with one query.
+def _resolve_owners(batch: list) -> dict:
+    refs = {owner for _, _, owner in batch if owner is not None}
+    if not refs:
+        return {}
+    ids = [value for kind, value in refs if kind == "id"]
+    usernames = [value for kind, value in refs if kind == "username"]
+    resolved = {}
+    rows = db.session.execute(
+        select(User.id, User.username).where(or_(User.id.in_(ids), User.username.in_(usernames)))
+    )
+    for user_id, username in rows:
+        resolved[("id", user_id)] = user_id
+        resolved[("username", username.casefold())] = user_id
+    return resolved
+
+
+# Import assets of `model` in one transaction and report on every row.
+# fields maps optional payload keys to columns; unique_columns are checked
+# against the file and the table before inserting. With dry_run nothing is
+# written. Raises IntegrityError if a concurrent write takes a unique value.
+def import_assets(model, fields: dict, unique_columns: tuple, rows: list, dry_run: bool = False) -> dict:
+    names = {column: key for key, column in {**_REQUIRED_FIELDS, **fields}.items()}
+    report = [None] * len(rows)
+    pending = []
+    for index, item in enumerate(rows):
+        try:
+            record, owner = _normalize(item, fields)
+        except ValueError as exc:
+            report[index] = {"index": index, "status": "invalid", "message": str(exc)}
+            continue
+        pending.append((index, record, owner))
+
+    # Unique values of accepted rows only, so a rejected row does not make a
+    # later, valid row with the same value look like a duplicate.
+    seen = {column: set() for column in unique_columns}
+    created = []
+    for start in range(0, len(pending), IMPORT_BATCH_SIZE):
+        batch = pending[start:start + IMPORT_BATCH_SIZE]
+        stored = _stored_values(model, unique_columns, batch)
+        owners = _resolve_owners(batch)
+        values = []
+        for index, record, owner in batch:
+            entry = {"index": index, "serialNumber": record["serial_number"]}
+            taken = [c for c in unique_columns if record.get(c) and record[c].casefold() in stored[c]]
+            if taken:
+                report[index] = {**entry, "status": "conflict", "message": f"{names[taken[0]]} already exists."}
+                continue
+            owner = _owner_key(owner)
+            if owner is not None and owner not in owners:
+                report[index] = {**entry, "status": "invalid", "message": "User not found."}
+                continue
+            repeated = [c for c in unique_columns if record.get(c) and record[c].casefold() in seen[c]]
+            if repeated:
+                report[index] = {
+                    **entry,
+                    "status": "duplicate",
+                    "message": f"Repeats {names[repeated[0]]} of an earlier record.",
+                }
+                continue
+            for column in unique_columns:
+                if record.get(column):
+                    seen[column].add(record[column].casefold())
+            record["user_id"] = owners.get(owner)
+            report[index] = {**entry, "status": "created"}
+            values.append(record)
+            created.append((index, record))
+        if values and not dry_run:
+            # One multi-row INSERT per batch, all inside the same transaction.
+            db.session.execute(insert(model), values)
+
+    if created and not dry_run:
+        mark_tables_changed(model.__tablename__)
+        _attach_ids(model, created, report)
+        db.session.commit()
+        owner_ids = {record["user_id"] for _, record in created if record["user_id"] is not None}
+        invalidate_details(*[detail_key("user", user_id) for user_id in owner_ids])
+
+    counts = {status: 0 for status in ("created", "conflict", "duplicate", "invalid")}
+    for entry in report:
+        counts[entry["status"]] += 1
+    return {**counts, "dryRun": dry_run, "rows": report}
+
+
+# Fill the new primary keys into the report, one query per batch.
+def _attach_ids(model, created: list, report: list):
+    index_by_serial = {record["serial_number"]: index for index, record in created}
+    serials = list(index_by_serial)
+    for start in range(0, len(serials), IMPORT_BATCH_SIZE):
+        rows = db.session.execute(
+            select(model.id, model.serial_number).where(
+                model.serial_number.in_(serials[start:start + IMPORT_BATCH_SIZE])
+            )
+        )
+        for asset_id, serial_number in rows:
+            index = index_by_serial.get(serial_number)
+            if index is not None:
+                report[index]["id"] = asset_id
@@ -0,0 +1,12 @@
+import click
+
+from .command_queue import sweep_commands
+
+
+# Register maintenance commands on the app's `flask` CLI.
+def init_cli(app):
+    # Expire overdue agent commands and purge old finished ones for every agent.
+    @app.cli.command("expire-commands")
+    def expire_commands_command():
+        expired, purged = sweep_commands()
+        click.echo(f"Expired {expired} command(s), purged {purged}.")
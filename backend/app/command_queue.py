@@ -0,0 +1,391 @@
+import calendar
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+
+from .extensions import db
+from .models import AgentCommand
+
+
+# Commands nobody picks up within this window are expired.
+DEFAULT_COMMAND_TTL_SECONDS = 24 * 60 * 60
+# Dispatched commands without a completion ack become claimable again.
+VISIBILITY_TIMEOUT_SECONDS = 5 * 60
+# Give up on a command after this many dispatches.
+MAX_DISPATCH_ATTEMPTS = 3
+# Finished and expired rows are kept this long for auditing.
+COMMAND_RETENTION_SECONDS = 7 * 24 * 60 * 60
+# Rows per multi-row INSERT when fanning out a rollout.
+_BULK_INSERT_CHUNK = 1000
+# Retries when another worker wins the race for the same row.
+CLAIM_RETRIES = 3
+# Upper bound for ?wait= on commands/next.
+MAX_LONG_POLL_SECONDS = 30
+# One thread per worker checks all of its parked long polls for commands this
+# often, so enqueues from other workers or the gateway arrive within it.
+LONG_POLL_SWEEP_SECONDS = 0.5
+# Parked agents checked per sweep query.
+SWEEP_CHUNK = 1000
+
+logger = logging.getLogger(__name__)
+
+# Per-agent wake-up events for long polls parked in this process.
+# Structure: { agent_id: [event, waiter_count] }
+_waiters_lock = threading.Lock()
+_waiters: dict[str, list] = {}
+_parked = {"count": 0}
+_watcher = {"thread": None, "pid": None, "app": None}
+
+PENDING_STATUSES = ("queued", "dispatched")
+FINISHED_STATUSES = ("completed", "failed", "expired")
+# Columns a claim reads; command_to_dict only needs these.
+CLAIM_COLUMNS = (
+    AgentCommand.id,
+    AgentCommand.command_type,
+    AgentCommand.payload,
+    AgentCommand.status,
+    AgentCommand.attempts,
+    AgentCommand.created_at,
+)
+
+
+class LongPollCapacityReached(RuntimeError):
+    # Raised when this worker already parks its maximum number of long polls;
+    # the route answers at once so parked agents never take every thread.
+    pass
+
+
+# Serialize a command for the agent API.
+def command_to_dict(command: AgentCommand) -> dict:
+    return {
+        "id": command.id,
+        "type": command.command_type,
+        "payload": command.payload or {},
+        "status": command.status,
+        # Unix epoch seconds keep payloads simple for the demo agent.
+        "createdAt": calendar.timegm(command.created_at.utctimetuple()),
+    }
+
+
+# Build the column values for a queued command.
+def _command_values(agent_id: str, command_type: str, payload: dict, ttl_seconds, now, rollout_id=None) -> dict:
+    ttl = ttl_seconds or DEFAULT_COMMAND_TTL_SECONDS
+    return {
+        "id": uuid.uuid4().hex,
+        "agent_id": agent_id,
+        "rollout_id": rollout_id,
+        "command_type": command_type,
+        "payload": payload,
+        "status": "queued",
+        "attempts": 0,
+        "created_at": now,
+        "expires_at": now + timedelta(seconds=ttl),
+    }
+
+
+# Build a queued command row without adding it to the session.
+def build_command(agent_id: str, command_type: str, payload: dict, ttl_seconds=None, now=None):
+    now = now or datetime.utcnow()
+    return AgentCommand(**_command_values(agent_id, command_type, payload, ttl_seconds, now))
+
+
+# Persist a new command for one agent and tidy that agent's old rows.
+def enqueue_command(agent_id: str, command_type: str, payload: dict, ttl_seconds=None) -> AgentCommand:
+    now = datetime.utcnow()
+    expire_commands(agent_id, now)
+    command = build_command(agent_id, command_type, payload, ttl_seconds, now)
+    db.session.add(command)
+    db.session.commit()
+    notify_agent(agent_id)
+    return command
+
+
+# Queue the same command for many agents with chunked multi-row INSERTs.
+def enqueue_rollout(agent_ids: list, command_type: str, payload: dict, ttl_seconds=None) -> str:
+    rollout_id = uuid.uuid4().hex
+    now = datetime.utcnow()
+    rows = [
+        _command_values(agent_id, command_type, payload, ttl_seconds, now, rollout_id)
+        for agent_id in agent_ids
+    ]
+    for start in range(0, len(rows), _BULK_INSERT_CHUNK):
+        db.session.execute(insert(AgentCommand), rows[start:start + _BULK_INSERT_CHUNK])
+    db.session.commit()
+    for agent_id in agent_ids:
+        notify_agent(agent_id)
+    return rollout_id
+
+
+# Count a rollout's commands by status.
+def rollout_status_counts(rollout_id: str) -> dict:
+    rows = (
+        db.session.query(AgentCommand.status, func.count())
+        .filter(AgentCommand.rollout_id == rollout_id)
+        .group_by(AgentCommand.status)
+        .all()
+    )
+    return {status: count for status, count in rows}
+
+
+# Build the (expire, purge) statements for one agent or, without agent_id,
+# the whole table: overdue commands become expired and finished rows past
+# retention are deleted.
+def expire_statements(agent_id=None, now=None) -> tuple:
+    now = now or datetime.utcnow()
+    scope = [AgentCommand.agent_id == agent_id] if agent_id is not None else []
+    visibility_cutoff = now - timedelta(seconds=VISIBILITY_TIMEOUT_SECONDS)
+    expire = (
+        update(AgentCommand)
+        .where(
+            *scope,
+            AgentCommand.status.in_(PENDING_STATUSES),
+            or_(
+                AgentCommand.expires_at <= now,
+                and_(
+                    AgentCommand.status == "dispatched",
+                    AgentCommand.dispatched_at < visibility_cutoff,
+                    AgentCommand.attempts >= MAX_DISPATCH_ATTEMPTS,
+                ),
+            ),
+        )
+        .values(status="expired", completed_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    retention_cutoff = now - timedelta(seconds=COMMAND_RETENTION_SECONDS)
+    purge = (
+        delete(AgentCommand)
+        .where(
+            *scope,
+            AgentCommand.status.in_(FINISHED_STATUSES),
+            AgentCommand.created_at < retention_cutoff,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return expire, purge
+
+
+# Mark overdue commands expired and purge finished rows past retention, for
+# one agent or, without agent_id, the whole table. Returns (expired, purged).
+def expire_commands(agent_id=None, now=None) -> tuple:
+    expire, purge = expire_statements(agent_id, now)
+    return db.session.execute(expire).rowcount, db.session.execute(purge).rowcount
+
+
+# Expire and purge across every agent in its own transaction. Agents that
+# never receive another command are only tidied here.
+def sweep_commands(now=None) -> tuple:
+    try:
+        counts = expire_commands(now=now)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return counts
+
+
+# Match commands an agent may receive right now.
+def claimable(now: datetime):
+    visibility_cutoff = now - timedelta(seconds=VISIBILITY_TIMEOUT_SECONDS)
+    return and_(
+        AgentCommand.expires_at > now,
+        or_(
+            AgentCommand.status == "queued",
+            # Redeliver commands whose previous dispatch was never acknowledged.
+            and_(
+                AgentCommand.status == "dispatched",
+                AgentCommand.dispatched_at < visibility_cutoff,
+                AgentCommand.attempts < MAX_DISPATCH_ATTEMPTS,
+            ),
+        ),
+    )
+
+
+# Select the oldest deliverable command for an agent as CLAIM_COLUMNS.
+# SKIP LOCKED lets concurrent pollers on MySQL pass over a row another
+# worker is claiming; SQLite ignores the clause and serializes writers.
+def claim_candidate_statement(agent_id: str, now: datetime):
+    return (
+        select(*CLAIM_COLUMNS)
+        .where(AgentCommand.agent_id == agent_id, claimable(now))
+        .order_by(AgentCommand.created_at, AgentCommand.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+
+
+# Mark a candidate dispatched, compare-and-set on its observed state so only
+# one claimer wins; a rowcount of 0 means another poller took it.
+def claim_statement(candidate, now: datetime):
+    return (
+        update(AgentCommand)
+        .where(
+            AgentCommand.id == candidate.id,
+            AgentCommand.status == candidate.status,
+            AgentCommand.attempts == candidate.attempts,
+        )
+        .values(status="dispatched", dispatched_at=now, attempts=AgentCommand.attempts + 1)
+    )
+
+
+# Serialize a command just claimed through claim_statement; the candidate
+# row was read before the claim, so report the status the claim wrote.
+def claimed_command_dict(candidate) -> dict:
+    return {**command_to_dict(candidate), "status": "dispatched"}
+
+
+# Atomically claim the oldest deliverable command for an agent. Returns the
+# candidate row as read before the claim; serialize it with claimed_command_dict.
+def claim_next_command(agent_id: str):
+    for _ in range(CLAIM_RETRIES):
+        now = datetime.utcnow()
+        candidate = db.session.execute(claim_candidate_statement(agent_id, now)).first()
+        if candidate is None:
+            db.session.commit()
+            return None
+        claimed = db.session.execute(claim_statement(candidate, now)).rowcount
+        db.session.commit()
+        if claimed:
+            return candidate
+    return None
+
+
+# Finish a pending command; acknowledgements for finished ones change nothing.
+def complete_statement(agent_id: str, command_id: str, status: str, now: datetime):
+    return (
+        update(AgentCommand)
+        .where(
+            AgentCommand.id == command_id,
+            AgentCommand.agent_id == agent_id,
+            AgentCommand.status.in_(PENDING_STATUSES),
+        )
+        .values(status=status, completed_at=now)
+    )
+
+
+# Select the status of one agent's command, to tell finished from unknown.
+def command_status_statement(agent_id: str, command_id: str):
+    return select(AgentCommand.status).where(AgentCommand.id == command_id, AgentCommand.agent_id == agent_id)
+
+
+# Record the agent's acknowledgement for a dispatched command. Returns False
+# if the agent has no such command.
+def complete_command_record(agent_id: str, command_id: str, status: str) -> bool:
+    if db.session.execute(complete_statement(agent_id, command_id, status, datetime.utcnow())).rowcount:
+        return True
+    return db.session.execute(command_status_statement(agent_id, command_id)).first() is not None
+
+
+# Select which of agent_ids have a command they could claim right now.
+def ready_agents_statement(agent_ids: list, now: datetime):
+    return select(AgentCommand.agent_id).where(AgentCommand.agent_id.in_(agent_ids), claimable(now)).distinct()
+
+
+# Agents among agent_ids with a claimable command, one query per chunk.
+def ready_agent_ids(agent_ids: list) -> set:
+    now = datetime.utcnow()
+    ready = set()
+    for start in range(0, len(agent_ids), SWEEP_CHUNK):
+        rows = db.session.execute(ready_agents_statement(agent_ids[start:start + SWEEP_CHUNK], now))
+        ready.update(agent_id for (agent_id,) in rows)
+    return ready
+
+
+# Wake any long polls for this agent parked in the current process.
+def notify_agent(agent_id: str):
+    with _waiters_lock:
+        entry = _waiters.get(agent_id)
+    if entry:
+        entry[0].set()
+
+
+# Register a long-poll waiter and return its shared wake-up event, or None
+# when max_parked polls are already parked in this process.
+def _add_waiter(agent_id: str, max_parked: int):
+    with _waiters_lock:
+        if _parked["count"] >= max_parked:
+            return None
+        _parked["count"] += 1
+        entry = _waiters.setdefault(agent_id, [threading.Event(), 0])
+        entry[1] += 1
+        return entry[0]
+
+
+# Drop a long-poll waiter, forgetting the event once nobody waits on it.
+def _remove_waiter(agent_id: str):
+    with _waiters_lock:
+        _parked["count"] -= 1
+        entry = _waiters.get(agent_id)
+        if entry:
+            entry[1] -= 1
+            if entry[1] <= 0:
+                _waiters.pop(agent_id, None)
+
+
+# Start this worker's long-poll sweep thread if it is not running.
+def _ensure_watcher(app):
+    _watcher["app"] = app
+    thread = _watcher["thread"]
+    if thread is not None and thread.is_alive() and _watcher["pid"] == os.getpid():
+        return
+    with _waiters_lock:
+        thread = _watcher["thread"]
+        if thread is not None and thread.is_alive() and _watcher["pid"] == os.getpid():
+            return
+        thread = threading.Thread(target=_watch_loop, name="long-poll-sweep", daemon=True)
+        _watcher["thread"] = thread
+        _watcher["pid"] = os.getpid()
+        thread.start()
+
+
+# Wake parked long polls whose agent has a claimable command. Parked agents
+# cost no queries of their own; the sweep is one query per chunk of agents.
+def _watch_loop():
+    while True:
+        time.sleep(LONG_POLL_SWEEP_SECONDS)
+        with _waiters_lock:
+            parked = list(_waiters)
+        if not parked:
+            continue
+        with _watcher["app"].app_context():
+            try:
+                ready = ready_agent_ids(parked)
+            except Exception:
+                # Parked polls time out and the agents poll again.
+                logger.exception("Long-poll sweep failed.")
+                continue
+        for agent_id in ready:
+            notify_agent(agent_id)
+
+
+# Claim a command, holding the request open for up to wait_seconds. Raises
+# LongPollCapacityReached instead of parking once max_parked polls wait here.
+def wait_for_command(agent_id: str, wait_seconds: float, max_parked: int):
+    command = claim_next_command(agent_id)
+    if command is not None or wait_seconds <= 0:
+        return command
+
+    _ensure_watcher(current_app._get_current_object())
+    deadline = time.monotonic() + wait_seconds
+    event = _add_waiter(agent_id, max_parked)
+    if event is None:
+        raise LongPollCapacityReached("Too many long polls parked in this worker.")
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            # Local enqueues wake us at once; the sweep thread wakes us for
+            # commands enqueued by other workers or the gateway.
+            if remaining <= 0 or not event.wait(remaining):
+                return None
+            event.clear()
+            # Another poller may have claimed it first; keep waiting then.
+            command = claim_next_command(agent_id)
+            if command is not None:
+                return command
+    finally:
+        _remove_waiter(agent_id)
@@ -1,9 +1,16 @@
 import os
 from dotenv import load_dotenv
 
+from .pool import InstrumentedQueuePool
+
 # Load local environment overrides for development.
 load_dotenv()
 
+# Host CPUs and the Gunicorn worker count as gunicorn.conf.py derives it, for
+# per-worker settings that should add up to the host.
+_CPUS = os.cpu_count() or 1
+_GUNICORN_WORKERS = max(int(os.getenv("GUNICORN_WORKERS", str(_CPUS * 2 + 1))), 1)
+
 
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret")
@@ -16,9 +23,72 @@ class Config:
         f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection pool sizing, per worker process. Size it against the
+    # checkout waits reported by /api/health/pool.
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
     SQLALCHEMY_ENGINE_OPTIONS = {
-        # Keep connections healthy in long-running dev servers.
-        "pool_pre_ping": True,
-        "pool_recycle": 1800,
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        # Keep connections healthy in long-running servers; recycle before
+        # MySQL's wait_timeout drops idle connections.
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
     }
+    # Compare the database's Alembic revision with the code on boot.
+    SCHEMA_CHECK_ON_STARTUP = os.getenv("SCHEMA_CHECK_ON_STARTUP", "true").lower() == "true"
+    # Serialized user/device/computer detail payloads. "local" is an LRU per
+    # worker; "redis" shares entries and invalidations across workers.
+    # A TTL of 0 disables the cache.
+    DETAIL_CACHE_BACKEND = os.getenv("DETAIL_CACHE_BACKEND", "local").lower()
+    DETAIL_CACHE_URL = os.getenv("DETAIL_CACHE_URL", "redis://localhost:6379/0")
+    DETAIL_CACHE_TTL_SECONDS = float(os.getenv("DETAIL_CACHE_TTL_SECONDS", "30"))
+    DETAIL_CACHE_MAX_ENTRIES = int(os.getenv("DETAIL_CACHE_MAX_ENTRIES", "10000"))
+    # "orjson" encodes responses with orjson when it is installed; "default"
+    # keeps Flask's stdlib provider.
+    JSON_PROVIDER = os.getenv("JSON_PROVIDER", "orjson").lower()
+    # Optional asyncio gateway for the agent protocol (gateway.py). It uses the
+    # same database through an async driver and checks parked long polls for
+    # new commands every AGENT_GATEWAY_SWEEP_SECONDS.
+    AGENT_GATEWAY_DATABASE_URI = os.getenv(
+        "AGENT_GATEWAY_DATABASE_URI",
+        f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}",
+    )
+    AGENT_GATEWAY_SWEEP_SECONDS = float(os.getenv("AGENT_GATEWAY_SWEEP_SECONDS", "1"))
+    # Password hashing and checks run in a per-worker process pool so KDF work
+    # never holds the GIL in request threads. PASSWORD_HASH_WORKERS=0 hashes
+    # inline; the default splits the host's CPUs across Gunicorn workers, with
+    # at least one process each. Beyond MAX_PENDING queued calls, requests get
+    # 503 + Retry-After.
+    # Changing the method/work factor rehashes each password on its next login;
+    # give it in full as stored in hashes (e.g. "pbkdf2:sha256:1000000").
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(_CPUS // _GUNICORN_WORKERS, 1))))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "16"))
+    PASSWORD_HASH_TIMEOUT_SECONDS = float(os.getenv("PASSWORD_HASH_TIMEOUT_SECONDS", "10"))
+    PASSWORD_HASH_RETRY_AFTER_SECONDS = int(os.getenv("PASSWORD_HASH_RETRY_AFTER_SECONDS", "2"))
+    # Largest share of active users one POST /api/users/sync may deactivate;
+    # a bigger drop usually means a truncated export, so the sync is refused.
+    DIRECTORY_SYNC_MAX_DEACTIVATE_RATIO = float(os.getenv("DIRECTORY_SYNC_MAX_DEACTIVATE_RATIO", "0.1"))
     CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:4200").split(",")
+    # Pause agents should take between command polls; raise it during incidents.
+    AGENT_POLL_INTERVAL_SECONDS = int(os.getenv("AGENT_POLL_INTERVAL_SECONDS", "0"))
+    # Every worker's heartbeat thread expires and purges agent commands across
+    # all agents at this interval (0 disables; `flask --app manage
+    # expire-commands` does the same from cron).
+    COMMAND_SWEEP_SECONDS = float(os.getenv("COMMAND_SWEEP_SECONDS", "600"))
+    # Long polls one worker may park at a time. Each holds a Gunicorn thread,
+    # so the default leaves half of GUNICORN_THREADS for the API. Polls past
+    # the cap return at once and tell the agent to come back after
+    # AGENT_LONG_POLL_BUSY_SECONDS.
+    AGENT_LONG_POLL_MAX_PARKED = int(
+        os.getenv("AGENT_LONG_POLL_MAX_PARKED", str(max(int(os.getenv("GUNICORN_THREADS", "8")) // 2, 1)))
+    )
+    AGENT_LONG_POLL_BUSY_SECONDS = int(os.getenv("AGENT_LONG_POLL_BUSY_SECONDS", "10"))
+    # When non-zero, commands/next sheds load with 503 and this Retry-After.
+    AGENT_RETRY_AFTER_SECONDS = int(os.getenv("AGENT_RETRY_AFTER_SECONDS", "0"))
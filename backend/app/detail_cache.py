@@ -0,0 +1,215 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g
+
+
+logger = logging.getLogger(__name__)
+
+
+class CacheStats:
+    # Per-process hit/miss/eviction counters for the detail cache.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {
+            "hits": 0, "misses": 0, "stale": 0, "revalidations": 0, "evictions": 0, "expirations": 0,
+            "invalidations": 0, "errors": 0,
+        }
+
+    def incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counts[name] += amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        lookups = counts["hits"] + counts["misses"]
+        counts["hitRate"] = round(counts["hits"] / lookups, 4) if lookups else 0
+        return counts
+
+
+class LocalDetailCache:
+    # Bounded in-process LRU with a per-entry TTL. Entries carry the table
+    # versions and row stamp they were built at, so writes in other workers
+    # or the gateway are seen through those checks rather than invalidations.
+
+    name = "local"
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        # Structure: { key: (expires_at, versions, stamp, payload) }, least recently used first.
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                self.stats.incr("expirations")
+                return None
+            self._entries.move_to_end(key)
+            return entry[1:]
+
+    def set(self, key: str, versions: str, stamp: str, payload: dict):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, versions, stamp, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.incr("evictions")
+
+    def delete(self, keys: list):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        return {"backend": self.name, "size": size, "maxEntries": self.max_entries, **self.stats.snapshot()}
+
+
+class RedisDetailCache:
+    # Shared Redis store so every worker sees the same entries and deletes.
+    # Redis enforces the TTL and evicts under its maxmemory-policy (use
+    # allkeys-lru); a cache outage degrades to database reads.
+
+    name = "redis"
+    _PREFIX = "allotted:detail:"
+
+    def __init__(self, url: str, ttl_seconds: float):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("DETAIL_CACHE_BACKEND=redis requires the redis package.") from exc
+        self._errors = redis.RedisError
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+
+    def get(self, key: str):
+        try:
+            raw = self._client.get(self._PREFIX + key)
+        except self._errors:
+            self.stats.incr("errors")
+            return None
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        return entry["versions"], entry.get("stamp"), entry["payload"]
+
+    def set(self, key: str, versions: str, stamp: str, payload: dict):
+        entry = {"versions": versions, "stamp": stamp, "payload": payload}
+        try:
+            self._client.set(self._PREFIX + key, json.dumps(entry), ex=max(int(self.ttl_seconds), 1))
+        except self._errors:
+            self.stats.incr("errors")
+
+    def delete(self, keys: list):
+        try:
+            self._client.delete(*[self._PREFIX + key for key in keys])
+        except self._errors:
+            # Entries expire on their own; staleness is bounded by the TTL.
+            self.stats.incr("errors")
+            logger.warning("Detail cache invalidation failed for %s.", keys)
+
+    def snapshot(self) -> dict:
+        status = {"backend": self.name, **self.stats.snapshot()}
+        try:
+            # Server-wide counter; covers keys evicted for every worker.
+            status["evictions"] = self._client.info("stats").get("evicted_keys", 0)
+        except self._errors:
+            pass
+        return status
+
+
+_cache = {"backend": None}
+
+
+# Build the cache backend from a config mapping (Flask's app.config or the
+# gateway's Settings).
+def init_detail_cache(config):
+    ttl = config["DETAIL_CACHE_TTL_SECONDS"]
+    if ttl <= 0:
+        _cache["backend"] = None
+    elif config["DETAIL_CACHE_BACKEND"] == "redis":
+        _cache["backend"] = RedisDetailCache(config["DETAIL_CACHE_URL"], ttl)
+    else:
+        _cache["backend"] = LocalDetailCache(config["DETAIL_CACHE_MAX_ENTRIES"], ttl)
+
+
+# Return the cached payload for key, or build it with load() and cache it.
+# load() returns (payload, row stamp) and stamp() reads the current row stamp
+# (see row_stamp) on its own. Must run under etags.conditional_get: entries
+# are tagged with the table versions it read and are served without a query
+# while those hold. After a write anywhere in those tables the entry is
+# revalidated against its rows' versions, so only a write to the rows it was
+# built from, in any worker or the gateway, makes it a miss.
+def cached_detail(key: str, load, stamp):
+    backend = _cache["backend"]
+    versions = g.get("table_versions")
+    if backend is None or versions is None:
+        return load()[0]
+    entry = backend.get(key)
+    if entry is not None:
+        entry_versions, entry_stamp, payload = entry
+        if entry_versions == versions:
+            backend.stats.incr("hits")
+            return payload
+        if entry_stamp is not None and stamp() == entry_stamp:
+            backend.stats.incr("hits")
+            backend.stats.incr("revalidations")
+            # Retag so later reads at these versions skip the stamp query.
+            backend.set(key, versions, entry_stamp, payload)
+            return payload
+    backend.stats.incr("misses")
+    if entry is not None:
+        backend.stats.incr("stale")
+
+    # The versions were read before the load, so a write that lands during
+    # it leaves the entry tagged with outdated versions; the stamp comes from
+    # the same rows as the payload and still validates it.
+    payload, built_stamp = load()
+    backend.set(key, versions, built_stamp, payload)
+    return payload
+
+
+# Stamp for the rows a payload was built from: an iterable of tuples, each
+# ending in a row_version. Order-insensitive; None when there are no rows.
+def row_stamp(rows):
+    parts = sorted(":".join(str(value) for value in row) for row in rows)
+    return ",".join(parts) if parts else None
+
+
+# Drop cached payloads after a committed write; None keys are ignored.
+# Version tags already keep readers correct; this frees the entries early.
+def invalidate_details(*keys):
+    keys = [key for key in keys if key is not None]
+    if not keys:
+        return
+    backend = _cache["backend"]
+    if backend is not None:
+        backend.delete(keys)
+        backend.stats.incr("invalidations", len(keys))
+
+
+# Cache key for one entity's detail payload, or None without an id.
+def detail_key(kind: str, entity_id):
+    return f"{kind}:{entity_id}" if entity_id is not None else None
+
+
+# Hit/miss/eviction counters and occupancy for /api/health/cache.
+def detail_cache_stats() -> dict:
+    backend = _cache["backend"]
+    if backend is None:
+        return {"backend": "disabled"}
+    return backend.snapshot()
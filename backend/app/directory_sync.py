@@ -0,0 +1,164 @@
+from sqlalchemy import func, insert, select, true, update
+
+from .detail_cache import detail_key, invalidate_details
+from .etags import mark_tables_changed
+from .extensions import db
+from .models import User
+from .passwords import hash_password
+from .usernames import allocate_usernames, username_base
+
+
+# Rows per multi-row INSERT and per bulk UPDATE.
+SYNC_BATCH_SIZE = 1000
+# Temporary password for accounts created by a sync, as for create_user.
+_DEFAULT_PASSWORD = "password123"
+# Columns a sync compares and overwrites: column -> API field.
+_SYNC_FIELDS = {"full_name": "fullName", "department": "department", "role": "role"}
+
+
+# Normalize one directory record, raising ValueError if it is unusable.
+def _normalize(item) -> dict:
+    if not isinstance(item, dict):
+        raise ValueError("Record must be an object.")
+    # Normalize inputs early to keep validation predictable.
+    first_name = str(item.get("firstName") or "").strip()
+    last_name = str(item.get("lastName") or "").strip()
+    email = str(item.get("email") or "").strip().lower()
+    department = str(item.get("department") or "").strip()
+    if not first_name or not last_name or not email or not department:
+        raise ValueError("Missing required fields.")
+    record = {
+        "email": email,
+        "full_name": f"{first_name} {last_name}",
+        "department": department,
+        "base": username_base(first_name, last_name),
+    }
+    # Roles are managed in the app unless the export carries them.
+    role = str(item.get("role") or "").strip()
+    if role:
+        record["role"] = role
+    return record
+
+
+# Diff a full directory export against the users table in memory.
+# Returns the plan: creates, updates (with per-field changes), deactivations,
+# the unchanged count and invalid rows. Users missing from the export are
+# only deactivated with deactivate_missing. Usernames for new users are
+# allocated for the whole batch up front.
+def plan_sync(rows: list, deactivate_missing: bool = False) -> dict:
+    plan = {"create": [], "update": [], "deactivate": [], "unchanged": 0, "invalid": []}
+    records = {}
+    for index, item in enumerate(rows):
+        try:
+            record = _normalize(item)
+        except ValueError as exc:
+            plan["invalid"].append({"index": index, "message": str(exc)})
+            continue
+        if record["email"] in records:
+            plan["invalid"].append({"index": index, "message": "Repeats the email of an earlier record."})
+            continue
+        records[record["email"]] = record
+
+    existing = db.session.execute(
+        select(User.id, User.username, User.email, User.full_name, User.department, User.role, User.active)
+    ).all()
+    for user in existing:
+        record = records.pop(user.email.lower(), None)
+        if record is None:
+            if deactivate_missing and user.active:
+                plan["deactivate"].append({"id": user.id, "username": user.username, "email": user.email})
+            continue
+        changes = {
+            field: {"from": getattr(user, column), "to": record[column]}
+            for column, field in _SYNC_FIELDS.items()
+            if column in record and record[column] != getattr(user, column)
+        }
+        if not user.active:
+            changes["active"] = {"from": False, "to": True}
+        if changes:
+            plan["update"].append({"id": user.id, "username": user.username, "email": user.email, "changes": changes})
+        else:
+            plan["unchanged"] += 1
+
+    # Whatever is left in the export has no account yet.
+    new_records = list(records.values())
+    usernames = allocate_usernames([record["base"] for record in new_records])
+    for record, username in zip(new_records, usernames):
+        plan["create"].append(
+            {
+                "username": username,
+                "email": record["email"],
+                "fullName": record["full_name"],
+                "department": record["department"],
+                "role": record.get("role", "user"),
+            }
+        )
+    return plan
+
+
+# Refuse a plan built from a damaged export, raising ValueError: any invalid
+# row may be a truncated or misparsed file, whose missing users would all be
+# deactivated, and no run may deactivate more than max_deactivate_ratio of
+# the active users.
+def check_plan(plan: dict, max_deactivate_ratio: float):
+    if plan["invalid"]:
+        raise ValueError(
+            f"{len(plan['invalid'])} record(s) are invalid; fix them before applying the sync (see ?dryRun=true)."
+        )
+    if plan["deactivate"]:
+        active = db.session.execute(select(func.count()).select_from(User).where(User.active == true())).scalar()
+        if len(plan["deactivate"]) > max_deactivate_ratio * active:
+            raise ValueError(
+                f"The sync would deactivate {len(plan['deactivate'])} of {active} active users, "
+                f"more than the {max_deactivate_ratio:.0%} allowed per run."
+            )
+
+
+# Apply a sync plan with chunked multi-row statements in one transaction,
+# after check_plan accepts it.
+def apply_sync(plan: dict, max_deactivate_ratio: float):
+    check_plan(plan, max_deactivate_ratio)
+    if not (plan["create"] or plan["update"] or plan["deactivate"]):
+        return
+    # Hash the shared temporary password once rather than once per account.
+    password_hash = hash_password(_DEFAULT_PASSWORD)
+    new_rows = [
+        {
+            "username": entry["username"],
+            "email": entry["email"],
+            "full_name": entry["fullName"],
+            "department": entry["department"],
+            "role": entry["role"],
+            "password_hash": password_hash,
+            "active": True,
+        }
+        for entry in plan["create"]
+    ]
+    columns = {field: column for column, field in _SYNC_FIELDS.items()}
+    columns["active"] = "active"
+    changed_rows = [
+        {"id": entry["id"], **{columns[field]: change["to"] for field, change in entry["changes"].items()}}
+        for entry in plan["update"]
+    ]
+    deactivated = [entry["id"] for entry in plan["deactivate"]]
+
+    for start in range(0, len(new_rows), SYNC_BATCH_SIZE):
+        db.session.execute(insert(User), new_rows[start:start + SYNC_BATCH_SIZE])
+    # Group updates by the columns they set so each group is one executemany.
+    by_columns: dict[tuple, list] = {}
+    for row in changed_rows:
+        by_columns.setdefault(tuple(sorted(row)), []).append(row)
+    for group in by_columns.values():
+        for start in range(0, len(group), SYNC_BATCH_SIZE):
+            db.session.execute(update(User), group[start:start + SYNC_BATCH_SIZE])
+    for start in range(0, len(deactivated), SYNC_BATCH_SIZE):
+        db.session.execute(
+            update(User)
+            .where(User.id.in_(deactivated[start:start + SYNC_BATCH_SIZE]))
+            .values(active=False)
+            .execution_options(synchronize_session=False)
+        )
+    mark_tables_changed("users")
+    db.session.commit()
+    stale_ids = [row["id"] for row in changed_rows] + deactivated
+    invalidate_details(*[detail_key("user", user_id) for user_id in stale_ids])
@@ -0,0 +1,119 @@
+import functools
+import hashlib
+import json
+
+from flask import Response, g, make_response, request
+from sqlalchemy import event, update
+
+from .extensions import db
+from .models import TableVersion
+
+
+# Tables whose writes change API responses; each has a row in table_versions.
+TRACKED_TABLES = ("users", "devices", "computers")
+# Bump when serializers change so clients drop ETags minted by older code.
+_ETAG_FORMAT = "1"
+# Session.info key holding the tracked tables written in this transaction.
+_CHANGED_KEY = "changed_tables"
+
+
+# Register the session hooks that bump table versions on commit.
+def init_etags(app):
+    for name, listener in (
+        ("after_flush", _collect_changes),
+        ("before_commit", _bump_versions),
+        ("after_soft_rollback", _discard_changes),
+    ):
+        if not event.contains(db.session, name, listener):
+            event.listen(db.session, name, listener)
+
+
+# Record tables written by Core statements that bypass the ORM flush.
+def mark_tables_changed(*tables):
+    db.session.info.setdefault(_CHANGED_KEY, set()).update(tables)
+
+
+# Note which tracked tables the ORM just wrote.
+def _collect_changes(session, flush_context):
+    changed = session.info.setdefault(_CHANGED_KEY, set())
+    for obj in list(session.new) + list(session.deleted):
+        changed.add(obj.__table__.name)
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            changed.add(obj.__table__.name)
+
+
+# Increment the versions of every table written, inside the same transaction.
+def _bump_versions(session):
+    session.flush()
+    changed = session.info.pop(_CHANGED_KEY, set()) & set(TRACKED_TABLES)
+    if changed:
+        session.execute(bump_statement(changed), execution_options={"synchronize_session": False})
+
+
+# UPDATE that increments the versions of the given tables. Sorted names lock
+# the version rows in a consistent order.
+def bump_statement(tables):
+    return (
+        update(TableVersion)
+        .where(TableVersion.name.in_(sorted(tables)))
+        .values(version=TableVersion.version + 1)
+    )
+
+
+# Forget pending bumps when the transaction is rolled back.
+def _discard_changes(session, previous_transaction):
+    session.info.pop(_CHANGED_KEY, None)
+
+
+# Read the versions of the given tables with one primary-key lookup, as a
+# sorted list of (name, version), or None if any table is untracked.
+def table_versions(tables):
+    rows = (
+        db.session.query(TableVersion.name, TableVersion.version)
+        .filter(TableVersion.name.in_(tables))
+        .all()
+    )
+    if len(rows) != len(tables):
+        return None
+    return sorted(tuple(row) for row in rows)
+
+
+# Compact tag for a table_versions() result; equal tags mean no tracked writes.
+def versions_tag(versions) -> str:
+    return ",".join(f"{name}:{version}" for name, version in versions)
+
+
+# Fingerprint the request from table versions alone, or None if untracked.
+# The versions are kept on g so the detail cache can tag entries with them.
+def current_etag(tables):
+    versions = table_versions(tables)
+    if versions is None:
+        return None
+    g.table_versions = versions_tag(versions)
+    raw = json.dumps([_ETAG_FORMAT, request.full_path, versions])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+# Answer If-None-Match with 304 before the view loads or serializes anything.
+def conditional_get(*tables):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = current_etag(tables)
+            if etag is None:
+                return view(*args, **kwargs)
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            # Let browsers keep the body but revalidate on every navigation.
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,123 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import case, update
+
+from .command_queue import sweep_commands
+from .extensions import db
+from .models import Computer
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds between batched last-seen writes.
+HEARTBEAT_FLUSH_SECONDS = 5
+# Agents per multi-row UPDATE.
+FLUSH_CHUNK = 500
+
+# Pending heartbeats for this process. Structure: { agent_id: (seen_at, version) }
+_pending_lock = threading.Lock()
+_pending: dict[str, tuple] = {}
+_flusher = {"thread": None, "pid": None, "app": None, "sweep_seconds": 0, "swept_at": 0.0}
+
+
+# Remember the app so the background flusher can open an app context.
+def init_heartbeats(app):
+    _flusher["app"] = app
+    _flusher["sweep_seconds"] = app.config["COMMAND_SWEEP_SECONDS"]
+    atexit.register(flush_heartbeats)
+
+
+# Buffer a heartbeat; repeated polls from one agent collapse into one write.
+def record_heartbeat(agent_id: str, version=None):
+    with _pending_lock:
+        previous = _pending.get(agent_id)
+        if version is None and previous:
+            version = previous[1]
+        _pending[agent_id] = (datetime.utcnow(), version)
+    start_flusher()
+
+
+# Start this process's flush and command-sweep thread if it is not running.
+# Gunicorn's post_fork calls it so the sweep runs in every worker even when
+# agents poll the gateway and no heartbeat ever reaches Flask; heartbeats
+# start it lazily elsewhere. Each forked worker owns its own thread.
+def start_flusher():
+    thread = _flusher["thread"]
+    if thread is not None and thread.is_alive() and _flusher["pid"] == os.getpid():
+        return
+    with _pending_lock:
+        thread = _flusher["thread"]
+        if thread is not None and thread.is_alive() and _flusher["pid"] == os.getpid():
+            return
+        thread = threading.Thread(target=_flush_loop, name="heartbeat-flusher", daemon=True)
+        _flusher["thread"] = thread
+        _flusher["pid"] = os.getpid()
+        thread.start()
+
+
+def _flush_loop():
+    while True:
+        time.sleep(HEARTBEAT_FLUSH_SECONDS)
+        flush_heartbeats()
+        _maybe_sweep_commands()
+
+
+# Periodically expire and purge agent commands from the same thread, so
+# queues of agents that go quiet are still tidied.
+def _maybe_sweep_commands():
+    interval = _flusher["sweep_seconds"]
+    if interval <= 0 or time.monotonic() - _flusher["swept_at"] < interval:
+        return
+    _flusher["swept_at"] = time.monotonic()
+    with _flusher["app"].app_context():
+        try:
+            sweep_commands()
+        except Exception:
+            # Retried on the next interval.
+            logger.exception("Agent command sweep failed.")
+
+
+# Write all buffered heartbeats with one CASE-based UPDATE per chunk.
+def flush_heartbeats():
+    with _pending_lock:
+        batch = dict(_pending)
+        _pending.clear()
+    if not batch or _flusher["app"] is None:
+        return 0
+
+    with _flusher["app"].app_context():
+        try:
+            agent_ids = list(batch)
+            for start in range(0, len(agent_ids), FLUSH_CHUNK):
+                db.session.execute(heartbeat_statement(batch, agent_ids[start:start + FLUSH_CHUNK]))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            logger.exception("Heartbeat flush failed; keeping %d heartbeats for the next flush.", len(batch))
+            # Put the batch back for the next flush. One entry per agent keeps
+            # the buffer bounded, and newer heartbeats already buffered win.
+            with _pending_lock:
+                for agent_id, heartbeat in batch.items():
+                    _pending.setdefault(agent_id, heartbeat)
+            return 0
+    return len(batch)
+
+
+# UPDATE writing one chunk of heartbeats with per-agent CASE expressions.
+def heartbeat_statement(batch: dict, chunk: list):
+    values = {
+        "last_seen_at": case({a: batch[a][0] for a in chunk}, value=Computer.agent_id),
+        # Detail payloads omit heartbeat fields; keep cached entries valid.
+        "row_version": Computer.row_version,
+    }
+    versions = {a: batch[a][1] for a in chunk if batch[a][1]}
+    if versions:
+        values["agent_version"] = case(
+            versions, value=Computer.agent_id, else_=Computer.agent_version
+        )
+    return update(Computer).where(Computer.agent_id.in_(chunk)).values(**values)
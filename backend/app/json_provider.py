@@ -0,0 +1,37 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional speedup; the stdlib provider is used without it.
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    # Flask JSON provider backed by orjson, which encodes list payloads
+    # several times faster than the stdlib. Keys keep insertion order instead
+    # of being sorted; datetimes still go through Flask's HTTP-date default.
+
+    def _options(self, indent=None) -> int:
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        return options | orjson.OPT_INDENT_2 if indent else options
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self.default, option=self._options(kwargs.get("indent"))).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            # Indented output for debugging goes through dumps().
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        # Skip the str round-trip: orjson already produces UTF-8 bytes.
+        body = orjson.dumps(obj, default=self.default, option=self._options() | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+# Install the configured JSON provider; "orjson" needs the orjson package.
+def init_json_provider(app):
+    if app.config["JSON_PROVIDER"] == "orjson" and orjson is not None:
+        app.json = OrjsonProvider(app)
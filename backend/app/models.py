@@ -1,9 +1,30 @@
 from datetime import datetime
+
+from sqlalchemy import literal_column
+from sqlalchemy.dialects import mysql
+
 from .extensions import db
 
+# Microsecond timestamps keep FIFO ordering stable within the same second.
+PreciseDateTime = db.DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql")
+
+
+# Per-row counter the detail cache validates entries against. Every UPDATE
+# bumps it unless the statement sets it itself, as heartbeat flushes do.
+def _row_version():
+    return db.Column(
+        db.BigInteger, nullable=False, default=0, server_default="0", onupdate=literal_column("row_version") + 1
+    )
+
 
 class User(db.Model):
     __tablename__ = "users"
+    __table_args__ = (
+        # Department filters on users and, via user.has(), on assets.
+        db.Index("ix_users_department", "department"),
+        # Prefix search (/api/search); username and email are unique-indexed.
+        db.Index("ix_users_full_name", "full_name"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -12,15 +33,30 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(40), nullable=False, default="user")
     department = db.Column(db.String(80), nullable=False, default="General")
+    # Cleared by directory sync when a user leaves the HR export; blocks login.
+    active = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    row_version = _row_version()
 
-    # Delete child assets when a user is removed.
-    devices = db.relationship("Device", back_populates="user", cascade="all, delete")
-    computers = db.relationship("Computer", back_populates="user", cascade="all, delete")
+    # Delete child assets when a user is removed. Ordered by id so the
+    # "primary" asset matches the users list projection.
+    devices = db.relationship("Device", back_populates="user", cascade="all, delete", order_by="Device.id")
+    computers = db.relationship("Computer", back_populates="user", cascade="all, delete", order_by="Computer.id")
 
 
 class Device(db.Model):
     __tablename__ = "devices"
+    __table_args__ = (
+        # Serves user detail loads and cascades by user_id, plus the
+        # users ?model= filter, which probes each user's assets by model.
+        db.Index("ix_devices_user_model", "user_id", "model"),
+        # Dashboard compliance counts and ?compliant= filters.
+        db.Index("ix_devices_compliant", "compliant"),
+        # Prefix search (/api/search); serial_number is unique-indexed.
+        db.Index("ix_devices_name", "name"),
+        db.Index("ix_devices_primary_mac", "primary_mac"),
+        db.Index("ix_devices_secondary_mac", "secondary_mac"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
@@ -32,6 +68,7 @@ class Device(db.Model):
     primary_mac = db.Column(db.String(50), nullable=True)
     secondary_mac = db.Column(db.String(50), nullable=True)
     processor_type = db.Column(db.String(80), nullable=True)
+    row_version = _row_version()
 
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
     user = db.relationship("User", back_populates="devices")
@@ -39,6 +76,16 @@ class Device(db.Model):
 
 class Computer(db.Model):
     __tablename__ = "computers"
+    __table_args__ = (
+        db.Index("ix_computers_user_model", "user_id", "model"),
+        db.Index("ix_computers_compliant", "compliant"),
+        # Agent lookups, heartbeat flushes and rollout targeting.
+        db.Index("ix_computers_agent_id", "agent_id"),
+        # Dashboard online/stale agent counts.
+        db.Index("ix_computers_last_seen_at", "last_seen_at"),
+        # Prefix search (/api/search); serial_number is unique-indexed.
+        db.Index("ix_computers_name", "name"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
@@ -51,6 +98,45 @@ class Computer(db.Model):
     architecture_type = db.Column(db.String(80), nullable=True)
     cache_size = db.Column(db.String(50), nullable=True)
     agent_id = db.Column(db.String(120), nullable=True)
+    # SHA-256 of the last inventory the agent reported; lets check-ins skip writes.
+    inventory_hash = db.Column(db.String(64), nullable=True)
+    # Heartbeat from the agent's most recent poll, written in coalesced batches.
+    last_seen_at = db.Column(db.DateTime, nullable=True)
+    agent_version = db.Column(db.String(40), nullable=True)
+    row_version = _row_version()
 
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
     user = db.relationship("User", back_populates="computers")
+
+
+class AgentCommand(db.Model):
+    __tablename__ = "agent_commands"
+    __table_args__ = (
+        # Dispatch scans one agent's pending commands in enqueue order.
+        db.Index("ix_agent_commands_agent_status_created", "agent_id", "status", "created_at"),
+        # The fleet-wide sweep: overdue pending rows and old finished rows.
+        db.Index("ix_agent_commands_status_expires", "status", "expires_at"),
+        db.Index("ix_agent_commands_status_created", "status", "created_at"),
+    )
+
+    id = db.Column(db.String(32), primary_key=True)
+    agent_id = db.Column(db.String(120), nullable=False)
+    # Groups commands fanned out by one bulk request.
+    rollout_id = db.Column(db.String(32), nullable=True, index=True)
+    command_type = db.Column(db.String(40), nullable=False)
+    payload = db.Column(db.JSON, nullable=True)
+    # queued -> dispatched -> completed/failed, or expired when the TTL lapses.
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(PreciseDateTime, nullable=False, default=datetime.utcnow)
+    dispatched_at = db.Column(db.DateTime, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+class TableVersion(db.Model):
+    __tablename__ = "table_versions"
+
+    # Bumped in the writing transaction; list/detail ETags are derived from it.
+    name = db.Column(db.String(40), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
@@ -0,0 +1,123 @@
+import base64
+import json
+
+from flask import request
+from sqlalchemy import and_, literal, or_
+
+
+# JSON types a cursor's sort value may hold.
+_CURSOR_VALUE_TYPES = (str, int, float, bool, type(None))
+
+# Page sizes for keyset-paginated list endpoints.
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+# Check whether the caller opted into the paginated envelope.
+def wants_page() -> bool:
+    # Bare list responses stay available for existing clients.
+    return "limit" in request.args or "after" in request.args
+
+
+# Parse a boolean query parameter such as ?compliant=true.
+def parse_bool_arg(name: str):
+    raw = (request.args.get(name) or "").strip().lower()
+    if not raw:
+        return None
+    if raw in {"1", "true", "yes"}:
+        return True
+    if raw in {"0", "false", "no"}:
+        return False
+    raise ValueError(f"Invalid value for {name}.")
+
+
+# Read and clamp the requested page size.
+def _parse_limit() -> int:
+    raw = request.args.get("limit")
+    if raw is None or raw == "":
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ValueError("Limit must be an integer.")
+    if limit < 1:
+        raise ValueError("Limit must be positive.")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+# Encode the last row's sort position as an opaque URL-safe cursor.
+def _encode_cursor(sort: str, value, row_id: int) -> str:
+    raw = json.dumps({"s": sort, "v": value, "id": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+# Decode a cursor produced by _encode_cursor.
+def _decode_cursor(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor.")
+    if not isinstance(data, dict) or not isinstance(data.get("s"), str):
+        raise ValueError("Invalid cursor.")
+    # Forged ids or values would otherwise reach the driver and fail there.
+    if not isinstance(data.get("id"), int) or isinstance(data["id"], bool):
+        raise ValueError("Invalid cursor.")
+    if not isinstance(data.get("v"), _CURSOR_VALUE_TYPES):
+        raise ValueError("Invalid cursor.")
+    return data
+
+
+# Apply ?sort=&after=&limit= to a query and return (rows, next_cursor).
+def paginate(query, sort_keys: dict, id_column, default_sort: str = "-id"):
+    # sort_keys maps API field names to non-nullable model columns so the
+    # (value, id) keyset comparison never has to reason about NULLs.
+    limit = _parse_limit()
+    sort = (request.args.get("sort") or default_sort).strip()
+    descending = sort.startswith("-")
+    key = sort.lstrip("-")
+    if key not in sort_keys:
+        raise ValueError("Invalid sort key.")
+    column = sort_keys[key]
+
+    after = request.args.get("after")
+    if after:
+        cursor = _decode_cursor(after)
+        if cursor["s"] != sort:
+            raise ValueError("Cursor does not match the requested sort.")
+        value, last_id = cursor.get("v"), cursor["id"]
+        if column is id_column:
+            query = query.filter(id_column < last_id if descending else id_column > last_id)
+        else:
+            if not isinstance(value, column.type.python_type):
+                raise ValueError("Invalid cursor.")
+            # A typed bind, because SQLAlchemy refuses < and > against a bare
+            # True/False; boolean columns compare as 0/1 in the database.
+            value = literal(value, column.type)
+            if descending:
+                query = query.filter(
+                    or_(column < value, and_(column == value, id_column < last_id))
+                )
+            else:
+                query = query.filter(
+                    or_(column > value, and_(column == value, id_column > last_id))
+                )
+
+    if descending:
+        query = query.order_by(column.desc(), id_column.desc())
+    else:
+        query = query.order_by(column.asc(), id_column.asc())
+
+    # Fetch one extra row to learn whether another page exists.
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = _encode_cursor(sort, getattr(last, column.key), last.id)
+    return rows, next_cursor
+
+
+# Build the standard list envelope.
+def page_response(items: list, next_cursor):
+    return {"items": items, "nextCursor": next_cursor, "count": len(items)}
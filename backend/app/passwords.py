@@ -0,0 +1,116 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import jsonify
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHashingBusy(RuntimeError):
+    # Raised when the hashing pool is full or too slow; routes answer 503
+    # with Retry-After instead of queueing more CPU work behind the burst.
+    pass
+
+
+_settings = {"method": "scrypt:32768:8:1", "workers": 0, "max_pending": 0, "timeout": 10.0, "retry_after": 2}
+# Structure: { "executor": ProcessPoolExecutor | None, "pid": owning pid, "slots": BoundedSemaphore }
+_pool = {"executor": None, "pid": None, "slots": None}
+_pool_lock = threading.Lock()
+
+
+# Read hashing settings; the pool itself starts lazily in each worker.
+def init_password_hashing(app):
+    _settings["method"] = app.config["PASSWORD_HASH_METHOD"]
+    _settings["workers"] = app.config["PASSWORD_HASH_WORKERS"]
+    _settings["max_pending"] = app.config["PASSWORD_HASH_MAX_PENDING"]
+    _settings["timeout"] = app.config["PASSWORD_HASH_TIMEOUT_SECONDS"]
+    _settings["retry_after"] = app.config["PASSWORD_HASH_RETRY_AFTER_SECONDS"]
+
+
+# Return this process's pool, creating it after a fork so workers never
+# share the preloaded master's executor.
+def _executor():
+    if _pool["executor"] is not None and _pool["pid"] == os.getpid():
+        return _pool["executor"]
+    with _pool_lock:
+        if _pool["executor"] is None or _pool["pid"] != os.getpid():
+            # Spawned children import only werkzeug, not the threaded worker.
+            _pool["executor"] = ProcessPoolExecutor(
+                max_workers=_settings["workers"], mp_context=multiprocessing.get_context("spawn")
+            )
+            _pool["pid"] = os.getpid()
+            _pool["slots"] = threading.BoundedSemaphore(_settings["max_pending"])
+        return _pool["executor"]
+
+
+# Drop a broken pool and stop its processes so the next call starts a fresh
+# one; a pool another thread already replaced is left alone.
+def _discard_executor(executor):
+    with _pool_lock:
+        if _pool["executor"] is not executor:
+            return
+        _pool["executor"] = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Run fn(*args) in the pool, shedding load once max_pending calls are queued.
+def _run(fn, *args):
+    if _settings["workers"] <= 0:
+        return fn(*args)
+    executor = _executor()
+    slots = _pool["slots"]
+    if not slots.acquire(blocking=False):
+        raise PasswordHashingBusy("Password hashing queue is full.")
+    try:
+        future = executor.submit(fn, *args)
+    except BrokenProcessPool:
+        slots.release()
+        _discard_executor(executor)
+        raise PasswordHashingBusy("Password hashing pool restarted.") from None
+    # Hold the slot until the job really finishes, even after a timeout.
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=_settings["timeout"])
+    except FutureTimeoutError:
+        raise PasswordHashingBusy("Password hashing timed out.") from None
+    except BrokenProcessPool:
+        # A child died; start a fresh pool on the next call.
+        _discard_executor(executor)
+        raise PasswordHashingBusy("Password hashing pool restarted.") from None
+
+
+# Hash a password with the configured method off the request thread.
+def hash_password(password: str) -> str:
+    return _run(generate_password_hash, password, _settings["method"])
+
+
+# Check a password against a stored hash off the request thread.
+def verify_password(password_hash: str, password: str) -> bool:
+    return _run(check_password_hash, password_hash, password)
+
+
+# True when a stored hash was made with a different method or work factor.
+def needs_rehash(password_hash: str) -> bool:
+    return password_hash.split("$", 1)[0] != _settings["method"]
+
+
+# 503 response asking the client to retry once the hashing burst drains.
+def busy_response():
+    retry_after = _settings["retry_after"]
+    response = jsonify({"message": "Too many password requests; retry shortly.", "retryAfter": retry_after})
+    response.headers["Retry-After"] = str(retry_after)
+    return response, 503
+
+
+# Stop this process's pool on shutdown.
+def _shutdown():
+    executor = _pool["executor"]
+    if executor is not None and _pool["pid"] == os.getpid():
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(_shutdown)
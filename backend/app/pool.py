@@ -0,0 +1,83 @@
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+
+# Upper bounds (milliseconds) of the checkout wait histogram buckets.
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class PoolStats:
+    # Per-process counters for connection checkout waits.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+            self.checkouts = 0
+            self.timeouts = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+
+    def observe(self, seconds: float, timed_out: bool = False):
+        millis = seconds * 1000
+        index = next((i for i, bound in enumerate(WAIT_BUCKETS_MS) if millis <= bound), len(WAIT_BUCKETS_MS))
+        with self._lock:
+            self.buckets[index] += 1
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            labels = [f"le_{bound}ms" for bound in WAIT_BUCKETS_MS] + ["gt_5000ms"]
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avgWaitMs": round(self.total_wait * 1000 / self.checkouts, 3) if self.checkouts else 0,
+                "maxWaitMs": round(self.max_wait * 1000, 3),
+                "waitHistogram": dict(zip(labels, self.buckets)),
+            }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    # QueuePool that records how long each checkout waits for a connection.
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.observe(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_stats.observe(time.perf_counter() - started)
+        return connection
+
+
+# Describe current pool occupancy alongside the wait statistics.
+def pool_status(engine) -> dict:
+    pool = engine.pool
+    status = {"class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            {
+                "size": pool.size(),
+                "checkedOut": pool.checkedout(),
+                "checkedIn": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "maxOverflow": pool._max_overflow,
+                "timeoutSeconds": pool.timeout(),
+            }
+        )
+    status.update(pool_stats.snapshot())
+    return status
@@ -0,0 +1,233 @@
+import hashlib
+import json
+
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import aliased
+
+from .detail_cache import detail_key, invalidate_details
+from .etags import mark_tables_changed
+from .extensions import db
+from .models import Computer, User
+
+
+# Largest batch accepted by the batch registration endpoint.
+MAX_REGISTRATION_BATCH = 1000
+
+# Inventory columns an agent reports and a re-registration overwrites.
+INVENTORY_FIELDS = (
+    "name",
+    "model",
+    "os_version",
+    "model_identifier",
+    "processor_type",
+    "architecture_type",
+    "cache_size",
+    "agent_id",
+)
+
+# API payload keys for each inventory column.
+_PAYLOAD_KEYS = {
+    "agent_id": "agentId",
+    "name": "name",
+    "model": "model",
+    "serial_number": "serialNumber",
+    "os_version": "osVersion",
+    "model_identifier": "modelIdentifier",
+    "processor_type": "processorType",
+    "architecture_type": "architectureType",
+    "cache_size": "cacheSize",
+}
+_REQUIRED_FIELDS = ("agent_id", "serial_number", "name", "model")
+# Columns rewritten when an existing serial number is upserted.
+_UPSERT_FIELDS = INVENTORY_FIELDS + ("inventory_hash",)
+
+
+# Owner alias for computer projections, kept apart from user.has() filters.
+COMPUTER_OWNER = aliased(User)
+# List/export projection: API field names and the columns that fill them,
+# selected as plain rows so no ORM objects are built.
+COMPUTER_FIELDS = (
+    "id", "name", "model", "osVersion", "serialNumber", "modelIdentifier", "compliant",
+    "processorType", "architectureType", "cacheSize", "agentId", "user",
+)
+COMPUTER_COLUMNS = (
+    Computer.id,
+    Computer.name,
+    Computer.model,
+    Computer.os_version,
+    Computer.serial_number,
+    Computer.model_identifier,
+    Computer.compliant,
+    Computer.processor_type,
+    Computer.architecture_type,
+    Computer.cache_size,
+    Computer.agent_id,
+    COMPUTER_OWNER.username,
+)
+
+
+# Serialize a computer model for API responses.
+def computer_to_dict(computer: Computer) -> dict:
+    # Align API field names with frontend expectations.
+    return {
+        "id": computer.id,
+        "name": computer.name,
+        "model": computer.model,
+        "osVersion": computer.os_version,
+        "serialNumber": computer.serial_number,
+        "modelIdentifier": computer.model_identifier,
+        "compliant": computer.compliant,
+        "processorType": computer.processor_type,
+        "architectureType": computer.architecture_type,
+        "cacheSize": computer.cache_size,
+        "agentId": computer.agent_id,
+        "user": computer.user.username if computer.user else None,
+    }
+
+
+# Serialize one COMPUTER_COLUMNS row; matches computer_to_dict field for field.
+def computer_row_to_dict(row) -> dict:
+    return dict(zip(COMPUTER_FIELDS, row))
+
+
+# Select the projection of one computer and its sync baseline by serial number.
+def registration_statement(serial_number: str):
+    return (
+        select(*COMPUTER_COLUMNS, Computer.inventory_hash)
+        .outerjoin(COMPUTER_OWNER, Computer.user_id == COMPUTER_OWNER.id)
+        .where(Computer.serial_number == serial_number)
+    )
+
+
+# Serialize a registration_statement row with the agent's new sync baseline.
+def registration_row_to_dict(row, outcome: str) -> dict:
+    payload = computer_row_to_dict(row)
+    payload["inventoryHash"] = row.inventory_hash
+    payload["inventoryStatus"] = outcome
+    return payload
+
+
+# Normalize one agent registration payload, or return None if incomplete.
+def normalize_registration(payload: dict):
+    if not isinstance(payload, dict):
+        return None
+    # Trim inputs early; optional blanks are stored as NULL.
+    record = {
+        column: (str(payload.get(key) or "")).strip() or None
+        for column, key in _PAYLOAD_KEYS.items()
+    }
+    if any(not record[column] for column in _REQUIRED_FIELDS):
+        return None
+    return record
+
+
+# Hash the reported inventory so unchanged check-ins can be detected cheaply.
+def inventory_hash(record: dict) -> str:
+    canonical = {column: record.get(column) or "" for column in _PAYLOAD_KEYS}
+    raw = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# Build a dialect-specific INSERT that updates inventory on serial conflicts.
+def upsert_statement(rows: list, dialect: str):
+    if dialect == "mysql":
+        stmt = mysql.insert(Computer).values(rows)
+        return stmt.on_duplicate_key_update(
+            {**{f: stmt.inserted[f] for f in _UPSERT_FIELDS}, "row_version": Computer.row_version + 1}
+        )
+    if dialect in {"sqlite", "postgresql"}:
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = insert(Computer).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=["serial_number"],
+            set_={**{f: stmt.excluded[f] for f in _UPSERT_FIELDS}, "row_version": Computer.row_version + 1},
+        )
+    raise RuntimeError(f"Upsert is not supported for the {dialect} dialect.")
+
+
+# Select the stored inventory hash for the given serial numbers.
+def stored_hashes_statement(serial_numbers: list):
+    return select(Computer.serial_number, Computer.inventory_hash).where(Computer.serial_number.in_(serial_numbers))
+
+
+# Split deduplicated records into created/updated/unchanged serials against
+# the stored hashes; returns (outcome, rows to upsert).
+def classify_records(by_serial: dict, stored: dict):
+    outcome = {"created": [], "updated": [], "unchanged": []}
+    changed = []
+    for serial, record in by_serial.items():
+        digest = inventory_hash(record)
+        if serial not in stored:
+            outcome["created"].append(serial)
+        elif stored[serial] != digest:
+            outcome["updated"].append(serial)
+        else:
+            # Skip the write entirely when nothing changed.
+            outcome["unchanged"].append(serial)
+            continue
+        changed.append({**record, "inventory_hash": digest, "compliant": False})
+    return outcome, changed
+
+
+# Upsert a batch of normalized records and classify each serial number.
+def upsert_computers(records: list) -> dict:
+    # Later duplicates of a serial in the same batch win.
+    by_serial = {record["serial_number"]: record for record in records}
+    stored = dict(db.session.execute(stored_hashes_statement(list(by_serial))).all())
+    outcome, changed = classify_records(by_serial, stored)
+
+    if changed:
+        # One statement for the whole batch; concurrent registrations of the
+        # same serial resolve in the database instead of racing a SELECT.
+        db.session.execute(upsert_statement(changed, db.session.get_bind().dialect.name))
+        mark_tables_changed("computers")
+        stale_keys = []
+        if outcome["updated"]:
+            stale_keys = detail_keys(db.session.execute(owners_statement(outcome["updated"])))
+        db.session.commit()
+        invalidate_details(*stale_keys)
+    return outcome
+
+
+# Select the ids and owners of the given serials, for detail cache keys.
+def owners_statement(serial_numbers: list):
+    return select(Computer.id, Computer.user_id).where(Computer.serial_number.in_(serial_numbers))
+
+
+# Detail cache keys for re-registered computers and the users who own them.
+def detail_keys(rows) -> list:
+    keys = []
+    for computer_id, user_id in rows:
+        keys += [detail_key("computer", computer_id), detail_key("user", user_id)]
+    return keys
+
+
+# Overlay an agent's changed fields on its stored inventory (column -> value);
+# returns the full normalized record, or None if it is no longer complete.
+def merge_inventory_delta(stored: dict, agent_id: str, serial_number: str, changes: dict):
+    merged = {key: stored[column] for column, key in _PAYLOAD_KEYS.items()}
+    merged.update({key: value for key, value in changes.items() if key in merged})
+    merged["agentId"] = agent_id
+    merged["serialNumber"] = serial_number
+    return normalize_registration(merged)
+
+
+# Apply an agent's changed fields on top of the inventory it last synced.
+# Returns (outcome, computer); outcome is "unchanged", "updated" or "stale".
+def apply_inventory_delta(agent_id: str, serial_number: str, base_hash: str, changes: dict):
+    computer = Computer.query.filter_by(serial_number=serial_number).first()
+    if computer is None or not base_hash or computer.inventory_hash != base_hash:
+        # The agent's baseline no longer matches; it must resend everything.
+        return "stale", computer
+    if not changes and computer.agent_id == agent_id:
+        return "unchanged", computer
+
+    stored = {column: getattr(computer, column) for column in _PAYLOAD_KEYS}
+    record = merge_inventory_delta(stored, agent_id, serial_number, changes)
+    if record is None:
+        return "stale", computer
+
+    outcome = upsert_computers([record])
+    db.session.refresh(computer)
+    return ("updated" if outcome["updated"] else "unchanged"), computer
@@ -1,67 +1,104 @@
-import time
-import uuid
-from typing import Dict, List
-
-from flask import Blueprint, jsonify, request
-
+from flask import Blueprint, current_app, jsonify, request
+
+from ..command_queue import (
+    MAX_LONG_POLL_SECONDS,
+    LongPollCapacityReached,
+    claimed_command_dict,
+    command_to_dict,
+    complete_command_record,
+    enqueue_command,
+    enqueue_rollout,
+    rollout_status_counts,
+    wait_for_command,
+)
+from ..detail_cache import detail_key, invalidate_details
 from ..extensions import db
-from ..models import Computer
+from ..heartbeats import record_heartbeat
+from ..models import Computer, User
+from ..registration import (
+    MAX_REGISTRATION_BATCH,
+    apply_inventory_delta,
+    computer_to_dict,
+    normalize_registration,
+    upsert_computers,
+)
+from .dashboard import invalidate_summary
 
 
 agents_bp = Blueprint("agents", __name__)
 
-# In-memory command queue for demo purposes.
-# Structure: { agent_id: [ {id, type, payload, status, createdAt} ] }
-_agent_commands: Dict[str, List[dict]] = {}
+
+# Serialize a registration response with the agent's new sync baseline.
+def _registration_dict(computer: Computer, outcome: str) -> dict:
+    payload = computer_to_dict(computer)
+    payload["inventoryHash"] = computer.inventory_hash
+    payload["inventoryStatus"] = outcome
+    return payload
 
 
 # Register or update a computer record for an agent.
+# Agents that already synced may send {baseHash, changes} with only the
+# fields that differ; an empty changes object is a "not modified" check-in.
 @agents_bp.post("/register")
 def register_agent():
     payload = request.get_json(silent=True) or {}
-    # Normalize optional strings and trim inputs early.
     agent_id = (payload.get("agentId") or "").strip()
-    name = (payload.get("name") or "").strip()
-    model = (payload.get("model") or "").strip()
     serial_number = (payload.get("serialNumber") or "").strip()
-    os_version = (payload.get("osVersion") or "").strip() or None
-    model_identifier = (payload.get("modelIdentifier") or "").strip() or None
-    processor_type = (payload.get("processorType") or "").strip() or None
-    architecture_type = (payload.get("architectureType") or "").strip() or None
-    cache_size = (payload.get("cacheSize") or "").strip() or None
 
-    if not agent_id or not serial_number or not name or not model:
+    if "baseHash" in payload:
+        changes = payload.get("changes") or {}
+        if not agent_id or not serial_number or not isinstance(changes, dict):
+            return jsonify({"message": "Missing required fields."}), 400
+        outcome, computer = apply_inventory_delta(
+            agent_id, serial_number, payload["baseHash"], changes
+        )
+        if outcome == "stale":
+            # Ask the agent to fall back to a full registration.
+            return jsonify({"message": "Inventory baseline is out of date."}), 409
+        return jsonify(_registration_dict(computer, outcome)), 200
+
+    record = normalize_registration(payload)
+    if record is None:
         return jsonify({"message": "Missing required fields."}), 400
 
-    computer = Computer.query.filter_by(serial_number=serial_number).first()
-    if computer:
-        # Treat re-registrations as updates for the same machine.
-        computer.name = name
-        computer.model = model
-        computer.os_version = os_version
-        computer.model_identifier = model_identifier
-        computer.processor_type = processor_type
-        computer.architecture_type = architecture_type
-        computer.cache_size = cache_size
-        computer.agent_id = agent_id
-        db.session.commit()
-        return jsonify(_to_dict(computer)), 200
-
-    computer = Computer(
-        name=name,
-        model=model,
-        os_version=os_version,
-        serial_number=serial_number,
-        model_identifier=model_identifier,
-        processor_type=processor_type,
-        architecture_type=architecture_type,
-        cache_size=cache_size,
-        compliant=False,
-        agent_id=agent_id,
-    )
-    db.session.add(computer)
-    db.session.commit()
-    return jsonify(_to_dict(computer)), 201
+    # Treat re-registrations as updates for the same machine.
+    outcome = upsert_computers([record])
+    if outcome["created"]:
+        invalidate_summary()
+    computer = Computer.query.filter_by(serial_number=record["serial_number"]).first()
+    status = next(key for key in ("created", "updated", "unchanged") if outcome[key])
+    return jsonify(_registration_dict(computer, status)), 201 if outcome["created"] else 200
+
+
+# Register or update many computers in one bulk upsert.
+@agents_bp.post("/register/batch")
+def register_agents_batch():
+    payload = request.get_json(silent=True) or {}
+    items = payload.get("records") if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not items:
+        return jsonify({"message": "Records are required."}), 400
+    if len(items) > MAX_REGISTRATION_BATCH:
+        return jsonify({"message": f"At most {MAX_REGISTRATION_BATCH} records per batch."}), 400
+
+    records, invalid = [], []
+    for index, item in enumerate(items):
+        record = normalize_registration(item)
+        if record is None:
+            invalid.append(index)
+        else:
+            records.append(record)
+
+    outcome = upsert_computers(records) if records else {"created": [], "updated": [], "unchanged": []}
+    if outcome["created"]:
+        invalidate_summary()
+    return jsonify(
+        {
+            "created": len(outcome["created"]),
+            "updated": len(outcome["updated"]),
+            "unchanged": len(outcome["unchanged"]),
+            "invalid": invalid,
+        }
+    ), 200
 
 
 # Enqueue a new command for an agent.
@@ -70,33 +107,108 @@ def create_command(agent_id: str):
     payload = request.get_json(silent=True) or {}
     command_type = (payload.get("type") or "").strip().lower()
     command_payload = payload.get("payload") or {}
+    ttl_seconds = payload.get("ttlSeconds")
 
     if not command_type:
         return jsonify({"message": "Command type is required."}), 400
+    if ttl_seconds is not None and (not isinstance(ttl_seconds, int) or ttl_seconds <= 0):
+        return jsonify({"message": "ttlSeconds must be a positive integer."}), 400
+
+    command = enqueue_command(agent_id, command_type, command_payload, ttl_seconds)
+    return jsonify(command_to_dict(command)), 201
+
+
+# Resolve a rollout target selector to the matching agent IDs.
+def _select_agent_ids(target: dict) -> list:
+    query = db.session.query(Computer.agent_id).filter(Computer.agent_id.isnot(None))
+    if "compliant" in target:
+        query = query.filter(Computer.compliant == target["compliant"])
+    if target.get("department"):
+        query = query.filter(Computer.user.has(User.department == target["department"]))
+    if target.get("model"):
+        query = query.filter(Computer.model == target["model"])
+    if target.get("agentIds") is not None:
+        query = query.filter(Computer.agent_id.in_(target["agentIds"]))
+    return [agent_id for (agent_id,) in query.distinct()]
+
+
+# Fan a command out to every agent matching a target selector.
+@agents_bp.post("/rollouts")
+def create_rollout():
+    payload = request.get_json(silent=True) or {}
+    command_type = (payload.get("type") or "").strip().lower()
+    command_payload = payload.get("payload") or {}
+    ttl_seconds = payload.get("ttlSeconds")
+    target = payload.get("target") or {}
 
-    command = {
-        "id": uuid.uuid4().hex,
-        "type": command_type,
-        "payload": command_payload,
-        "status": "queued",
-        # Unix epoch seconds keep payloads simple for the demo agent.
-        "createdAt": int(time.time()),
-    }
-    _agent_commands.setdefault(agent_id, []).append(command)
-    return jsonify(command), 201
+    if not command_type:
+        return jsonify({"message": "Command type is required."}), 400
+    if ttl_seconds is not None and (not isinstance(ttl_seconds, int) or ttl_seconds <= 0):
+        return jsonify({"message": "ttlSeconds must be a positive integer."}), 400
+    if not isinstance(target, dict):
+        return jsonify({"message": "Target must be an object."}), 400
+    agent_ids = target.get("agentIds")
+    if agent_ids is not None and (
+        not isinstance(agent_ids, list) or not all(isinstance(a, str) for a in agent_ids)
+    ):
+        return jsonify({"message": "agentIds must be a list of strings."}), 400
+    if "compliant" in target and not isinstance(target["compliant"], bool):
+        return jsonify({"message": "compliant must be true or false."}), 400
+    # Require an explicit opt-in before addressing the whole fleet.
+    selectors = {"compliant", "department", "model", "agentIds"}
+    if not target.get("all") and not selectors.intersection(target):
+        return jsonify({"message": "Target selector is required."}), 400
+
+    matched = _select_agent_ids(target)
+    if not matched:
+        # Nothing would be stored, so there would be no rollout to look up.
+        return jsonify({"message": "No registered agents match the target."}), 422
+    rollout_id = enqueue_rollout(matched, command_type, command_payload, ttl_seconds)
+    response = {"rolloutId": rollout_id, "type": command_type, "targeted": len(matched)}
+    if agent_ids is not None:
+        # Report explicitly requested agents that are not registered.
+        response["unmatched"] = len(set(agent_ids) - set(matched))
+    return jsonify(response), 201
+
+
+# Report per-status command counts for a rollout.
+@agents_bp.get("/rollouts/<rollout_id>")
+def get_rollout(rollout_id: str):
+    counts = rollout_status_counts(rollout_id)
+    if not counts:
+        return jsonify({"message": "Rollout not found."}), 404
+    return jsonify({"rolloutId": rollout_id, "targeted": sum(counts.values()), "status": counts})
 
 
 # Dequeue the next pending command for an agent.
+# Pass ?wait=<seconds> to long-poll until a command arrives or the wait ends.
+# Responses carry nextPollSeconds so operators can pace the fleet centrally.
 @agents_bp.get("/<agent_id>/commands/next")
 def get_next_command(agent_id: str):
-    queue = _agent_commands.get(agent_id, [])
-    if not queue:
-        return jsonify({"command": None}), 200
+    # Buffered in memory and flushed in batches by a background thread.
+    record_heartbeat(agent_id, (request.headers.get("X-Agent-Version") or "").strip()[:40] or None)
+
+    retry_after = current_app.config["AGENT_RETRY_AFTER_SECONDS"]
+    if retry_after > 0:
+        # Shed agent polling without touching the database.
+        response = jsonify({"message": "Polling paused.", "retryAfter": retry_after})
+        response.headers["Retry-After"] = str(retry_after)
+        return response, 503
+
+    wait = request.args.get("wait", 0, type=int)
+    wait = max(0, min(wait, MAX_LONG_POLL_SECONDS))
+    next_poll = current_app.config["AGENT_POLL_INTERVAL_SECONDS"]
 
     # FIFO dispatch to preserve enqueue order.
-    command = queue.pop(0)
-    command["status"] = "dispatched"
-    return jsonify({"command": command}), 200
+    try:
+        command = wait_for_command(agent_id, wait, current_app.config["AGENT_LONG_POLL_MAX_PARKED"])
+    except LongPollCapacityReached:
+        # Keep threads free for the API; the agent comes back after a pause.
+        busy_poll = max(next_poll, current_app.config["AGENT_LONG_POLL_BUSY_SECONDS"])
+        return jsonify({"command": None, "nextPollSeconds": busy_poll}), 200
+    if command is None:
+        return jsonify({"command": None, "nextPollSeconds": next_poll}), 200
+    return jsonify({"command": claimed_command_dict(command), "nextPollSeconds": next_poll}), 200
 
 
 # Mark a command complete and update compliance if provided.
@@ -109,10 +221,18 @@ def complete_command(agent_id: str, command_id: str):
     if status not in {"completed", "failed"}:
         return jsonify({"message": "Invalid status."}), 400
 
+    if not complete_command_record(agent_id, command_id, status):
+        return jsonify({"message": "Command not found."}), 404
+
+    compliance_changed = False
     if command_payload.get("computerId"):
         computer = Computer.query.get(command_payload["computerId"])
         if computer:
             computer.compliant = status == "completed"
-            db.session.commit()
+            compliance_changed = True
 
+    db.session.commit()
+    if compliance_changed:
+        invalidate_summary()
+        invalidate_details(detail_key("computer", command_payload["computerId"]))
     return jsonify({"status": status}), 200
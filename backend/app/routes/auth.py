@@ -1,19 +1,33 @@
 import re
 from flask import Blueprint, jsonify, request
 import time
-from werkzeug.security import check_password_hash, generate_password_hash
 
 from ..models import User
 from ..extensions import db
+from ..passwords import PasswordHashingBusy, busy_response, hash_password, needs_rehash, verify_password
 
 
 auth_bp = Blueprint("auth", __name__)
 
 # Short-lived cache to speed up repeated eligibility checks for the same email.
 # This reduces DB lookups during account creation when users retry or double-click.
+# The cache is per worker process; the TTL bounds how stale any worker can be.
 _ELIGIBILITY_CACHE_TTL_SECONDS = 60
+_ELIGIBILITY_CACHE_MAX_ENTRIES = 10000
 _eligibility_cache: dict[str, tuple[float, dict, int]] = {}
 
+
+# Store an eligibility result, pruning expired entries when the cache is full.
+def _cache_eligibility(email: str, payload: dict, status: int):
+    now = time.time()
+    if len(_eligibility_cache) >= _ELIGIBILITY_CACHE_MAX_ENTRIES:
+        for key, (cached_at, _, _) in list(_eligibility_cache.items()):
+            if now - cached_at >= _ELIGIBILITY_CACHE_TTL_SECONDS:
+                _eligibility_cache.pop(key, None)
+        if len(_eligibility_cache) >= _ELIGIBILITY_CACHE_MAX_ENTRIES:
+            _eligibility_cache.clear()
+    _eligibility_cache[email] = (now, payload, status)
+
 # Validate password strength for account creation.
 def _validate_password(password: str) -> bool:
     # Enforce baseline password strength for account creation.
@@ -43,8 +57,23 @@ def login():
         return jsonify({"message": "Email and password are required."}), 400
 
     user = User.query.filter_by(email=email).first()
-    if not user or not check_password_hash(user.password_hash, password):
+    try:
+        valid = user is not None and verify_password(user.password_hash, password)
+    except PasswordHashingBusy:
+        return busy_response()
+    if not valid:
         return jsonify({"message": "Invalid credentials."}), 401
+    if not user.active:
+        return jsonify({"message": "Account is deactivated."}), 403
+
+    # Upgrade hashes from an older method or work factor while the password is at hand.
+    if needs_rehash(user.password_hash):
+        try:
+            user.password_hash = hash_password(password)
+            db.session.commit()
+        except PasswordHashingBusy:
+            # Keep the old hash; the next login tries again.
+            pass
 
     return jsonify(
         {
@@ -73,6 +102,8 @@ def auth0_login():
     user = User.query.filter_by(email=email).first()
     if not user:
         return jsonify({"message": "No account found for that email."}), 404
+    if not user.active:
+        return jsonify({"message": "Account is deactivated."}), 403
 
     return jsonify(
         {
@@ -106,7 +137,10 @@ def forgot_password():
     if not user:
         return jsonify({"message": "No account found for that email."}), 404
 
-    user.password_hash = generate_password_hash(new_password)
+    try:
+        user.password_hash = hash_password(new_password)
+    except PasswordHashingBusy:
+        return busy_response()
     db.session.commit()
 
     return jsonify({"message": "Password updated successfully."})
@@ -132,15 +166,15 @@ def account_eligibility():
     user = User.query.filter_by(email=email).first()
     if not user:
         payload = {"message": "No account found for that email."}
-        _eligibility_cache[email] = (time.time(), payload, 404)
+        _cache_eligibility(email, payload, 404)
         return jsonify(payload), 404
     if not _is_it_department(user):
         payload = {"message": "You do not have access to create an account."}
-        _eligibility_cache[email] = (time.time(), payload, 403)
+        _cache_eligibility(email, payload, 403)
         return jsonify(payload), 403
 
     payload = {"eligible": True, "department": user.department}
-    _eligibility_cache[email] = (time.time(), payload, 200)
+    _cache_eligibility(email, payload, 200)
     return jsonify(payload)
 
 
@@ -162,6 +196,9 @@ def create_account():
     if not _is_it_department(user):
         return jsonify({"message": "You do not have access to create an account."}), 403
 
-    user.password_hash = generate_password_hash(password)
+    try:
+        user.password_hash = hash_password(password)
+    except PasswordHashingBusy:
+        return busy_response()
     db.session.commit()
     return jsonify({"message": "Account created. You can now log in."})
@@ -1,36 +1,106 @@
 from flask import Blueprint, jsonify, request
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 
+from ..bulk_import import import_assets, read_import_rows
+from ..detail_cache import cached_detail, detail_key, invalidate_details, row_stamp
+from ..etags import conditional_get
+from ..export import export_format, stream_export
 from ..extensions import db
 from ..models import Computer, User
+from ..pagination import page_response, paginate, parse_bool_arg, wants_page
+from ..registration import COMPUTER_COLUMNS, COMPUTER_OWNER, computer_row_to_dict, computer_to_dict
+from .dashboard import invalidate_summary
 
 
 computers_bp = Blueprint("computers", __name__)
 
 
-# Serialize a computer model for API responses.
-def _to_dict(computer: Computer):
-    # Align API field names with frontend expectations.
-    return {
-        "id": computer.id,
-        "name": computer.name,
-        "model": computer.model,
-        "osVersion": computer.os_version,
-        "serialNumber": computer.serial_number,
-        "modelIdentifier": computer.model_identifier,
-        "compliant": computer.compliant,
-        "processorType": computer.processor_type,
-        "architectureType": computer.architecture_type,
-        "cacheSize": computer.cache_size,
-        "agentId": computer.agent_id,
-        "user": computer.user.username if computer.user else None,
-    }
-
-
-# Return all computers ordered by newest first.
+# Select the list projection with the owner joined in the same statement.
+def _list_query():
+    return db.session.query(*COMPUTER_COLUMNS).outerjoin(COMPUTER_OWNER, Computer.user_id == COMPUTER_OWNER.id)
+
+
+# Columns clients may sort the paginated list by.
+_SORT_KEYS = {
+    "id": Computer.id,
+    "name": Computer.name,
+    "model": Computer.model,
+    "serialNumber": Computer.serial_number,
+    "compliant": Computer.compliant,
+}
+
+
+# Apply ?compliant=&user=&model=&osVersion=&department= to a computer query.
+def _filtered_query(query):
+    compliant = parse_bool_arg("compliant")
+    if compliant is not None:
+        query = query.filter(Computer.compliant == compliant)
+    if request.args.get("model"):
+        query = query.filter(Computer.model == request.args["model"])
+    if request.args.get("osVersion"):
+        query = query.filter(Computer.os_version == request.args["osVersion"])
+    if request.args.get("user"):
+        query = query.filter(Computer.user.has(User.username == request.args["user"]))
+    if request.args.get("department"):
+        query = query.filter(Computer.user.has(User.department == request.args["department"]))
+    return query
+
+
+# Return computers newest first, or one keyset page when ?limit/?after is given.
 @computers_bp.get("")
+@conditional_get("computers", "users")
 def list_computers():
-    computers = Computer.query.order_by(Computer.id.desc()).all()
-    return jsonify([_to_dict(c) for c in computers])
+    try:
+        query = _filtered_query(_list_query())
+        if wants_page():
+            rows, next_cursor = paginate(query, _SORT_KEYS, Computer.id)
+            return jsonify(page_response([computer_row_to_dict(row) for row in rows], next_cursor))
+    except ValueError as exc:
+        return jsonify({"message": str(exc)}), 400
+
+    rows = query.order_by(Computer.id.desc()).all()
+    return jsonify([computer_row_to_dict(row) for row in rows])
+
+
+# Stream every matching computer as NDJSON or CSV for bulk exports.
+@computers_bp.get("/export")
+def export_computers():
+    try:
+        fmt = export_format()
+        query = _filtered_query(_list_query()).order_by(Computer.id)
+    except ValueError as exc:
+        return jsonify({"message": str(exc)}), 400
+    return stream_export(query, computer_row_to_dict, "computers", fmt)
+
+
+# Optional import fields beyond name, model and serialNumber: payload key -> column.
+_IMPORT_FIELDS = {
+    "osVersion": "os_version",
+    "modelIdentifier": "model_identifier",
+    "processorType": "processor_type",
+    "architectureType": "architecture_type",
+    "cacheSize": "cache_size",
+}
+
+
+# Create computers in bulk from a JSON array or CSV and report on every row.
+# Owners are given as userId or user (username); ?dryRun=true writes nothing.
+@computers_bp.post("/import")
+def import_computers():
+    try:
+        rows = read_import_rows()
+        dry_run = bool(parse_bool_arg("dryRun"))
+        report = import_assets(Computer, _IMPORT_FIELDS, ("serial_number",), rows, dry_run)
+    except ValueError as exc:
+        return jsonify({"message": str(exc)}), 400
+    except IntegrityError:
+        # A concurrent write took a serial number after the conflict check.
+        db.session.rollback()
+        return jsonify({"message": "Import conflicts with a concurrent change; retry it."}), 409
+    if report["created"] and not dry_run:
+        invalidate_summary()
+    return jsonify(report), 200
 
 
 # Create a new computer after validating input.
@@ -74,14 +144,17 @@ def create_computer():
     )
     db.session.add(computer)
     db.session.commit()
+    invalidate_summary()
+    invalidate_details(detail_key("user", computer.user_id))
 
-    return jsonify(_to_dict(computer)), 201
+    return jsonify(computer_to_dict(computer)), 201
 
 
 # Update an existing computer by id.
 @computers_bp.route("/<int:computer_id>", methods=["PUT", "PATCH"])
 def update_computer(computer_id: int):
     computer = Computer.query.get_or_404(computer_id)
+    previous_user_id = computer.user_id
     payload = request.get_json(silent=True) or {}
 
     # Normalize optional strings and trim inputs early.
@@ -122,20 +195,43 @@ def update_computer(computer_id: int):
     computer.user = user
 
     db.session.commit()
-    return jsonify(_to_dict(computer)), 200
+    invalidate_summary()
+    # The owners' detail payloads list this computer, so refresh them too.
+    invalidate_details(
+        detail_key("computer", computer.id),
+        detail_key("user", previous_user_id),
+        detail_key("user", computer.user_id),
+    )
+    return jsonify(computer_to_dict(computer)), 200
 
 
 # Delete a computer by id.
 @computers_bp.delete("/<int:computer_id>")
 def delete_computer(computer_id: int):
     computer = Computer.query.get_or_404(computer_id)
+    user_id = computer.user_id
     db.session.delete(computer)
     db.session.commit()
+    invalidate_summary()
+    invalidate_details(detail_key("computer", computer_id), detail_key("user", user_id))
     return "", 204
 
 
 # Fetch a computer by id.
 @computers_bp.get("/<int:computer_id>")
+@conditional_get("computers", "users")
 def get_computer(computer_id: int):
-    computer = Computer.query.get_or_404(computer_id)
-    return jsonify(_to_dict(computer))
+    def load():
+        computer = Computer.query.options(joinedload(Computer.user)).get_or_404(computer_id)
+        owner_version = computer.user.row_version if computer.user else None
+        return computer_to_dict(computer), row_stamp([(computer.row_version, computer.user_id, owner_version)])
+
+    # The computer's and its owner's row versions, read without loading them.
+    def stamp():
+        return row_stamp(
+            db.session.query(Computer.row_version, Computer.user_id, User.row_version)
+            .outerjoin(User, Computer.user_id == User.id)
+            .filter(Computer.id == computer_id)
+        )
+
+    return jsonify(cached_detail(detail_key("computer", computer_id), load, stamp))
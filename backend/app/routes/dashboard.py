@@ -1,39 +1,141 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
 from flask import Blueprint, jsonify
+from sqlalchemy import func, select, true
 
+from ..etags import TRACKED_TABLES, table_versions, versions_tag
+from ..extensions import db
 from ..models import User, Device, Computer
 
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
+# Short-lived summary cache shared by every poller in this process. Entries
+# are tagged with the table versions they were computed at, so writes from
+# other workers or the agent gateway show up on the next request; the TTL
+# bounds staleness of the last-seen counts, which heartbeats do not version.
+_SUMMARY_CACHE_TTL_SECONDS = 5
+_summary_lock = threading.Lock()
+_summary_compute_lock = threading.Lock()
+_summary_cache: dict = {"computed_at": 0.0, "versions": None, "payload": None}
+_summary_generation = 0
+
+# Agents seen within these windows count as online / stale; older is offline.
+AGENT_ONLINE_SECONDS = 2 * 60
+AGENT_STALE_SECONDS = 24 * 60 * 60
+
+
+# Drop the cached summary so the next request recomputes it.
+def invalidate_summary():
+    global _summary_generation
+    with _summary_lock:
+        _summary_generation += 1
+        _summary_cache["payload"] = None
+
+
+# Compute every count in a single round-trip using scalar subqueries.
+def _compute_summary() -> dict:
+    def _count(model, *criteria):
+        return select(func.count()).select_from(model).where(*criteria).scalar_subquery()
+
+    now = datetime.utcnow()
+    online_cutoff = now - timedelta(seconds=AGENT_ONLINE_SECONDS)
+    stale_cutoff = now - timedelta(seconds=AGENT_STALE_SECONDS)
+    row = db.session.execute(
+        select(
+            _count(Computer),
+            _count(Device),
+            _count(User),
+            # "= true" rather than "IS TRUE" so MySQL can use the compliant index.
+            _count(Computer, Computer.compliant == true()),
+            _count(Device, Device.compliant == true()),
+            _count(Computer, Computer.agent_id.isnot(None)),
+            _count(Computer, Computer.last_seen_at >= online_cutoff),
+            _count(
+                Computer,
+                Computer.last_seen_at < online_cutoff,
+                Computer.last_seen_at >= stale_cutoff,
+            ),
+        )
+    ).one()
+    (
+        computers,
+        devices,
+        users,
+        compliant_computers,
+        compliant_devices,
+        agents,
+        agents_online,
+        agents_stale,
+    ) = row
+
+    return {
+        "counts": {
+            "computers": computers,
+            "devices": devices,
+            "users": users,
+        },
+        "compliance": {
+            "computers": {
+                "compliant": compliant_computers,
+                # Guard against negative counts if data changes mid-request.
+                "nonCompliant": max(computers - compliant_computers, 0),
+            },
+            "devices": {
+                "compliant": compliant_devices,
+                # Guard against negative counts if data changes mid-request.
+                "nonCompliant": max(devices - compliant_devices, 0),
+            },
+        },
+        "agents": {
+            "online": agents_online,
+            "stale": agents_stale,
+            # Agents that never checked in or went quiet past the stale window.
+            "offline": max(agents - agents_online - agents_stale, 0),
+        },
+    }
+
+
+# Return the cached payload if it is within the TTL and built at versions.
+def _fresh_summary(versions):
+    payload = _summary_cache["payload"]
+    if (
+        payload is not None
+        and _summary_cache["versions"] == versions
+        and time.time() - _summary_cache["computed_at"] < _SUMMARY_CACHE_TTL_SECONDS
+    ):
+        return payload
+    return None
+
+
+# Return the cached summary, recomputing at most once per TTL window or write.
+def _get_summary() -> dict:
+    # One primary-key lookup; the counts below scan whole tables.
+    current = table_versions(TRACKED_TABLES)
+    versions = versions_tag(current) if current is not None else None
+    payload = _fresh_summary(versions)
+    if payload is not None:
+        return payload
+
+    # Single-flight: concurrent misses queue here and reuse the first result.
+    with _summary_compute_lock:
+        payload = _fresh_summary(versions)
+        if payload is not None:
+            return payload
+        generation = _summary_generation
+        payload = _compute_summary()
+        with _summary_lock:
+            # Only publish if no write invalidated the cache mid-computation.
+            if generation == _summary_generation:
+                _summary_cache["payload"] = payload
+                _summary_cache["versions"] = versions
+                _summary_cache["computed_at"] = time.time()
+    return payload
+
 
 # Return aggregate counts and compliance totals.
 @dashboard_bp.get("/summary")
 def summary():
-    computers = Computer.query.count()
-    devices = Device.query.count()
-    users = User.query.count()
-
-    compliant_computers = Computer.query.filter_by(compliant=True).count()
-    compliant_devices = Device.query.filter_by(compliant=True).count()
-
-    return jsonify(
-        {
-            "counts": {
-                "computers": computers,
-                "devices": devices,
-                "users": users,
-            },
-            "compliance": {
-                "computers": {
-                    "compliant": compliant_computers,
-                    # Guard against negative counts if data changes mid-request.
-                    "nonCompliant": max(computers - compliant_computers, 0),
-                },
-                "devices": {
-                    "compliant": compliant_devices,
-                    # Guard against negative counts if data changes mid-request.
-                    "nonCompliant": max(devices - compliant_devices, 0),
-                },
-            },
-        }
-    )
+    return jsonify(_get_summary())
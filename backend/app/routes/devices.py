@@ -1,7 +1,15 @@
 from flask import Blueprint, jsonify, request
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased, joinedload
 
+from ..bulk_import import import_assets, read_import_rows
+from ..detail_cache import cached_detail, detail_key, invalidate_details, row_stamp
+from ..etags import conditional_get
+from ..export import export_format, stream_export
 from ..extensions import db
 from ..models import Device, User
+from ..pagination import page_response, paginate, parse_bool_arg, wants_page
+from .dashboard import invalidate_summary
 
 
 devices_bp = Blueprint("devices", __name__)
@@ -25,11 +33,119 @@ def _to_dict(device: Device):
     }
 
 
-# Return all devices ordered by newest first.
+# Owner alias for list projections, kept apart from the user.has() filters.
+_Owner = aliased(User)
+# List/export projection: API field names and the columns that fill them,
+# selected as plain rows so no ORM objects are built.
+_LIST_FIELDS = (
+    "id", "name", "model", "osVersion", "serialNumber", "udid", "compliant",
+    "processorType", "primaryMacAddress", "secondaryMacAddress", "user",
+)
+_LIST_COLUMNS = (
+    Device.id,
+    Device.name,
+    Device.model,
+    Device.os_version,
+    Device.serial_number,
+    Device.udid,
+    Device.compliant,
+    Device.processor_type,
+    Device.primary_mac,
+    Device.secondary_mac,
+    _Owner.username,
+)
+
+
+# Serialize one projected row; matches _to_dict field for field.
+def _row_to_dict(row) -> dict:
+    return dict(zip(_LIST_FIELDS, row))
+
+
+# Select the list projection with the owner joined in the same statement.
+def _list_query():
+    return db.session.query(*_LIST_COLUMNS).outerjoin(_Owner, Device.user_id == _Owner.id)
+
+
+# Columns clients may sort the paginated list by.
+_SORT_KEYS = {
+    "id": Device.id,
+    "name": Device.name,
+    "model": Device.model,
+    "serialNumber": Device.serial_number,
+    "compliant": Device.compliant,
+}
+
+
+# Apply ?compliant=&user=&model=&osVersion=&department= to a device query.
+def _filtered_query(query):
+    compliant = parse_bool_arg("compliant")
+    if compliant is not None:
+        query = query.filter(Device.compliant == compliant)
+    if request.args.get("model"):
+        query = query.filter(Device.model == request.args["model"])
+    if request.args.get("osVersion"):
+        query = query.filter(Device.os_version == request.args["osVersion"])
+    if request.args.get("user"):
+        query = query.filter(Device.user.has(User.username == request.args["user"]))
+    if request.args.get("department"):
+        query = query.filter(Device.user.has(User.department == request.args["department"]))
+    return query
+
+
+# Return devices newest first, or one keyset page when ?limit/?after is given.
 @devices_bp.get("")
+@conditional_get("devices", "users")
 def list_devices():
-    devices = Device.query.order_by(Device.id.desc()).all()
-    return jsonify([_to_dict(d) for d in devices])
+    try:
+        query = _filtered_query(_list_query())
+        if wants_page():
+            rows, next_cursor = paginate(query, _SORT_KEYS, Device.id)
+            return jsonify(page_response([_row_to_dict(row) for row in rows], next_cursor))
+    except ValueError as exc:
+        return jsonify({"message": str(exc)}), 400
+
+    rows = query.order_by(Device.id.desc()).all()
+    return jsonify([_row_to_dict(row) for row in rows])
+
+
+# Stream every matching device as NDJSON or CSV for bulk exports.
+@devices_bp.get("/export")
+def export_devices():
+    try:
+        fmt = export_format()
+        query = _filtered_query(_list_query()).order_by(Device.id)
+    except ValueError as exc:
+        return jsonify({"message": str(exc)}), 400
+    return stream_export(query, _row_to_dict, "devices", fmt)
+
+
+# Optional import fields beyond name, model and serialNumber: payload key -> column.
+_IMPORT_FIELDS = {
+    "osVersion": "os_version",
+    "udid": "udid",
+    "processorType": "processor_type",
+    "primaryMacAddress": "primary_mac",
+    "secondaryMacAddress": "secondary_mac",
+}
+
+
+# Create devices in bulk from a JSON array or CSV and report on every row.
+# Owners are given as userId or user (username); ?dryRun=true writes nothing.
+@devices_bp.post("/import")
+def import_devices():
+    try:
+        rows = read_import_rows()
+        dry_run = bool(parse_bool_arg("dryRun"))
+        report = import_assets(Device, _IMPORT_FIELDS, ("serial_number", "udid"), rows, dry_run)
+    except ValueError as exc:
+        return jsonify({"message": str(exc)}), 400
+    except IntegrityError:
+        # A concurrent write took a serial number after the conflict check.
+        db.session.rollback()
+        return jsonify({"message": "Import conflicts with a concurrent change; retry it."}), 409
+    if report["created"] and not dry_run:
+        invalidate_summary()
+    return jsonify(report), 200
 
 
 # Create a new device after validating input.
@@ -73,6 +189,8 @@ def create_device():
     )
     db.session.add(device)
     db.session.commit()
+    invalidate_summary()
+    invalidate_details(detail_key("user", device.user_id))
 
     return jsonify(_to_dict(device)), 201
 
@@ -81,6 +199,7 @@ def create_device():
 @devices_bp.route("/<int:device_id>", methods=["PUT", "PATCH"])
 def update_device(device_id: int):
     device = Device.query.get_or_404(device_id)
+    previous_user_id = device.user_id
     payload = request.get_json(silent=True) or {}
     # Normalize optional strings and trim inputs early.
     name = (payload.get("name") or "").strip()
@@ -120,6 +239,13 @@ def update_device(device_id: int):
     device.user = user
 
     db.session.commit()
+    invalidate_summary()
+    # The owners' detail payloads list this device, so refresh them too.
+    invalidate_details(
+        detail_key("device", device.id),
+        detail_key("user", previous_user_id),
+        detail_key("user", device.user_id),
+    )
     return jsonify(_to_dict(device)), 200
 
 
@@ -127,13 +253,29 @@ def update_device(device_id: int):
 @devices_bp.delete("/<int:device_id>")
 def delete_device(device_id: int):
     device = Device.query.get_or_404(device_id)
+    user_id = device.user_id
     db.session.delete(device)
     db.session.commit()
+    invalidate_summary()
+    invalidate_details(detail_key("device", device_id), detail_key("user", user_id))
     return "", 204
 
 
 # Fetch a device by id.
 @devices_bp.get("/<int:device_id>")
+@conditional_get("devices", "users")
 def get_device(device_id: int):
-    device = Device.query.get_or_404(device_id)
-    return jsonify(_to_dict(device))
+    def load():
+        device = Device.query.options(joinedload(Device.user)).get_or_404(device_id)
+        owner_version = device.user.row_version if device.user else None
+        return _to_dict(device), row_stamp([(device.row_version, device.user_id, owner_version)])
+
+    # The device's and its owner's row versions, read without loading them.
+    def stamp():
+        return row_stamp(
+            db.session.query(Device.row_version, Device.user_id, User.row_version)
+            .outerjoin(User, Device.user_id == User.id)
+            .filter(Device.id == device_id)
+        )
+
+    return jsonify(cached_detail(detail_key("device", device_id), load, stamp))
@@ -0,0 +1,125 @@
+import re
+
+from flask import Blueprint, jsonify, request
+from sqlalchemy import literal, select, union_all
+
+from ..extensions import db
+from ..models import Computer, Device, User
+
+
+search_bp = Blueprint("search", __name__)
+
+DEFAULT_SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+MAX_QUERY_LENGTH = 120
+
+# Searchable columns per entity: (type, model, label, detail, {field: column}).
+# Every column is backed by a B-tree index, so each prefix match is an index
+# range scan that stops after `limit` rows no matter how large the table is.
+_SOURCES = (
+    ("computer", Computer, Computer.name, Computer.serial_number, {
+        "serialNumber": Computer.serial_number,
+        "name": Computer.name,
+    }),
+    ("device", Device, Device.name, Device.serial_number, {
+        "serialNumber": Device.serial_number,
+        "primaryMacAddress": Device.primary_mac,
+        "secondaryMacAddress": Device.secondary_mac,
+        "name": Device.name,
+    }),
+    ("user", User, User.full_name, User.email, {
+        "username": User.username,
+        "email": User.email,
+        "fullName": User.full_name,
+    }),
+)
+_MAC_FIELDS = {"primaryMacAddress", "secondaryMacAddress"}
+# Identifier hits outrank display-name hits at equal match quality.
+_FIELD_RANK = {
+    "serialNumber": 0,
+    "username": 0,
+    "email": 1,
+    "primaryMacAddress": 1,
+    "secondaryMacAddress": 1,
+    "name": 2,
+    "fullName": 2,
+}
+_HEX_DIGITS = re.compile(r"^[0-9a-fA-F]+$")
+
+
+# Escape LIKE wildcards so user input only ever matches literally.
+def _prefix_pattern(text: str) -> str:
+    return re.sub(r"([\\%_])", r"\\\1", text) + "%"
+
+
+# Let "a1b2c3" find MACs stored as "A1:B2:C3:...".
+def _mac_prefix(text: str) -> str:
+    bare = re.sub(r"[:\-.]", "", text)
+    if len(bare) >= 2 and _HEX_DIGITS.match(bare):
+        return ":".join(bare[i:i + 2] for i in range(0, len(bare), 2))
+    return text
+
+
+# Build one UNION ALL of per-column, individually limited prefix matches.
+def _search_statement(text: str, limit: int):
+    selects = []
+    for kind, model, label, detail, fields in _SOURCES:
+        for field, column in fields.items():
+            value = _mac_prefix(text) if field in _MAC_FIELDS else text
+            subquery = (
+                select(
+                    literal(kind).label("type"),
+                    model.id.label("id"),
+                    label.label("label"),
+                    detail.label("detail"),
+                    literal(field).label("field"),
+                    column.label("value"),
+                )
+                # Case-insensitive through the MySQL column collation.
+                .where(column.like(_prefix_pattern(value), escape="\\"))
+                .order_by(column)
+                .limit(limit)
+                .subquery()
+            )
+            selects.append(select(subquery))
+    return union_all(*selects)
+
+
+# Order hits by exact match, field importance, then shortest value.
+def _rank(text: str, row) -> tuple:
+    value = (row.value or "").lower()
+    return (value != text.lower(), _FIELD_RANK[row.field], len(value), value)
+
+
+# Type-ahead search across computers, devices and users.
+@search_bp.get("")
+def search():
+    text = (request.args.get("q") or "").strip()
+    if not text:
+        return jsonify({"message": "Query parameter q is required."}), 400
+    if len(text) > MAX_QUERY_LENGTH:
+        return jsonify({"message": f"Query must be at most {MAX_QUERY_LENGTH} characters."}), 400
+    try:
+        limit = int(request.args.get("limit", DEFAULT_SEARCH_LIMIT))
+    except ValueError:
+        return jsonify({"message": "Limit must be an integer."}), 400
+    limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+
+    rows = db.session.execute(_search_statement(text, limit)).all()
+
+    # Keep each entity once, under its best-ranked matching field.
+    best = {}
+    for row in sorted(rows, key=lambda row: _rank(text, row)):
+        best.setdefault((row.type, row.id), row)
+    results = [
+        {
+            "type": row.type,
+            "id": row.id,
+            "label": row.label,
+            "detail": row.detail,
+            "matchedField": row.field,
+            "matchedValue": row.value,
+        }
+        for row in list(best.values())[:limit]
+    ]
+    return jsonify({"query": text, "results": results, "count": len(results)})
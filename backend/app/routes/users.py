@@ -1,9 +1,20 @@
 import re
-from flask import Blueprint, jsonify, request
-from werkzeug.security import generate_password_hash
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy import literal, select, union_all
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
 
+from ..detail_cache import cached_detail, detail_key, invalidate_details, row_stamp
+from ..etags import conditional_get
+from ..export import export_format, stream_export
 from ..extensions import db
-from ..models import User
+from ..models import Computer, Device, User
+from ..bulk_import import read_import_rows
+from ..directory_sync import apply_sync, plan_sync
+from ..passwords import PasswordHashingBusy, busy_response, hash_password
+from ..pagination import page_response, paginate, parse_bool_arg, wants_page
+from ..usernames import allocate_usernames, username_base
+from .dashboard import invalidate_summary
 
 
 users_bp = Blueprint("users", __name__)
@@ -22,6 +33,7 @@ def _to_dict(user: User):
         "email": user.email,
         "role": user.role,
         "department": user.department,
+        "active": user.active,
         "deviceName": primary_device.name if primary_device else None,
         "computerName": primary_computer.name if primary_computer else None,
         "model": (
@@ -32,28 +44,107 @@ def _to_dict(user: User):
     }
 
 
-# Return all users ordered by newest first.
+# First (lowest id) asset column for the outer user, as a scalar subquery.
+def _primary(model, column):
+    return (
+        select(column)
+        .where(model.user_id == User.id)
+        .order_by(model.id)
+        .limit(1)
+        .correlate(User)
+        .scalar_subquery()
+    )
+
+
+# List/export projection: one row per user with its primary assets resolved
+# in SQL, so neither users nor their collections are loaded as ORM objects.
+_LIST_COLUMNS = (
+    User.id,
+    User.username,
+    User.full_name,
+    User.email,
+    User.role,
+    User.department,
+    User.active,
+    _primary(Device, Device.name).label("device_name"),
+    _primary(Computer, Computer.name).label("computer_name"),
+    _primary(Computer, Computer.model).label("computer_model"),
+    _primary(Device, Device.model).label("device_model"),
+)
+_LIST_FIELDS = (
+    "id", "username", "fullName", "email", "role", "department", "active", "deviceName", "computerName",
+)
+
+
+# Serialize one projected row; matches _to_dict field for field.
+def _row_to_dict(row) -> dict:
+    payload = dict(zip(_LIST_FIELDS, row))
+    payload["model"] = row.computer_model if row.computer_model is not None else row.device_model
+    return payload
+
+
+# Columns clients may sort the paginated list by.
+_SORT_KEYS = {
+    "id": User.id,
+    "username": User.username,
+    "fullName": User.full_name,
+    "email": User.email,
+    "role": User.role,
+    "department": User.department,
+}
+
+
+# Select the user list projection filtered by ?user=&department=&role=&active=&model=.
+def _filtered_query():
+    query = db.session.query(*_LIST_COLUMNS)
+    active = parse_bool_arg("active")
+    if active is not None:
+        query = query.filter(User.active == active)
+    if request.args.get("user"):
+        query = query.filter(User.username == request.args["user"])
+    if request.args.get("department"):
+        query = query.filter(User.department == request.args["department"])
+    if request.args.get("role"):
+        query = query.filter(User.role == request.args["role"])
+    if request.args.get("model"):
+        # Match users who own a computer or device of the given model.
+        model = request.args["model"]
+        query = query.filter(
+            User.computers.any(Computer.model == model) | User.devices.any(Device.model == model)
+        )
+    return query
+
+
+# Return users newest first, or one keyset page when ?limit/?after is given.
 @users_bp.get("")
+@conditional_get("users", "devices", "computers")
 def list_users():
-    users = User.query.order_by(User.id.desc()).all()
-    return jsonify([_to_dict(u) for u in users])
+    try:
+        query = _filtered_query()
+        if wants_page():
+            rows, next_cursor = paginate(query, _SORT_KEYS, User.id)
+            return jsonify(page_response([_row_to_dict(row) for row in rows], next_cursor))
+    except ValueError as exc:
+        return jsonify({"message": str(exc)}), 400
 
+    rows = query.order_by(User.id.desc()).all()
+    return jsonify([_row_to_dict(row) for row in rows])
 
-# Generate a unique username from a first/last name.
-def _build_username(first_name: str, last_name: str) -> str:
-    # Build a simple username seed and ensure it is URL-safe.
-    base = f"{first_name[:1]}{last_name}".lower()
-    base = re.sub(r"[^a-z0-9]", "", base)
-    if not base:
-        raise ValueError("Invalid name for username generation.")
 
-    username = base
-    counter = 1
-    # Increment suffix until we find a unique username.
-    while User.query.filter_by(username=username).first():
-        counter += 1
-        username = f"{base}{counter}"
-    return username
+# Stream every matching user as NDJSON or CSV for bulk exports.
+@users_bp.get("/export")
+def export_users():
+    try:
+        fmt = export_format()
+        query = _filtered_query().order_by(User.id)
+    except ValueError as exc:
+        return jsonify({"message": str(exc)}), 400
+    return stream_export(query, _row_to_dict, "users", fmt)
+
+
+# Generate a unique username from a first/last name with one prefix query.
+def _build_username(first_name: str, last_name: str) -> str:
+    return allocate_usernames([username_base(first_name, last_name)])[0]
 
 
 # Validate password strength for account creation.
@@ -88,28 +179,87 @@ def create_user():
 
     try:
         username = _build_username(first_name, last_name)
+        # Seed a temporary password for demo accounts.
+        password_hash = hash_password("password123")
     except ValueError as exc:
         return jsonify({"message": str(exc)}), 400
+    except PasswordHashingBusy:
+        return busy_response()
 
     user = User(
         username=username,
         full_name=f"{first_name} {last_name}",
         email=email,
-        # Seed a temporary password for demo accounts.
-        password_hash=generate_password_hash("password123"),
+        password_hash=password_hash,
         role=role,
         department=department,
     )
     User.query.session.add(user)
     User.query.session.commit()
+    invalidate_summary()
 
     return jsonify({"user": _to_dict(user)}), 201
 
 
+# Sync users from a full directory (HR) export given as JSON or CSV.
+# New emails are created and changed names/departments/roles updated; users
+# missing from the export are deactivated only with ?deactivateMissing=true.
+# ?dryRun=true returns the diff without writing.
+@users_bp.post("/sync")
+def sync_users():
+    try:
+        rows = read_import_rows()
+        dry_run = bool(parse_bool_arg("dryRun"))
+        deactivate_missing = bool(parse_bool_arg("deactivateMissing"))
+        plan = plan_sync(rows, deactivate_missing)
+        if not dry_run:
+            apply_sync(plan, current_app.config["DIRECTORY_SYNC_MAX_DEACTIVATE_RATIO"])
+    except ValueError as exc:
+        return jsonify({"message": str(exc)}), 400
+    except PasswordHashingBusy:
+        return busy_response()
+    except IntegrityError:
+        # A concurrent write took a username or email after the diff.
+        db.session.rollback()
+        return jsonify({"message": "Sync conflicts with a concurrent change; retry it."}), 409
+    if not dry_run and (plan["create"] or plan["deactivate"]):
+        invalidate_summary()
+    return jsonify({"dryRun": dry_run, **plan}), 200
+
+
 # Fetch a user by id with related devices/computers.
 @users_bp.get("/<int:user_id>")
+@conditional_get("users", "devices", "computers")
 def get_user(user_id: int):
-    user = User.query.get_or_404(user_id)
+    key = detail_key("user", user_id)
+    return jsonify(cached_detail(key, lambda: _detail_dict(user_id), lambda: _detail_stamp(user_id)))
+
+
+# Row versions of a loaded user and its assets, as (kind, id, version) rows.
+def _detail_versions(user: User) -> list:
+    return (
+        [("user", user.id, user.row_version)]
+        + [("device", d.id, d.row_version) for d in user.devices]
+        + [("computer", c.id, c.row_version) for c in user.computers]
+    )
+
+
+# Read the detail stamp for a user in one query, without loading the rows.
+def _detail_stamp(user_id: int):
+    statement = union_all(
+        select(literal("user"), User.id, User.row_version).where(User.id == user_id),
+        select(literal("device"), Device.id, Device.row_version).where(Device.user_id == user_id),
+        select(literal("computer"), Computer.id, Computer.row_version).where(Computer.user_id == user_id),
+    )
+    return row_stamp(db.session.execute(statement))
+
+
+# Serialize a user with related devices/computers for detail views; returns
+# (payload, row stamp) for the detail cache.
+def _detail_dict(user_id: int):
+    user = User.query.options(
+        selectinload(User.devices), selectinload(User.computers)
+    ).get_or_404(user_id)
     payload = _to_dict(user)
     # Include related devices/computers for detail views.
     payload["devices"] = [
@@ -120,7 +270,14 @@ def get_user(user_id: int):
         {"id": c.id, "name": c.name, "model": c.model, "serialNumber": c.serial_number}
         for c in user.computers
     ]
-    return jsonify(payload)
+    return payload, row_stamp(_detail_versions(user))
+
+
+# Detail cache keys for a user's assets, whose payloads show the username.
+def _asset_keys(user: User) -> list:
+    return [detail_key("device", d.id) for d in user.devices] + [
+        detail_key("computer", c.id) for c in user.computers
+    ]
 
 
 # Update a user by id.
@@ -143,6 +300,10 @@ def update_user(user_id: int):
     if email != user.email and User.query.filter_by(email=email).first():
         return jsonify({"message": "Email already exists."}), 409
 
+    stale_keys = [detail_key("user", user.id)]
+    if username != user.username:
+        stale_keys += _asset_keys(user)
+
     user.full_name = full_name
     user.username = username
     user.email = email
@@ -150,6 +311,7 @@ def update_user(user_id: int):
     user.department = department
 
     db.session.commit()
+    invalidate_details(*stale_keys)
     return jsonify(_to_dict(user)), 200
 
 
@@ -157,6 +319,9 @@ def update_user(user_id: int):
 @users_bp.delete("/<int:user_id>")
 def delete_user(user_id: int):
     user = User.query.get_or_404(user_id)
+    stale_keys = [detail_key("user", user_id)] + _asset_keys(user)
     db.session.delete(user)
     db.session.commit()
+    invalidate_summary()
+    invalidate_details(*stale_keys)
     return "", 204
@@ -0,0 +1,99 @@
+import logging
+import os
+
+from sqlalchemy import exc, inspect, text
+
+from .extensions import db
+
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+# What each migration adds, oldest first, as (revision, {table: {column or
+# index names}}). Used to date a database built before Alembic by
+# db.create_all() or database/schema.sql; list new migrations here too.
+_REVISION_MARKERS = (
+    ("0001_baseline", {"users": {"id"}, "devices": {"id"}, "computers": {"id"}}),
+    (
+        "0002_agent_queue",
+        {
+            "agent_commands": {"rollout_id", "ix_agent_commands_agent_status_created"},
+            "computers": {"inventory_hash", "last_seen_at", "agent_version"},
+        },
+    ),
+    ("0003_hot_path_indexes", {"users": {"ix_users_department"}, "computers": {"ix_computers_agent_id"}}),
+    ("0004_search_indexes", {"users": {"ix_users_full_name"}, "devices": {"ix_devices_name"}}),
+    ("0005_table_versions", {"table_versions": {"version"}}),
+    ("0006_user_active", {"users": {"active"}}),
+    ("0007_command_sweep_indexes", {"agent_commands": {"ix_agent_commands_status_expires"}}),
+    ("0008_row_versions", {"users": {"row_version"}, "devices": {"row_version"}, "computers": {"row_version"}}),
+)
+
+
+# Newest revision shipped with this code. Alembic is imported on first call
+# only; with Gunicorn's preload_app that happens once in the master.
+def head_revision():
+    from alembic.script import ScriptDirectory
+
+    head = ScriptDirectory(MIGRATIONS_DIR).get_current_head()
+    if head is None:
+        raise RuntimeError("Expected one migration head, found none.")
+    return head
+
+
+# Revision recorded in the database, or None before the first migration.
+def current_revision():
+    try:
+        return db.session.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except exc.DBAPIError:
+        db.session.rollback()
+        return None
+
+
+# One-query startup check: compare the database revision with the code's head.
+# Migrations are applied deliberately with `flask --app manage db upgrade`.
+def check_schema(app):
+    with app.app_context():
+        expected = head_revision()
+        current = current_revision()
+        db.session.remove()
+    app.config["SCHEMA_REVISION"] = {"current": current, "expected": expected}
+    if current != expected:
+        logger.warning(
+            "Database schema is at %s but the code expects %s; run `flask --app manage db upgrade`.",
+            current or "no revision",
+            expected,
+        )
+    return current == expected
+
+
+# Revision matching the schema of a database that has tables but no
+# alembic_version row, or None for an empty or already versioned database.
+# Raises RuntimeError when a migration's changes are only partly present.
+def unversioned_revision():
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    if "alembic_version" in tables or "users" not in tables:
+        return None
+    names = {}
+    for table in tables:
+        columns = {column["name"] for column in inspector.get_columns(table)}
+        indexes = {index["name"] for index in inspector.get_indexes(table)}
+        names[table] = columns | indexes
+
+    matched = None
+    for revision, markers in _REVISION_MARKERS:
+        wanted = {(table, name) for table, items in markers.items() for name in items}
+        present = {(table, name) for table, name in wanted if name in names.get(table, ())}
+        if present == wanted:
+            matched = revision
+            continue
+        if present:
+            missing = ", ".join(f"{table}.{name}" for table, name in sorted(wanted - present))
+            raise RuntimeError(
+                f"Schema is past {matched} but only partly at {revision} (missing {missing}); "
+                "add the missing objects and run `flask --app manage db stamp` by hand."
+            )
+        break
+    return matched
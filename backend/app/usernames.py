@@ -0,0 +1,51 @@
+import re
+
+from sqlalchemy import or_, select
+
+from .extensions import db
+from .models import User
+
+
+# Prefixes OR-ed into one LIKE query when allocating usernames in bulk.
+_PREFIX_CHUNK = 500
+
+
+# Build a simple username seed and ensure it is URL-safe.
+def username_base(first_name: str, last_name: str) -> str:
+    base = re.sub(r"[^a-z0-9]", "", f"{first_name[:1]}{last_name}".lower())
+    if not base:
+        raise ValueError("Invalid name for username generation.")
+    return base
+
+
+# Usernames already starting with any of the bases. Each prefix is an index
+# range scan on the unique username index; bases hold no LIKE wildcards.
+def _taken_usernames(bases: list) -> set:
+    prefixes = sorted(set(bases))
+    taken = set()
+    for start in range(0, len(prefixes), _PREFIX_CHUNK):
+        chunk = prefixes[start:start + _PREFIX_CHUNK]
+        rows = db.session.execute(
+            select(User.username).where(or_(*[User.username.like(f"{base}%") for base in chunk]))
+        )
+        taken.update(username.lower() for (username,) in rows)
+    return taken
+
+
+# Allocate a unique username per base (base, base2, base3, ...) for a whole
+# batch with one prefix query per chunk instead of one query per suffix.
+def allocate_usernames(bases: list) -> list:
+    taken = _taken_usernames(bases)
+    # Lowest suffix not yet known to be taken, per base.
+    next_suffix: dict[str, int] = {}
+    allocated = []
+    for base in bases:
+        counter = next_suffix.get(base, 1)
+        username = base if counter == 1 else f"{base}{counter}"
+        while username in taken:
+            counter += 1
+            username = f"{base}{counter}"
+        taken.add(username)
+        next_suffix[base] = counter
+        allocated.append(username)
+    return allocated
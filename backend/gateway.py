@@ -0,0 +1,5 @@
+from app.agent_gateway import create_gateway
+
+# ASGI entry point for the agent protocol; the admin API stays on run:app.
+# uvicorn gateway:app --host 0.0.0.0 --port 5001
+app = create_gateway()
@@ -0,0 +1,38 @@
+import multiprocessing
+import os
+
+# Production WSGI settings; every value can be overridden from the environment.
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+
+# Threaded workers let agent long-polls park without tying up a process;
+# AGENT_LONG_POLL_MAX_PARKED keeps half of each worker's threads for the API.
+worker_class = "gthread"
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+# Load the app once in the master so workers fork with it already imported.
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+# Must exceed the longest agent long-poll (30 s).
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "75"))
+
+# Recycle workers periodically to cap slow memory growth.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+
+
+# Drop pooled DB connections inherited from the preloaded master, then start
+# the worker's heartbeat flusher, which also runs the periodic command sweep.
+def post_fork(server, worker):
+    from app.extensions import db
+    from app.heartbeats import start_flusher
+    from run import app
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+    start_flusher()
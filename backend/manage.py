@@ -0,0 +1,28 @@
+import os
+
+# The migration CLI is what brings the schema up to date, so skip the check.
+os.environ.setdefault("SCHEMA_CHECK_ON_STARTUP", "false")
+
+import click
+from flask_migrate import Migrate, stamp
+
+from app import create_app
+from app.extensions import db
+from app.schema import MIGRATIONS_DIR, unversioned_revision
+
+# Schema migrations: `flask --app manage db upgrade`.
+# Alembic is only loaded here so API workers boot without it.
+app = create_app()
+Migrate(app, db, directory=MIGRATIONS_DIR)
+
+
+# Stamp a database built before migrations (db.create_all or schema.sql) with
+# the revision its tables match, so `db upgrade` only applies what is missing.
+@app.cli.command("adopt-schema")
+def adopt_schema_command():
+    revision = unversioned_revision()
+    if revision is None:
+        click.echo("Schema is versioned or empty; nothing to adopt.")
+        return
+    stamp(directory=MIGRATIONS_DIR, revision=revision)
+    click.echo(f"Stamped the existing schema at {revision}.")
@@ -0,0 +1,75 @@
+"""Baseline: users, devices and computers
+
+Revision ID: 0001_baseline
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=80), nullable=False),
+        sa.Column('full_name', sa.String(length=120), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('password_hash', sa.String(length=255), nullable=False),
+        sa.Column('role', sa.String(length=40), nullable=False),
+        sa.Column('department', sa.String(length=80), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+        sa.UniqueConstraint('username'),
+    )
+    op.create_table(
+        'devices',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=120), nullable=False),
+        sa.Column('model', sa.String(length=120), nullable=False),
+        sa.Column('os_version', sa.String(length=80), nullable=True),
+        sa.Column('serial_number', sa.String(length=120), nullable=False),
+        sa.Column('udid', sa.String(length=120), nullable=True),
+        sa.Column('compliant', sa.Boolean(), nullable=False),
+        sa.Column('primary_mac', sa.String(length=50), nullable=True),
+        sa.Column('secondary_mac', sa.String(length=50), nullable=True),
+        sa.Column('processor_type', sa.String(length=80), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('serial_number'),
+        sa.UniqueConstraint('udid'),
+    )
+    op.create_table(
+        'computers',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=120), nullable=False),
+        sa.Column('model', sa.String(length=120), nullable=False),
+        sa.Column('os_version', sa.String(length=80), nullable=True),
+        sa.Column('serial_number', sa.String(length=120), nullable=False),
+        sa.Column('model_identifier', sa.String(length=120), nullable=True),
+        sa.Column('compliant', sa.Boolean(), nullable=False),
+        sa.Column('processor_type', sa.String(length=80), nullable=True),
+        sa.Column('architecture_type', sa.String(length=80), nullable=True),
+        sa.Column('cache_size', sa.String(length=50), nullable=True),
+        sa.Column('agent_id', sa.String(length=120), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('serial_number'),
+    )
+
+
+def downgrade():
+    op.drop_table('computers')
+    op.drop_table('devices')
+    op.drop_table('users')
@@ -0,0 +1,61 @@
+"""Agent command queue, inventory hashes and heartbeats
+
+Revision ID: 0002_agent_queue
+Revises: 0001_baseline
+Create Date: 2026-10-18 09:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_agent_queue'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'agent_commands',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('agent_id', sa.String(length=120), nullable=False),
+        sa.Column('rollout_id', sa.String(length=32), nullable=True),
+        sa.Column('command_type', sa.String(length=40), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column(
+            'created_at',
+            sa.DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql'),
+            nullable=False,
+        ),
+        sa.Column('dispatched_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_agent_commands_agent_status_created',
+        'agent_commands',
+        ['agent_id', 'status', 'created_at'],
+    )
+    op.create_index('ix_agent_commands_rollout_id', 'agent_commands', ['rollout_id'])
+
+    with op.batch_alter_table('computers') as batch_op:
+        batch_op.add_column(sa.Column('inventory_hash', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('last_seen_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('agent_version', sa.String(length=40), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('computers') as batch_op:
+        batch_op.drop_column('agent_version')
+        batch_op.drop_column('last_seen_at')
+        batch_op.drop_column('inventory_hash')
+
+    op.drop_index('ix_agent_commands_rollout_id', table_name='agent_commands')
+    op.drop_index('ix_agent_commands_agent_status_created', table_name='agent_commands')
+    op.drop_table('agent_commands')
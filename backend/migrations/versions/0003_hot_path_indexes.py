@@ -0,0 +1,36 @@
+"""Secondary indexes for hot lookup paths
+
+Revision ID: 0003_hot_path_indexes
+Revises: 0002_agent_queue
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_hot_path_indexes'
+down_revision = '0002_agent_queue'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_users_department', 'users', ['department'])
+    op.create_index('ix_devices_user_model', 'devices', ['user_id', 'model'])
+    op.create_index('ix_devices_compliant', 'devices', ['compliant'])
+    op.create_index('ix_computers_user_model', 'computers', ['user_id', 'model'])
+    op.create_index('ix_computers_compliant', 'computers', ['compliant'])
+    op.create_index('ix_computers_agent_id', 'computers', ['agent_id'])
+    op.create_index('ix_computers_last_seen_at', 'computers', ['last_seen_at'])
+
+
+def downgrade():
+    op.drop_index('ix_computers_last_seen_at', table_name='computers')
+    op.drop_index('ix_computers_agent_id', table_name='computers')
+    op.drop_index('ix_computers_compliant', table_name='computers')
+    op.drop_index('ix_computers_user_model', table_name='computers')
+    op.drop_index('ix_devices_compliant', table_name='devices')
+    op.drop_index('ix_devices_user_model', table_name='devices')
+    op.drop_index('ix_users_department', table_name='users')
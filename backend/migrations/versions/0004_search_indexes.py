@@ -0,0 +1,32 @@
+"""Indexes for prefix search
+
+Revision ID: 0004_search_indexes
+Revises: 0003_hot_path_indexes
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_search_indexes'
+down_revision = '0003_hot_path_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_users_full_name', 'users', ['full_name'])
+    op.create_index('ix_devices_name', 'devices', ['name'])
+    op.create_index('ix_devices_primary_mac', 'devices', ['primary_mac'])
+    op.create_index('ix_devices_secondary_mac', 'devices', ['secondary_mac'])
+    op.create_index('ix_computers_name', 'computers', ['name'])
+
+
+def downgrade():
+    op.drop_index('ix_computers_name', table_name='computers')
+    op.drop_index('ix_devices_secondary_mac', table_name='devices')
+    op.drop_index('ix_devices_primary_mac', table_name='devices')
+    op.drop_index('ix_devices_name', table_name='devices')
+    op.drop_index('ix_users_full_name', table_name='users')
@@ -0,0 +1,33 @@
+"""Per-table version counters for ETags
+
+Revision ID: 0005_table_versions
+Revises: 0004_search_indexes
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_table_versions'
+down_revision = '0004_search_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    table_versions = op.create_table(
+        'table_versions',
+        sa.Column('name', sa.String(length=40), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+    op.bulk_insert(
+        table_versions,
+        [{'name': name, 'version': 0} for name in ('users', 'devices', 'computers')],
+    )
+
+
+def downgrade():
+    op.drop_table('table_versions')
@@ -0,0 +1,28 @@
+"""Active flag on users for directory sync
+
+Revision ID: 0006_user_active
+Revises: 0005_table_versions
+Create Date: 2026-10-18 17:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_user_active'
+down_revision = '0005_table_versions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(
+            sa.Column('active', sa.Boolean(), nullable=False, server_default=sa.true())
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('active')
@@ -0,0 +1,26 @@
+"""Indexes for the fleet-wide agent command sweep
+
+Revision ID: 0007_command_sweep_indexes
+Revises: 0006_user_active
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_command_sweep_indexes'
+down_revision = '0006_user_active'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_agent_commands_status_expires', 'agent_commands', ['status', 'expires_at'])
+    op.create_index('ix_agent_commands_status_created', 'agent_commands', ['status', 'created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_agent_commands_status_created', table_name='agent_commands')
+    op.drop_index('ix_agent_commands_status_expires', table_name='agent_commands')
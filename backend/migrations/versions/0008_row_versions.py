@@ -0,0 +1,33 @@
+"""Per-row versions that validate cached detail payloads
+
+Revision ID: 0008_row_versions
+Revises: 0007_command_sweep_indexes
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_row_versions'
+down_revision = '0007_command_sweep_indexes'
+branch_labels = None
+depends_on = None
+
+
+_TABLES = ('users', 'devices', 'computers')
+
+
+def upgrade():
+    for table in _TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(
+                sa.Column('row_version', sa.BigInteger(), nullable=False, server_default='0')
+            )
+
+
+def downgrade():
+    for table in _TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('row_version')
@@ -1,7 +1,10 @@
 from app import create_app
+from app.heartbeats import start_flusher
 
 app = create_app()
 
 if __name__ == "__main__":
+    # Development server only; production runs `gunicorn -c gunicorn.conf.py run:app`.
     # Bind to all interfaces for local Docker/dev usage.
+    start_flusher()
     app.run(host="0.0.0.0", port=5000)
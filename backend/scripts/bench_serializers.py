@@ -0,0 +1,136 @@
+"""Benchmark list serialization: ORM objects + stdlib JSON vs row projections + orjson.
+
+Seeds a throwaway SQLite database with N computers (and owners), then times
+building the /api/computers response body three ways:
+
+  orm+json         ORM objects with joinedload, computer_to_dict, Flask's stdlib provider
+  rows+json        column projection rows, computer_row_to_dict, stdlib provider
+  rows+orjson      column projection rows, computer_row_to_dict, orjson provider
+
+Usage: python scripts/bench_serializers.py --rows 10000 100000 --repeat 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from sqlalchemy.orm import joinedload  # noqa: E402
+
+from app.config import Config  # noqa: E402
+
+
+# Point the app at a fresh SQLite file and create the schema there.
+def _make_app(path: str):
+    Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+    Config.SQLALCHEMY_ENGINE_OPTIONS = {}
+    Config.SCHEMA_CHECK_ON_STARTUP = False
+    from app import create_app
+    from app.extensions import db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def _seed(count: int):
+    from app.extensions import db
+    from app.models import Computer, User
+
+    owners = max(count // 4, 1)
+    db.session.execute(
+        db.insert(User),
+        [
+            {
+                "username": f"user{i}",
+                "full_name": f"User {i}",
+                "email": f"user{i}@example.com",
+                "password_hash": "x",
+                "role": "user",
+                "department": "IT",
+            }
+            for i in range(owners)
+        ],
+    )
+    db.session.execute(
+        db.insert(Computer),
+        [
+            {
+                "name": f"MBP-{i}",
+                "model": "MacBook Pro",
+                "os_version": "14.4",
+                "serial_number": f"C02{i:08d}",
+                "model_identifier": "Mac15,3",
+                "compliant": i % 3 == 0,
+                "processor_type": "Apple M3",
+                "architecture_type": "arm64",
+                "cache_size": "16 MB",
+                "agent_id": f"agent-{i}",
+                "user_id": i % owners + 1,
+            }
+            for i in range(count)
+        ],
+    )
+    db.session.commit()
+
+
+# Time fn() and return the best of `repeat` runs in milliseconds.
+def _best(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    from app.extensions import db
+    from app.json_provider import OrjsonProvider, orjson
+    from app.models import Computer
+    from app.registration import computer_row_to_dict, computer_to_dict
+    from app.routes import computers
+
+    print(f"{'rows':>8} {'orm+json':>10} {'rows+json':>10} {'rows+orjson':>12}  speedup")
+    for count in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            app = _make_app(os.path.join(tmp, "bench.db"))
+            stdlib, fast = DefaultJSONProvider(app), OrjsonProvider(app) if orjson else None
+            with app.app_context():
+                _seed(count)
+
+                def orm_json():
+                    db.session.expunge_all()
+                    rows = Computer.query.options(joinedload(Computer.user)).order_by(Computer.id.desc()).all()
+                    return stdlib.response([computer_to_dict(c) for c in rows])
+
+                def rows_with(provider):
+                    def run():
+                        rows = computers._list_query().order_by(Computer.id.desc()).all()
+                        return provider.response([computer_row_to_dict(row) for row in rows])
+                    return run
+
+                baseline = _best(orm_json, args.repeat)
+                projected = _best(rows_with(stdlib), args.repeat)
+                line = f"{count:>8} {baseline:>9.0f}ms {projected:>9.0f}ms"
+                if fast is not None:
+                    fastest = _best(rows_with(fast), args.repeat)
+                    line += f" {fastest:>11.0f}ms  {baseline / fastest:.1f}x"
+                else:
+                    line += f" {'n/a':>12}  {baseline / projected:.1f}x (orjson not installed)"
+                print(line)
+                db.session.remove()
+                db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
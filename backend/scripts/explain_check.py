@@ -0,0 +1,183 @@
+"""Fail if a hot query's plan regresses to a full table scan.
+
+Runs EXPLAIN (MySQL) or EXPLAIN QUERY PLAN (SQLite) on each hot lookup
+against the configured database and exits non-zero if any of them scans a
+whole table instead of using an index.
+
+Usage: python scripts/explain_check.py [--seed 2000]
+
+--seed fills empty tables with synthetic rows first so the planner sees a
+realistic table size; only use it against a throwaway database (CI).
+"""
+import argparse
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, text, true
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from app.command_queue import FINISHED_STATUSES, PENDING_STATUSES, claimable  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models import AgentCommand, Computer, Device, User  # noqa: E402
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _explain_mysql(element, compiler, **kw):
+    return "EXPLAIN " + compiler.process(element.statement, **kw)
+
+
+@compiles(Explain, "sqlite")
+def _explain_sqlite(element, compiler, **kw):
+    return "EXPLAIN QUERY PLAN " + compiler.process(element.statement, **kw)
+
+
+# Hot queries by name; each must be answered from an index.
+def _hot_queries() -> dict:
+    now = datetime.utcnow()
+    return {
+        "computer by agent": select(Computer.id).where(Computer.agent_id == "agent-1"),
+        "heartbeat flush": select(Computer.id).where(Computer.agent_id.in_(["agent-1", "agent-2"])),
+        "user's computers": select(Computer.id).where(Computer.user_id.in_([1, 2])),
+        "user's devices": select(Device.id).where(Device.user_id.in_([1, 2])),
+        "users ?model= probe": select(Computer.id).where(Computer.user_id == 1, Computer.model == "MacBook"),
+        "compliant computers": select(func.count()).select_from(Computer).where(Computer.compliant == true()),
+        "compliant devices": select(func.count()).select_from(Device).where(Device.compliant == true()),
+        "agents online": select(func.count()).select_from(Computer).where(
+            Computer.last_seen_at >= now - timedelta(minutes=2)
+        ),
+        "users by department": select(User.id).where(User.department == "IT"),
+        "next command": select(AgentCommand.id)
+        .where(AgentCommand.agent_id == "agent-1", claimable(now))
+        .order_by(AgentCommand.created_at, AgentCommand.id),
+        "command sweep (expire)": select(AgentCommand.id).where(
+            AgentCommand.status.in_(PENDING_STATUSES), AgentCommand.expires_at <= now
+        ),
+        "command sweep (purge)": select(AgentCommand.id).where(
+            AgentCommand.status.in_(FINISHED_STATUSES), AgentCommand.created_at < now - timedelta(days=7)
+        ),
+        "rollout status": select(AgentCommand.status, func.count())
+        .where(AgentCommand.rollout_id == "rollout-1")
+        .group_by(AgentCommand.status),
+        "search by serial": select(Computer.id)
+        .where(Computer.serial_number.like("SEED-C1%"))
+        .order_by(Computer.serial_number)
+        .limit(10),
+        "search by name": select(User.id).where(User.full_name.like("Seed User 1%")).order_by(User.full_name).limit(10),
+    }
+
+
+# SQLite's LIKE can only use NOCASE-collated indexes, so prefix search is
+# index-backed on MySQL (case-insensitive collation) only.
+_MYSQL_ONLY = {"search by serial", "search by name"}
+
+
+# Return the tables an EXPLAIN result reads without an index.
+def _full_scans(dialect: str, rows: list) -> list:
+    if dialect == "sqlite":
+        # "SCAN t" is a table scan; "SCAN t USING [COVERING] INDEX" is not.
+        return [row.detail for row in rows if row.detail.startswith("SCAN ") and " INDEX " not in row.detail]
+    return [row.table for row in rows if row.type == "ALL"]
+
+
+# Insert synthetic users, assets and commands into empty tables.
+def _seed(count: int):
+    if db.session.query(Computer.id).first() is not None:
+        return
+    now = datetime.utcnow()
+    users = [
+        {
+            "username": f"seed{i}",
+            "full_name": f"Seed User {i}",
+            "email": f"seed{i}@example.com",
+            "password_hash": "x",
+            "role": "user",
+            "department": ("IT", "Sales", "Finance", "Design")[i % 4],
+        }
+        for i in range(count // 4)
+    ]
+    db.session.execute(db.insert(User), users)
+    user_ids = [row[0] for row in db.session.query(User.id)]
+    for model, key in ((Computer, "C"), (Device, "D")):
+        rows = []
+        for i in range(count):
+            row = {
+                "name": f"{key}{i}",
+                "model": ("MacBook", "iMac", "iPad", "iPhone")[i % 4],
+                "serial_number": f"SEED-{key}{i}",
+                "compliant": i % 10 == 0,
+                "user_id": user_ids[i % len(user_ids)],
+            }
+            if model is Computer:
+                row["agent_id"] = f"agent-{i}"
+                row["last_seen_at"] = now - timedelta(minutes=i)
+            rows.append(row)
+        db.session.execute(db.insert(model), rows)
+    db.session.execute(
+        db.insert(AgentCommand),
+        [
+            {
+                "id": uuid.uuid4().hex,
+                "agent_id": f"agent-{i % count}",
+                "rollout_id": f"rollout-{i % 20}",
+                "command_type": "noop",
+                "status": "completed" if i % 2 else "queued",
+                "attempts": 0,
+                "created_at": now,
+                "expires_at": now + timedelta(days=1),
+            }
+            for i in range(count)
+        ],
+    )
+    db.session.commit()
+
+
+# Refresh planner statistics so small seeded tables plan like real ones.
+def _analyze(dialect: str):
+    if dialect == "sqlite":
+        db.session.execute(text("ANALYZE"))
+    else:
+        db.session.execute(text("ANALYZE TABLE users, devices, computers, agent_commands"))
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", type=int, default=0, help="rows to insert into empty tables first")
+    args = parser.parse_args()
+
+    app = create_app()
+    failures = 0
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        if args.seed:
+            _seed(args.seed)
+            _analyze(dialect)
+        for name, query in _hot_queries().items():
+            if name in _MYSQL_ONLY and dialect != "mysql":
+                print(f"skip {name}")
+                continue
+            rows = db.session.execute(Explain(query)).all()
+            scans = _full_scans(dialect, rows)
+            if scans:
+                failures += 1
+                print(f"FAIL {name}: full scan of {', '.join(scans)}")
+            else:
+                print(f"ok   {name}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
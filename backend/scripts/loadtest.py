@@ -0,0 +1,73 @@
+"""Minimal concurrent HTTP load generator for comparing API serving modes.
+
+Usage: python scripts/loadtest.py http://127.0.0.1:5000/api/dashboard/summary \
+    --concurrency 32 --duration 10
+"""
+import argparse
+import http.client
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+# Issue requests on one keep-alive connection until the deadline.
+def _worker(url: str, deadline: float, results: list, lock: threading.Lock):
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    conn = None
+    ok = errors = 0
+    latencies = []
+    while time.monotonic() < deadline:
+        if conn is None:
+            conn = http.client.HTTPConnection(parts.netloc, timeout=30)
+        started = time.monotonic()
+        try:
+            conn.request("GET", path)
+            resp = conn.getresponse()
+            resp.read()
+            if resp.will_close:
+                conn.close()
+                conn = None
+            if resp.status < 400:
+                ok += 1
+                latencies.append(time.monotonic() - started)
+            else:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn = None
+    with lock:
+        results.append((ok, errors, latencies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("url")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    results, lock = [], threading.Lock()
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(target=_worker, args=(args.url, deadline, results, lock))
+        for _ in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ok = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    latencies = sorted(l for r in results for l in r[2])
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+    print(
+        f"{ok / args.duration:.0f} req/s  ok={ok} errors={errors}  "
+        f"p50={p50:.1f}ms p99={p99:.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import pytest
+from sqlalchemy import event
+
+from app import create_app
+from app.config import Config
+from app.extensions import db
+from app.models import Computer, Device, TableVersion, User
+from app.routes.dashboard import invalidate_summary
+
+
+class TestingConfig(Config):
+    # In-memory SQLite with one shared connection, hashing inline, no boot check.
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    SCHEMA_CHECK_ON_STARTUP = False
+    DETAIL_CACHE_BACKEND = "local"
+    PASSWORD_HASH_WORKERS = 0
+    PASSWORD_HASH_METHOD = "pbkdf2:sha256:1000"
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([TableVersion(name=name, version=0) for name in ("users", "devices", "computers")])
+        db.session.commit()
+        invalidate_summary()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+class StatementCounter:
+    # Counts SQL statements sent to the engine while active.
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __len__(self):
+        return len(self.statements)
+
+
+@pytest.fixture
+def count_statements(app):
+    counter = StatementCounter()
+    event.listen(db.engine, "before_cursor_execute", counter)
+    yield counter
+    event.remove(db.engine, "before_cursor_execute", counter)
+
+
+# Seed users that each own `per_user` devices and computers; `start`
+# offsets the generated names so repeated calls do not collide.
+def seed_inventory(users: int, per_user: int = 2, start: int = 0):
+    for i in range(start, start + users):
+        user = User(
+            username=f"user{i}",
+            full_name=f"User {i}",
+            email=f"user{i}@example.com",
+            password_hash="x",
+            department="IT" if i % 2 else "Sales",
+        )
+        db.session.add(user)
+        for j in range(per_user):
+            db.session.add(Device(name=f"d{i}-{j}", model="iPad", serial_number=f"D{i}-{j}", user=user))
+            db.session.add(
+                Computer(name=f"c{i}-{j}", model="MacBook", serial_number=f"C{i}-{j}", user=user, agent_id=f"a{i}-{j}")
+            )
+    db.session.commit()
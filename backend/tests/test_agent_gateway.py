@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("starlette")
+pytest.importorskip("aiosqlite")
+pytest.importorskip("httpx")
+
+from starlette.testclient import TestClient  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.agent_gateway import create_gateway  # noqa: E402
+from app.command_queue import build_command, enqueue_command  # noqa: E402
+from app.config import Config  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models import AgentCommand, Computer, TableVersion  # noqa: E402
+
+from conftest import TestingConfig, seed_inventory  # noqa: E402
+
+
+# Flask app and gateway sharing one SQLite file, as they share MySQL in production.
+@pytest.fixture
+def stack(tmp_path, monkeypatch):
+    path = tmp_path / "gateway.db"
+    config = type("FileConfig", (TestingConfig,), {"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([TableVersion(name=name, version=0) for name in ("users", "devices", "computers")])
+        db.session.commit()
+        seed_inventory(1, per_user=1)
+        db.session.remove()
+    monkeypatch.setattr(Config, "AGENT_GATEWAY_DATABASE_URI", f"sqlite+aiosqlite:///{path}")
+    with TestClient(create_gateway()) as gateway:
+        yield app, app.test_client(), gateway
+    with app.app_context():
+        db.drop_all()
+
+
+def _registration(name: str, serial: str = "C0-0") -> dict:
+    return {"agentId": "a0-0", "serialNumber": serial, "name": name, "model": "MacBook"}
+
+
+def test_claimed_command_reports_dispatched(stack):
+    app, _, gateway = stack
+    with app.app_context():
+        command_id = enqueue_command("a0-0", "lock", {}).id
+    body = gateway.get("/api/agents/a0-0/commands/next").json()
+    assert body["command"]["id"] == command_id
+    assert body["command"]["status"] == "dispatched"
+
+
+def test_gateway_writes_reach_flask_caches(stack):
+    app, client, gateway = stack
+    with app.app_context():
+        computer_id = db.session.query(Computer.id).scalar()
+    before = client.get(f"/api/computers/{computer_id}")
+    assert client.get("/api/dashboard/summary").get_json()["counts"]["computers"] == 1
+
+    assert gateway.post("/api/agents/register", json=_registration("renamed")).status_code == 200
+    assert gateway.post("/api/agents/register", json=_registration("new", "C9")).status_code == 201
+
+    after = client.get(f"/api/computers/{computer_id}", headers={"If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200
+    assert after.get_json()["name"] == "renamed"
+    assert client.get("/api/dashboard/summary").get_json()["counts"]["computers"] == 2
+
+
+def test_complete_unknown_command_is_not_found(stack):
+    _, _, gateway = stack
+    assert gateway.post("/api/agents/a0-0/commands/missing/complete", json={}).status_code == 404
+
+
+def test_gateway_sweeps_commands(stack):
+    app, _, gateway = stack
+    with app.app_context():
+        overdue = build_command("a0-0", "lock", {}, ttl_seconds=1, now=datetime.utcnow() - timedelta(hours=1))
+        db.session.add(overdue)
+        db.session.commit()
+        command_id = overdue.id
+    assert gateway.portal.call(gateway.app.state.gateway.sweep_commands) == (1, 0)
+    with app.app_context():
+        assert db.session.get(AgentCommand, command_id).status == "expired"
@@ -0,0 +1,37 @@
+from app.extensions import db
+from app.models import Device
+
+from conftest import seed_inventory
+
+
+def _device(serial: str, **fields) -> dict:
+    return {"name": f"iPad {serial}", "model": "iPad", "serialNumber": serial, **fields}
+
+
+def test_rejected_row_does_not_mark_later_rows_duplicate(app, client):
+    seed_inventory(1)
+    rows = [_device("N1", user="nobody"), _device("N1", user="user0"), _device("N1"), _device("D0-0")]
+    report = client.post("/api/devices/import", json=rows).get_json()
+    assert [row["status"] for row in report["rows"]] == ["invalid", "created", "duplicate", "conflict"]
+    created = db.session.query(Device).filter_by(serial_number="N1").one()
+    assert report["rows"][1]["id"] == created.id
+    assert created.user.username == "user0"
+
+
+def test_unowned_rows_import(app, client):
+    report = client.post("/api/devices/import", json=[_device("N1"), _device("N2", user="")]).get_json()
+    assert report["created"] == 2
+    assert {row["id"] for row in report["rows"]} == {d.id for d in Device.query}
+
+
+def test_csv_body_with_byte_order_mark(app, client):
+    body = "\ufeffname,model,serialNumber\nLab iPad,iPad,N1\n".encode("utf-8")
+    response = client.post("/api/devices/import", data=body, content_type="text/csv")
+    assert response.status_code == 200
+    assert response.get_json()["created"] == 1
+
+
+def test_csv_must_be_utf8(app, client):
+    response = client.post("/api/devices/import", data=b"name\n\xff\n", content_type="text/csv")
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "CSV must be UTF-8 encoded."
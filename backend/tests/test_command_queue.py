@@ -0,0 +1,115 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app import heartbeats
+from app.command_queue import (
+    COMMAND_RETENTION_SECONDS,
+    LONG_POLL_SWEEP_SECONDS,
+    _command_values,
+    build_command,
+    enqueue_command,
+    sweep_commands,
+    wait_for_command,
+)
+from app.extensions import db
+from app.models import AgentCommand
+
+
+def test_sweep_expires_and_purges_every_agent(app):
+    now = datetime.utcnow()
+    old = now - timedelta(seconds=COMMAND_RETENTION_SECONDS + 60)
+    overdue = build_command("quiet-1", "lock", {}, ttl_seconds=60, now=now - timedelta(hours=1))
+    live = build_command("quiet-2", "lock", {}, now=now)
+    finished = build_command("quiet-3", "lock", {}, now=old)
+    finished.status = "completed"
+    db.session.add_all([overdue, live, finished])
+    db.session.commit()
+
+    assert sweep_commands(now) == (1, 1)
+    statuses = {command.agent_id: command.status for command in AgentCommand.query}
+    assert statuses == {"quiet-1": "expired", "quiet-2": "queued"}
+
+
+def test_enqueue_only_tidies_its_own_agent(app):
+    stale = build_command("other", "lock", {}, ttl_seconds=1, now=datetime.utcnow() - timedelta(hours=1))
+    db.session.add(stale)
+    db.session.commit()
+    enqueue_command("agent-1", "lock", {})
+    assert db.session.get(AgentCommand, stale.id).status == "queued"
+    sweep_commands()
+    db.session.expire_all()
+    assert db.session.get(AgentCommand, stale.id).status == "expired"
+
+
+def test_expire_commands_cli(app):
+    db.session.add(build_command("quiet", "lock", {}, ttl_seconds=1, now=datetime.utcnow() - timedelta(hours=1)))
+    db.session.commit()
+    result = app.test_cli_runner().invoke(args=["expire-commands"])
+    assert "Expired 1 command(s), purged 0." in result.output
+
+
+def test_long_poll_wakes_for_commands_enqueued_elsewhere(app):
+    # A command written by another process: no notify_agent() in this one.
+    def enqueue_elsewhere():
+        time.sleep(0.3)
+        with app.app_context():
+            db.session.execute(insert(AgentCommand), [_command_values("agent-1", "lock", {}, None, datetime.utcnow())])
+            db.session.commit()
+
+    writer = threading.Thread(target=enqueue_elsewhere)
+    writer.start()
+    started = time.monotonic()
+    command = wait_for_command("agent-1", 10, max_parked=10)
+    writer.join()
+    assert command is not None and command.command_type == "lock"
+    assert time.monotonic() - started < 0.3 + 2 * LONG_POLL_SWEEP_SECONDS + 0.5
+
+
+def test_parked_long_poll_issues_no_queries_of_its_own(app, count_statements):
+    started = time.monotonic()
+    assert wait_for_command("agent-1", 2, max_parked=10) is None
+    assert time.monotonic() - started >= 2
+    statements = count_statements.statements
+    # Only the initial claim; afterwards the worker's sweep thread checks for it.
+    assert len([s for s in statements if "ORDER BY agent_commands.created_at" in s]) == 1
+    assert any(s.startswith("SELECT DISTINCT agent_commands.agent_id") for s in statements)
+
+
+def test_long_polls_past_the_cap_return_at_once(app, client):
+    app.config["AGENT_LONG_POLL_MAX_PARKED"] = 1
+    parked = threading.Thread(target=lambda: app.test_client().get("/api/agents/agent-1/commands/next?wait=2"))
+    parked.start()
+    time.sleep(0.3)
+    started = time.monotonic()
+    response = client.get("/api/agents/agent-2/commands/next?wait=25")
+    assert time.monotonic() - started < 1
+    assert response.get_json() == {"command": None, "nextPollSeconds": app.config["AGENT_LONG_POLL_BUSY_SECONDS"]}
+    parked.join()
+
+    # The slot is free again once the parked poll returns.
+    enqueue_command("agent-2", "lock", {})
+    assert client.get("/api/agents/agent-2/commands/next?wait=1").get_json()["command"]["type"] == "lock"
+
+
+def test_sweep_runs_without_heartbeat_traffic(app, monkeypatch):
+    overdue = build_command("quiet", "lock", {}, ttl_seconds=1, now=datetime.utcnow() - timedelta(hours=1))
+    db.session.add(overdue)
+    db.session.commit()
+    monkeypatch.setattr(heartbeats, "HEARTBEAT_FLUSH_SECONDS", 0.05)
+    monkeypatch.setitem(heartbeats._flusher, "sweep_seconds", 0.05)
+    heartbeats._flusher["swept_at"] = 0.0
+    try:
+        # What gunicorn's post_fork does; no record_heartbeat() call.
+        heartbeats.start_flusher()
+        # An already running thread may finish a full flush interval first.
+        deadline = time.monotonic() + 10
+        while db.session.get(AgentCommand, overdue.id).status != "expired":
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+            db.session.expire_all()
+    finally:
+        # Keep the still-running thread from sweeping during later tests.
+        heartbeats._flusher["swept_at"] = time.monotonic()
@@ -0,0 +1,103 @@
+from datetime import datetime
+
+from sqlalchemy import update
+
+from app.detail_cache import detail_cache_stats, init_detail_cache
+from app.extensions import db
+from app.heartbeats import heartbeat_statement
+from app.models import Computer, User
+from app.etags import bump_statement
+from app.registration import upsert_statement
+
+from conftest import seed_inventory
+
+
+# Rename a computer the way another worker or the gateway would: a Core
+# write plus a version bump, with no invalidation reaching this process.
+def _rename_elsewhere(computer_id: int, name: str):
+    db.session.execute(update(Computer).where(Computer.id == computer_id).values(name=name))
+    db.session.execute(bump_statement(["computers"]))
+    db.session.commit()
+
+
+def test_write_from_another_process_is_a_miss(app, client):
+    seed_inventory(1)
+    computer_id = db.session.query(Computer.id).order_by(Computer.id).first()[0]
+    first = client.get(f"/api/computers/{computer_id}")
+    assert first.get_json()["name"] == "c0-0"
+
+    _rename_elsewhere(computer_id, "renamed")
+    second = client.get(f"/api/computers/{computer_id}", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200
+    assert second.get_json()["name"] == "renamed"
+    assert detail_cache_stats()["stale"] == 1
+
+    # The refreshed entry is served, and revalidates, under the new ETag.
+    third = client.get(f"/api/computers/{computer_id}")
+    assert third.get_json()["name"] == "renamed"
+    assert third.headers["ETag"] == second.headers["ETag"]
+    assert client.get(f"/api/computers/{computer_id}", headers={"If-None-Match": third.headers["ETag"]}).status_code == 304
+
+
+def test_write_to_a_related_table_is_a_miss(app, client):
+    seed_inventory(1)
+    user_id = db.session.query(User.id).scalar()
+    computer_id = db.session.query(Computer.id).order_by(Computer.id).first()[0]
+    client.get(f"/api/users/{user_id}")
+
+    _rename_elsewhere(computer_id, "renamed")
+    names = [computer["name"] for computer in client.get(f"/api/users/{user_id}").get_json()["computers"]]
+    assert "renamed" in names
+
+
+def test_write_to_an_unrelated_row_keeps_the_entry(app, client, count_statements):
+    seed_inventory(2)
+    first_id, other_id = [row[0] for row in db.session.query(Computer.id).order_by(Computer.id).limit(2)]
+    client.get(f"/api/computers/{first_id}")
+
+    _rename_elsewhere(other_id, "renamed")
+    count_statements.statements.clear()
+    second = client.get(f"/api/computers/{first_id}")
+    assert second.get_json()["name"] == "c0-0"
+    # Version lookup plus the row stamp check, not a reload.
+    assert len(count_statements) == 2
+    stats = detail_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["stale"], stats["revalidations"]) == (1, 1, 0, 1)
+
+    # The entry was retagged, so the next read skips the stamp check.
+    count_statements.statements.clear()
+    assert client.get(f"/api/computers/{first_id}").get_json()["name"] == "c0-0"
+    assert len(count_statements) == 1
+
+
+def test_write_to_another_users_asset_keeps_the_user_entry(app, client):
+    seed_inventory(2)
+    user_id, other_user_id = [row[0] for row in db.session.query(User.id).order_by(User.id)]
+    other_id = db.session.query(Computer.id).filter(Computer.user_id == other_user_id).first()[0]
+    client.get(f"/api/users/{user_id}")
+
+    _rename_elsewhere(other_id, "renamed")
+    names = [computer["name"] for computer in client.get(f"/api/users/{user_id}").get_json()["computers"]]
+    assert names == ["c0-0", "c0-1"]
+    assert detail_cache_stats()["revalidations"] == 1
+
+
+def test_upserts_bump_row_versions_and_heartbeats_keep_them(app):
+    seed_inventory(1, per_user=1)
+    seen_at = datetime(2026, 10, 19, 12, 0)
+    db.session.execute(heartbeat_statement({"a0-0": (seen_at, "2.0")}, ["a0-0"]))
+    db.session.commit()
+    assert db.session.query(Computer.row_version, Computer.agent_version).one() == (0, "2.0")
+
+    row = {"serial_number": "C0-0", "name": "renamed", "model": "MacBook"}
+    db.session.execute(upsert_statement([row], "sqlite"))
+    db.session.commit()
+    assert db.session.query(Computer.row_version, Computer.name).one() == (1, "renamed")
+
+
+def test_init_detail_cache_takes_a_plain_mapping(app):
+    config = {"DETAIL_CACHE_TTL_SECONDS": 5, "DETAIL_CACHE_BACKEND": "local", "DETAIL_CACHE_MAX_ENTRIES": 7}
+    init_detail_cache(config)
+    assert detail_cache_stats()["maxEntries"] == 7
+    init_detail_cache({**config, "DETAIL_CACHE_TTL_SECONDS": 0})
+    assert detail_cache_stats() == {"backend": "disabled"}
@@ -0,0 +1,83 @@
+import pytest
+
+from app.extensions import db
+from app.models import User
+from app.usernames import allocate_usernames
+
+from conftest import seed_inventory
+
+
+# Directory records for the seeded users user{i}@example.com.
+def _record(i: int, **fields) -> dict:
+    return {
+        "firstName": "User",
+        "lastName": str(i),
+        "email": f"user{i}@example.com",
+        "department": "IT" if i % 2 else "Sales",
+        **fields,
+    }
+
+
+def _active():
+    return {user.username for user in User.query.filter_by(active=True)}
+
+
+def test_missing_users_are_kept_unless_requested(app, client):
+    seed_inventory(20, per_user=0)
+    export = [_record(i) for i in range(19)] + [{**_record(99), "firstName": "Ada", "lastName": "Lovelace"}]
+    body = client.post("/api/users/sync", json=export).get_json()
+    assert (len(body["create"]), body["deactivate"]) == (1, [])
+    assert "user19" in _active() and "alovelace" in _active()
+
+    body = client.post("/api/users/sync?deactivateMissing=true", json=export).get_json()
+    assert [entry["username"] for entry in body["deactivate"]] == ["user19"]
+    assert "user19" not in _active()
+
+
+def test_invalid_records_refuse_the_whole_sync(app, client):
+    seed_inventory(3, per_user=0)
+    export = [_record(0, department="HR"), {"email": "broken@example.com"}]
+    response = client.post("/api/users/sync?deactivateMissing=true", json=export)
+    assert response.status_code == 400
+    assert "1 record(s) are invalid" in response.get_json()["message"]
+    db.session.expire_all()
+    assert db.session.get(User, 1).department == "Sales"
+    assert len(_active()) == 3
+
+    # A dry run still reports the plan.
+    body = client.post("/api/users/sync?dryRun=true&deactivateMissing=true", json=export).get_json()
+    assert len(body["invalid"]) == 1 and len(body["deactivate"]) == 2
+
+
+def test_mass_deactivation_is_refused(app, client):
+    seed_inventory(20, per_user=0)
+    truncated = [_record(i) for i in range(10)]
+    response = client.post("/api/users/sync?deactivateMissing=true", json=truncated)
+    assert response.status_code == 400
+    assert "deactivate 10 of 20" in response.get_json()["message"]
+    assert len(_active()) == 20
+
+    app.config["DIRECTORY_SYNC_MAX_DEACTIVATE_RATIO"] = 0.5
+    assert client.post("/api/users/sync?deactivateMissing=true", json=truncated).status_code == 200
+    assert len(_active()) == 10
+
+
+@pytest.mark.parametrize(
+    "existing,bases,expected",
+    [
+        ([], ["jdoe", "jdoe", "asmith"], ["jdoe", "jdoe2", "asmith"]),
+        (["jdoe", "jdoe2", "jdoe4"], ["jdoe", "jdoe", "jdoe"], ["jdoe3", "jdoe5", "jdoe6"]),
+        # A longer name sharing the prefix does not take the base.
+        (["jdoes"], ["jdoe"], ["jdoe"]),
+    ],
+)
+def test_allocate_usernames(app, existing, bases, expected):
+    for username in existing:
+        db.session.add(User(username=username, full_name=username, email=f"{username}@example.com", password_hash="x"))
+    db.session.commit()
+    assert allocate_usernames(bases) == expected
+
+
+def test_allocate_usernames_is_one_query_per_chunk(app, count_statements):
+    allocate_usernames([f"user{i}" for i in range(600)])
+    assert len(count_statements) == 2
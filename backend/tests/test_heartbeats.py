@@ -0,0 +1,67 @@
+import logging
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app import heartbeats
+from app.extensions import db
+from app.models import Computer
+
+from conftest import seed_inventory
+
+
+@pytest.fixture
+def buffer(app):
+    heartbeats._pending.clear()
+    seed_inventory(2, per_user=2)
+    yield heartbeats
+    heartbeats._pending.clear()
+
+
+def _computer(agent_id: str) -> Computer:
+    db.session.expire_all()
+    return Computer.query.filter_by(agent_id=agent_id).one()
+
+
+def test_polls_collapse_into_one_entry_per_agent(buffer):
+    buffer.record_heartbeat("a0-0", "1.2")
+    buffer.record_heartbeat("a0-0")
+    buffer.record_heartbeat("a0-1")
+    assert set(buffer._pending) == {"a0-0", "a0-1"}
+    # A poll without a version header keeps the last reported one.
+    assert buffer._pending["a0-0"][1] == "1.2"
+
+
+def test_flush_writes_every_agent_with_one_update_per_chunk(buffer, count_statements, monkeypatch):
+    monkeypatch.setattr(buffer, "FLUSH_CHUNK", 2)
+    _computer("a1-1").agent_version = "0.9"
+    db.session.commit()
+    for agent_id in ("a0-0", "a0-1", "a1-0", "a1-1", "unknown"):
+        buffer.record_heartbeat(agent_id, "2.0" if agent_id == "a0-0" else None)
+    count_statements.statements.clear()
+
+    assert buffer.flush_heartbeats() == 5
+    updates = [s for s in count_statements.statements if s.startswith("UPDATE computers")]
+    assert len(updates) == 3
+    assert all(_computer(a).last_seen_at is not None for a in ("a0-0", "a0-1", "a1-0", "a1-1"))
+    assert _computer("a0-0").agent_version == "2.0"
+    # Agents that sent no version keep the stored one.
+    assert _computer("a1-1").agent_version == "0.9"
+    assert buffer._pending == {}
+
+
+def test_failed_flush_is_logged_and_kept(buffer, monkeypatch, caplog):
+    buffer.record_heartbeat("a0-0", "1.0")
+
+    def broken(batch, chunk):
+        raise OperationalError("UPDATE computers", {}, Exception("gone away"))
+
+    monkeypatch.setattr(buffer, "heartbeat_statement", broken)
+    with caplog.at_level(logging.ERROR, logger="app.heartbeats"):
+        assert buffer.flush_heartbeats() == 0
+    assert "Heartbeat flush failed" in caplog.text
+    assert buffer._pending["a0-0"][1] == "1.0"
+
+    monkeypatch.undo()
+    assert buffer.flush_heartbeats() == 1
+    assert _computer("a0-0").agent_version == "1.0"
@@ -0,0 +1,83 @@
+import base64
+import json
+
+import pytest
+
+from app.extensions import db
+from app.models import Computer, Device
+from app.routes import computers, devices, users
+
+from conftest import seed_inventory
+
+
+# List route -> its sort keys, which are also the item fields they read.
+_ROUTES = {
+    "/api/users": users._SORT_KEYS,
+    "/api/devices": devices._SORT_KEYS,
+    "/api/computers": computers._SORT_KEYS,
+}
+
+
+@pytest.fixture
+def inventory(app):
+    seed_inventory(4, per_user=2)
+    # Mixed compliance so boolean keysets cross from one value to the other.
+    for model in (Device, Computer):
+        for asset in model.query.filter(model.id % 3 == 0):
+            asset.compliant = True
+    db.session.commit()
+
+
+# Follow nextCursor until the last page and return every item seen.
+def _walk(client, url: str) -> list:
+    items, cursor, pages = [], None, 0
+    while True:
+        response = client.get(url + (f"&after={cursor}" if cursor else ""))
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        items += body["items"]
+        pages += 1
+        cursor = body["nextCursor"]
+        if cursor is None:
+            return items
+        assert pages < 50
+
+
+@pytest.mark.parametrize(
+    "route,key,descending",
+    [(route, key, descending) for route, keys in _ROUTES.items() for key in keys for descending in (False, True)],
+)
+def test_every_sort_key_pages_to_the_end(client, inventory, route, key, descending):
+    sort = f"-{key}" if descending else key
+    walked = _walk(client, f"{route}?limit=3&sort={sort}")
+    everything = client.get(route).get_json()
+    expected = sorted(everything, key=lambda item: (item[key], item["id"]), reverse=descending)
+    assert [item["id"] for item in walked] == [item["id"] for item in expected]
+
+
+def _cursor(data) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize(
+    "sort,data",
+    [
+        ("name", {"s": "name", "v": {"x": 1}, "id": 1}),
+        ("name", {"s": "name", "v": [1], "id": 1}),
+        ("-id", {"s": "-id", "id": None}),
+        ("-id", {"s": "-id", "v": 1, "id": "1"}),
+        ("-id", {"s": "-id", "v": 1, "id": True}),
+        ("compliant", {"s": "compliant", "v": "yes", "id": 1}),
+        ("name", {"s": "-id", "v": 1, "id": 1}),
+    ],
+)
+def test_forged_cursors_are_rejected(client, inventory, sort, data):
+    response = client.get(f"/api/computers?limit=2&sort={sort}&after={_cursor(data)}")
+    assert response.status_code == 400
+
+
+def test_garbage_cursor_and_limits(client, inventory):
+    assert client.get("/api/devices?after=%%%").status_code == 400
+    assert client.get("/api/devices?limit=0").status_code == 400
+    assert client.get("/api/devices?limit=x").status_code == 400
+    assert client.get("/api/devices?limit=2&sort=password").status_code == 400
@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+
+import pytest
+
+from app import passwords
+from app.passwords import PasswordHashingBusy, hash_password, needs_rehash, verify_password
+
+
+# A real one-process spawn pool admitting a single pending call.
+@pytest.fixture
+def pool(app, monkeypatch):
+    monkeypatch.setitem(passwords._settings, "workers", 1)
+    monkeypatch.setitem(passwords._settings, "max_pending", 1)
+    monkeypatch.setitem(passwords._settings, "timeout", 10.0)
+    yield passwords
+    executor = passwords._pool["executor"]
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+    passwords._pool.update(executor=None, pid=None, slots=None)
+
+
+# Occupy the pool's only slot for `seconds` from another thread.
+def _hold_slot(seconds: float) -> threading.Thread:
+    thread = threading.Thread(target=passwords._run, args=(time.sleep, seconds))
+    thread.start()
+    deadline = time.monotonic() + 5
+    while passwords._pool["slots"] is None or passwords._pool["slots"]._value:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    return thread
+
+
+def test_hashes_round_trip_through_the_pool(pool):
+    stored = hash_password("Secret1!")
+    assert verify_password(stored, "Secret1!")
+    assert not verify_password(stored, "wrong")
+    assert pool._pool["pid"] == os.getpid()
+
+
+def test_full_queue_sheds_with_503(pool, client):
+    holder = _hold_slot(2)
+    started = time.monotonic()
+    with pytest.raises(PasswordHashingBusy, match="queue is full"):
+        hash_password("Secret1!")
+    response = client.post(
+        "/api/users",
+        json={"firstName": "Ada", "lastName": "Lovelace", "email": "ada@example.com", "role": "user", "department": "IT"},
+    )
+    assert time.monotonic() - started < 1
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(pool._settings["retry_after"])
+    holder.join()
+    assert hash_password("Secret1!")
+
+
+def test_slow_hash_times_out(pool, monkeypatch):
+    monkeypatch.setitem(pool._settings, "timeout", 0.2)
+    with pytest.raises(PasswordHashingBusy, match="timed out"):
+        pool._run(time.sleep, 1)
+    # The slot is held until the job really finishes.
+    with pytest.raises(PasswordHashingBusy, match="queue is full"):
+        pool._run(abs, -1)
+
+
+def test_broken_pool_is_shut_down_and_replaced(pool, monkeypatch):
+    pool._run(abs, -1)
+    broken = pool._pool["executor"]
+    shutdowns = []
+    shutdown = broken.shutdown
+    monkeypatch.setattr(broken, "shutdown", lambda **kwargs: (shutdowns.append(kwargs), shutdown(**kwargs)))
+    with pytest.raises(PasswordHashingBusy, match="restarted"):
+        pool._run(os._exit, 1)
+    assert pool._pool["executor"] is None
+    assert shutdowns == [{"wait": False, "cancel_futures": True}]
+    assert pool._run(abs, -1) == 1
+    assert pool._pool["executor"] is not broken
+
+
+@pytest.mark.parametrize(
+    "stored,expected",
+    [
+        ("pbkdf2:sha256:1000$salt$hash", False),
+        ("pbkdf2:sha256:600000$salt$hash", True),
+        ("scrypt:32768:8:1$salt$hash", True),
+    ],
+)
+def test_needs_rehash(app, stored, expected):
+    assert needs_rehash(stored) is expected
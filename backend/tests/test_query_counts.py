@@ -0,0 +1,65 @@
+import pytest
+
+from app.extensions import db
+from app.models import Computer, Device, User
+
+from conftest import seed_inventory
+
+
+# Statements each route may issue regardless of row count: the ETag's
+# table-version lookup plus the route's own loads.
+_ROUTE_BUDGETS = {
+    "/api/users": 2,
+    "/api/devices": 2,
+    "/api/computers": 2,
+    "/api/users?limit=50": 2,
+    "/api/devices?limit=50": 2,
+    "/api/computers?limit=50": 2,
+}
+
+
+@pytest.mark.parametrize("url,budget", sorted(_ROUTE_BUDGETS.items()))
+def test_list_query_count_does_not_grow_with_rows(app, client, count_statements, url, budget):
+    for users in (3, 30):
+        existing = User.query.count()
+        seed_inventory(users - existing, start=existing)
+        db.session.expire_all()
+        count_statements.statements.clear()
+        response = client.get(url)
+        assert response.status_code == 200
+        assert len(count_statements) == budget, count_statements.statements
+
+
+@pytest.mark.parametrize(
+    "kind,budget",
+    [
+        # Version lookup, the user, then one selectin query per collection.
+        ("users", 4),
+        # Version lookup and the asset joined to its owner.
+        ("devices", 2),
+        ("computers", 2),
+    ],
+)
+def test_detail_query_count_is_fixed(app, client, count_statements, kind, budget):
+    seed_inventory(2, per_user=10)
+    model = {"users": User, "devices": Device, "computers": Computer}[kind]
+    entity_id = db.session.query(model.id).order_by(model.id).first()[0]
+    db.session.expire_all()
+    count_statements.statements.clear()
+    response = client.get(f"/api/{kind}/{entity_id}")
+    assert response.status_code == 200
+    assert len(count_statements) == budget, count_statements.statements
+    if kind == "users":
+        assert len(response.get_json()["devices"]) == 10
+    else:
+        assert response.get_json()["user"] == "user0"
+
+
+def test_cached_detail_skips_the_load(app, client, count_statements):
+    seed_inventory(1)
+    user_id = db.session.query(User.id).scalar()
+    client.get(f"/api/users/{user_id}")
+    count_statements.statements.clear()
+    assert client.get(f"/api/users/{user_id}").status_code == 200
+    # Only the ETag's version lookup runs on a cache hit.
+    assert len(count_statements) == 1
@@ -0,0 +1,38 @@
+from app.models import Computer
+
+
+def _payload(serial="SN1", **overrides):
+    payload = {"agentId": "agent-1", "serialNumber": serial, "name": "Mac", "model": "MacBook Pro"}
+    payload.update(overrides)
+    return payload
+
+
+def test_register_creates_then_reports_unchanged(client):
+    created = client.post("/api/agents/register", json=_payload())
+    assert created.status_code == 201
+    body = created.get_json()
+    assert body["inventoryStatus"] == "created" and body["serialNumber"] == "SN1" and body["user"] is None
+
+    again = client.post("/api/agents/register", json=_payload())
+    assert again.status_code == 200
+    assert again.get_json()["inventoryStatus"] == "unchanged"
+
+
+def test_register_batch_upserts_and_reports_invalid(client):
+    client.post("/api/agents/register", json=_payload("SN1"))
+    response = client.post(
+        "/api/agents/register/batch",
+        json={"records": [_payload("SN1", osVersion="15.1"), _payload("SN2"), {"serialNumber": "SN3"}]},
+    )
+    assert response.get_json() == {"created": 1, "updated": 1, "unchanged": 0, "invalid": [2]}
+    assert Computer.query.filter_by(serial_number="SN1").one().os_version == "15.1"
+
+
+def test_delta_registration_requires_current_baseline(client):
+    baseline = client.post("/api/agents/register", json=_payload()).get_json()["inventoryHash"]
+    delta = {"agentId": "agent-1", "serialNumber": "SN1", "baseHash": baseline, "changes": {"osVersion": "15.2"}}
+    response = client.post("/api/agents/register", json=delta)
+    assert response.status_code == 200
+    assert response.get_json()["inventoryStatus"] == "updated"
+    # The old baseline no longer matches once the inventory moved on.
+    assert client.post("/api/agents/register", json=delta).status_code == 409
@@ -0,0 +1,35 @@
+import pytest
+
+from app.extensions import db
+from app.models import Computer
+
+from conftest import seed_inventory
+
+
+@pytest.fixture
+def fleet(app):
+    # Agents a0-0 .. a3-1; the second computer of each user is compliant.
+    seed_inventory(4)
+    for computer in Computer.query.filter(Computer.name.like("%-1")):
+        computer.compliant = True
+    db.session.commit()
+
+
+@pytest.mark.parametrize("value", ["false", "0", 0, 1, None, "true"])
+def test_rollout_rejects_non_boolean_compliant(client, fleet, value):
+    response = client.post("/api/agents/rollouts", json={"type": "lock", "target": {"compliant": value}})
+    assert response.status_code == 400
+
+
+def test_rollout_targets_only_matching_compliance(client, fleet):
+    response = client.post("/api/agents/rollouts", json={"type": "lock", "target": {"compliant": False}})
+    assert response.status_code == 201
+    assert response.get_json()["targeted"] == 4
+    rollout = client.get(f"/api/agents/rollouts/{response.get_json()['rolloutId']}").get_json()
+    assert rollout["status"] == {"queued": 4}
+
+
+def test_rollout_matching_no_agents_is_rejected(client, fleet):
+    response = client.post("/api/agents/rollouts", json={"type": "lock", "target": {"model": "ThinkPad"}})
+    assert response.status_code == 422
+    assert "rolloutId" not in response.get_json()
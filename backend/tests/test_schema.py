@@ -0,0 +1,54 @@
+import pytest
+from flask_migrate import Migrate, upgrade
+from sqlalchemy import text
+
+from app.extensions import db
+from app.schema import _REVISION_MARKERS, MIGRATIONS_DIR, head_revision, unversioned_revision
+
+
+@pytest.fixture
+def bare_db(app):
+    # Start from an empty database instead of the fixture's create_all.
+    db.drop_all()
+    Migrate(app, db, directory=MIGRATIONS_DIR)
+    return app
+
+
+# Build the schema of `revision`, then forget it was versioned.
+def _unversioned_schema_at(revision):
+    upgrade(directory=MIGRATIONS_DIR, revision=revision)
+    with db.engine.begin() as conn:
+        conn.execute(text("DROP TABLE alembic_version"))
+
+
+def test_every_migration_has_schema_markers():
+    # A new migration must also be listed in _REVISION_MARKERS.
+    assert head_revision() == _REVISION_MARKERS[-1][0]
+
+
+def test_empty_database_has_nothing_to_adopt(bare_db):
+    assert unversioned_revision() is None
+
+
+@pytest.mark.parametrize("revision", ["0001_baseline", "0002_agent_queue", "0005_table_versions", "0006_user_active"])
+def test_unversioned_schema_is_dated_by_its_objects(bare_db, revision):
+    _unversioned_schema_at(revision)
+    assert unversioned_revision() == revision
+
+
+def test_create_all_schema_is_at_head(app):
+    assert unversioned_revision() == head_revision()
+
+
+def test_versioned_database_is_left_alone(bare_db):
+    upgrade(directory=MIGRATIONS_DIR)
+    assert unversioned_revision() is None
+
+
+def test_partly_migrated_schema_is_refused(bare_db):
+    _unversioned_schema_at("0001_baseline")
+    # An old create_all build added agent_commands but never altered computers.
+    with db.engine.begin() as conn:
+        conn.execute(text("CREATE TABLE agent_commands (id VARCHAR(32) PRIMARY KEY, rollout_id VARCHAR(32))"))
+    with pytest.raises(RuntimeError, match="computers.inventory_hash"):
+        unversioned_revision()
@@ -0,0 +1,84 @@
+import pytest
+
+from app.extensions import db
+from app.models import Computer, Device, User
+
+
+def _search(client, **params):
+    response = client.get("/api/search", query_string=params)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()["results"]
+
+
+def _computer(name: str, serial: str) -> Computer:
+    computer = Computer(name=name, model="MacBook", serial_number=serial)
+    db.session.add(computer)
+    return computer
+
+
+@pytest.mark.parametrize(
+    "params,message",
+    [
+        ({}, "Query parameter q is required."),
+        ({"q": "   "}, "Query parameter q is required."),
+        ({"q": "x" * 121}, "Query must be at most 120 characters."),
+        ({"q": "x", "limit": "ten"}, "Limit must be an integer."),
+    ],
+)
+def test_bad_requests(app, client, params, message):
+    response = client.get("/api/search", query_string=params)
+    assert response.status_code == 400
+    assert response.get_json()["message"] == message
+
+
+@pytest.mark.parametrize(
+    "query,expected",
+    [
+        ("50%", ["50% off"]),
+        ("50_", ["50_x"]),
+        ("back\\", ["back\\slash"]),
+        ("50", ["50% off", "50_x", "50ab"]),
+    ],
+)
+def test_like_wildcards_match_literally(app, client, query, expected):
+    for index, name in enumerate(["50% off", "50_x", "50ab", "back\\slash", "backslash"]):
+        _computer(name, f"S{index}")
+    db.session.commit()
+    assert sorted(hit["label"] for hit in _search(client, q=query)) == expected
+
+
+@pytest.mark.parametrize("query", ["a1b2c3", "A1:B2:C3", "a1-b2-c3", "a1b2.c3"])
+def test_mac_separators_are_normalized(app, client, query):
+    db.session.add(Device(name="Lab iPad", model="iPad", serial_number="DV1", primary_mac="A1:B2:C3:D4:E5:F6"))
+    db.session.add(Device(name="Spare", model="iPad", serial_number="DV2", secondary_mac="A1:B2:C3:00:00:01"))
+    db.session.commit()
+    hits = _search(client, q=query)
+    assert sorted((hit["label"], hit["matchedField"]) for hit in hits) == [
+        ("Lab iPad", "primaryMacAddress"),
+        ("Spare", "secondaryMacAddress"),
+    ]
+
+
+def test_limit_is_clamped(app, client):
+    for index in range(60):
+        _computer(f"bulk-{index:02d}", f"B{index:02d}")
+    db.session.commit()
+    assert len(_search(client, q="bulk", limit=100)) == 50
+    assert len(_search(client, q="bulk", limit=0)) == 1
+    assert len(_search(client, q="bulk")) == 10
+
+
+def test_entities_appear_once_under_their_best_field(app, client):
+    _computer("ZZ1 laptop", "ZZ1")
+    _computer("zz1", "OTHER")
+    db.session.add(
+        User(username="zz1admin", full_name="Zz1 Admin", email="zz1@example.com", password_hash="x")
+    )
+    db.session.commit()
+    hits = _search(client, q="zz1")
+    assert [(hit["type"], hit["matchedField"], hit["matchedValue"]) for hit in hits] == [
+        # Exact matches first, identifiers before names.
+        ("computer", "serialNumber", "ZZ1"),
+        ("computer", "name", "zz1"),
+        ("user", "username", "zz1admin"),
+    ]
@@ -1,5 +1,7 @@
 -- Local development schema for the demo MDM database.
--- Keep in sync with SQLAlchemy models in backend/app/models.py.
+-- Reference copy only: the schema is owned by the Alembic migrations in
+-- backend/migrations (`flask --app manage db upgrade`). Keep this file in sync
+-- with the latest revision.
 CREATE DATABASE IF NOT EXISTS allotted_mdm;
 USE allotted_mdm;
 
@@ -10,7 +12,12 @@ CREATE TABLE IF NOT EXISTS users (
   email VARCHAR(120) UNIQUE NOT NULL,
   password_hash VARCHAR(255) NOT NULL,
   role VARCHAR(40) NOT NULL DEFAULT 'user',
-  created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+  department VARCHAR(80) NOT NULL DEFAULT 'General',
+  active BOOLEAN NOT NULL DEFAULT TRUE,
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  row_version BIGINT NOT NULL DEFAULT 0,
+  INDEX ix_users_department (department),
+  INDEX ix_users_full_name (full_name)
 );
 
 CREATE TABLE IF NOT EXISTS devices (
@@ -20,11 +27,17 @@ CREATE TABLE IF NOT EXISTS devices (
   os_version VARCHAR(80),
   serial_number VARCHAR(120) UNIQUE NOT NULL,
   udid VARCHAR(120) UNIQUE,
-  compliant BOOLEAN NOT NULL DEFAULT TRUE,
+  compliant BOOLEAN NOT NULL DEFAULT FALSE,
   primary_mac VARCHAR(50),
   secondary_mac VARCHAR(50),
   processor_type VARCHAR(80),
+  row_version BIGINT NOT NULL DEFAULT 0,
   user_id INT,
+  INDEX ix_devices_user_model (user_id, model),
+  INDEX ix_devices_compliant (compliant),
+  INDEX ix_devices_name (name),
+  INDEX ix_devices_primary_mac (primary_mac),
+  INDEX ix_devices_secondary_mac (secondary_mac),
   CONSTRAINT fk_devices_users FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
 );
 
@@ -35,10 +48,47 @@ CREATE TABLE IF NOT EXISTS computers (
   os_version VARCHAR(80),
   serial_number VARCHAR(120) UNIQUE NOT NULL,
   model_identifier VARCHAR(120),
-  compliant BOOLEAN NOT NULL DEFAULT TRUE,
+  compliant BOOLEAN NOT NULL DEFAULT FALSE,
   processor_type VARCHAR(80),
   architecture_type VARCHAR(80),
   cache_size VARCHAR(50),
+  agent_id VARCHAR(120),
+  inventory_hash CHAR(64),
+  last_seen_at DATETIME,
+  agent_version VARCHAR(40),
+  row_version BIGINT NOT NULL DEFAULT 0,
   user_id INT,
+  INDEX ix_computers_user_model (user_id, model),
+  INDEX ix_computers_compliant (compliant),
+  INDEX ix_computers_agent_id (agent_id),
+  INDEX ix_computers_last_seen_at (last_seen_at),
+  INDEX ix_computers_name (name),
   CONSTRAINT fk_computers_users FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
 );
+
+CREATE TABLE IF NOT EXISTS agent_commands (
+  id VARCHAR(32) PRIMARY KEY,
+  agent_id VARCHAR(120) NOT NULL,
+  rollout_id VARCHAR(32),
+  command_type VARCHAR(40) NOT NULL,
+  payload JSON,
+  status VARCHAR(20) NOT NULL DEFAULT 'queued',
+  attempts INT NOT NULL DEFAULT 0,
+  created_at DATETIME(6) NOT NULL,
+  dispatched_at DATETIME,
+  completed_at DATETIME,
+  expires_at DATETIME NOT NULL,
+  INDEX ix_agent_commands_agent_status_created (agent_id, status, created_at),
+  INDEX ix_agent_commands_rollout_id (rollout_id),
+  INDEX ix_agent_commands_status_expires (status, expires_at),
+  INDEX ix_agent_commands_status_created (status, created_at)
+);
+
+-- Bumped in each writing transaction; list/detail ETags derive from these.
+CREATE TABLE IF NOT EXISTS table_versions (
+  name VARCHAR(40) PRIMARY KEY,
+  version BIGINT NOT NULL
+);
+
+INSERT IGNORE INTO table_versions (name, version)
+VALUES ('users', 0), ('devices', 0), ('computers', 0);
@@ -10,6 +10,7 @@ import {
   DashboardSummary,
   Device,
   LoginResponse,
+  SearchResponse,
   UpdateUserRequest,
   UserRow
 } from './models';
@@ -136,4 +137,10 @@ export class ApiService {
   getComputer(id: number): Observable<Computer> {
     return this.http.get<Computer>(`${this.baseUrl}/computers/${id}`);
   }
+
+  // Search endpoints.
+  // Type-ahead search across computers, devices and users.
+  search(query: string, limit = 10): Observable<SearchResponse> {
+    return this.http.get<SearchResponse>(`${this.baseUrl}/search`, { params: { q: query, limit } });
+  }
 }
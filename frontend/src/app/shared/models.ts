@@ -5,6 +5,7 @@ export interface DashboardSummary {
     computers: { compliant: number; nonCompliant: number };
     devices: { compliant: number; nonCompliant: number };
   };
+  agents?: { online: number; stale: number; offline: number };
 }
 
 // Auth payload returned by the login endpoint.
@@ -21,6 +22,7 @@ export interface UserRow {
   email: string;
   role: string;
   department?: string;
+  active?: boolean;
   model?: string | null;
   deviceName?: string | null;
   computerName?: string | null;
@@ -107,3 +109,20 @@ export interface Computer {
   agentId?: string | null;
   user?: string | null;
 }
+
+// One hit from the cross-entity type-ahead search.
+export interface SearchResult {
+  type: 'computer' | 'device' | 'user';
+  id: number;
+  label: string;
+  detail: string;
+  matchedField: string;
+  matchedValue: string;
+}
+
+// Response envelope for /api/search.
+export interface SearchResponse {
+  query: string;
+  results: SearchResult[];
+  count: number;
+}